@@ -1,17 +1,45 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, g, stream_with_context
 from flask_cors import CORS
 from langchain_core.messages import HumanMessage
-import uuid
-from datetime import datetime
 import os
+import csv
+from datetime import datetime, timedelta
+import io
+import json
+import threading
+import time
 from dotenv import load_dotenv
 from typing import Optional
 
 from langchain.globals import set_llm_cache
 from langchain_community.cache import SQLiteCache
 
+from analytics import ROLLUP_DIMENSIONS, TicketRollups
+from counters import RECONCILE_INTERVAL as COUNTERS_RECONCILE_INTERVAL, TicketCounters
+from enrichment import TicketEnricher
+from jobs import WORKERS as JOBS_WORKERS, JobQueue, QueueFull
+import metrics
+import retrieval
+from semantic_cache import SemanticCache
+from similar import DEFAULT_K as SIMILAR_DEFAULT_K, SimilarIncidents
+from storage import (
+    BULK_BATCH_SIZE,
+    EXPORT_BATCH_SIZE,
+    TICKET_FILTERS,
+    TicketRepository,
+    get_database,
+)
+from streaming import StreamStats, stream_answer, stream_cached
+import tracing
+from triage import (
+    MAX_BATCH_SIZE as TRIAGE_MAX_BATCH_SIZE,
+    MAX_CONCURRENCY as TRIAGE_MAX_CONCURRENCY,
+    analyze_batch,
+)
+
 # Initialize SQLite cache (creates langchain_cache.db file)
-set_llm_cache(SQLiteCache(database_path=".langchain_cache.db"))
+llm_cache = SQLiteCache(database_path=".langchain_cache.db")
+set_llm_cache(llm_cache)
 
 
 # Load environment variables
@@ -20,91 +48,207 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)
 
-# Database connection function
-def get_db_connection():
-    """Get database connection with fallback to SQLite if PostgreSQL not available"""
-    try:
-        # Try PostgreSQL first
-        import psycopg2
-        return psycopg2.connect(
-            host=os.environ.get("PGHOST", "localhost"),
-            port=os.environ.get("PGPORT", "5432"),
-            database=os.environ.get("PGDATABASE", "incidents"),
-            user=os.environ.get("PGUSER", "postgres"),
-            password=os.environ.get("PGPASSWORD", "")
-        )
-    except (ImportError, Exception) as e:
-        print(f"PostgreSQL not available, using SQLite: {e}")
-        # Fallback to SQLite
-        import sqlite3
-        conn = sqlite3.connect('incidents.db')
-        conn.row_factory = sqlite3.Row
-        return conn
+# Storage layer: backend is chosen once and connections are pooled
+db = get_database()
+tickets = TicketRepository(db)
+counters = TicketCounters(tickets)
+rollups = TicketRollups(tickets)
+jobs = JobQueue(tickets)
+enricher = TicketEnricher(tickets)
+similar_incidents = SimilarIncidents(tickets)
+
+# Semantic /chat cache: paraphrased queries share a cached answer
+response_cache = SemanticCache()
+chat_stream_stats = StreamStats()
+
+# Prometheus metrics (/metrics): per-route latency and in-flight requests;
+# cache and pool figures are read from their owners when scraped
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds", "Time until the response headers are sent",
+    ("method", "route", "status")
+)
+HTTP_IN_FLIGHT = metrics.gauge(
+    "http_requests_in_flight", "Requests being handled, streamed bodies included", ("route",)
+)
+metrics.callback("chat_cache_hits_total", "Semantic /chat cache hits", lambda: response_cache.hits, "counter")
+metrics.callback("chat_cache_misses_total", "Semantic /chat cache misses", lambda: response_cache.misses, "counter")
+metrics.callback("chat_cache_entries", "Answers held in the semantic /chat cache", lambda: response_cache.stats()["entries"])
+metrics.callback("db_pool_size", "Maximum connections in the active pool", lambda: {(db.dialect,): db.pool.size},
+                 labelnames=("dialect",))
+
+def _start_request_timer():
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    in_flight = HTTP_IN_FLIGHT.labels(route)
+    in_flight.inc()
+    # [route, start, in-flight series, latency recorded]
+    g.metrics = [route, time.perf_counter(), in_flight, False]
+
+def _record_request(response):
+    state = g.metrics
+    HTTP_REQUEST_SECONDS.labels(request.method, state[0], response.status_code).observe(
+        time.perf_counter() - state[1]
+    )
+    state[3] = True
+    return response
+
+def _finish_request(exc):
+    # Runs after streamed bodies finish (stream_with_context keeps the request open)
+    state = g.pop("metrics", None)
+    if state is None:
+        return
+    if not state[3]:
+        HTTP_REQUEST_SECONDS.labels(request.method, state[0], 500).observe(time.perf_counter() - state[1])
+    state[2].dec()
+
+if metrics.ENABLED:
+    app.before_request(_start_request_timer)
+    app.after_request(_record_request)
+    app.teardown_request(_finish_request)
+
+# Tracing (TRACE_EXPORTER=jsonl|otlp): one root span per request, continuing
+# the caller's trace from traceparent / X-Trace-Id and echoing the ID back
+def _start_request_trace():
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.trace = tracing.start_trace(
+        f"{request.method} {route}",
+        traceparent=request.headers.get("traceparent"),
+        trace_id=request.headers.get(tracing.TRACE_HEADER),
+        **{"http.method": request.method, "http.route": route},
+    )
+
+def _tag_trace(response):
+    span = g.get("trace")
+    if span is not None:
+        span.set(**{"http.status_code": response.status_code})
+        response.headers[tracing.TRACE_HEADER] = span.trace_id
+        if response.is_streamed:
+            # SSE answers and exports: the span covers the body, not just the view
+            response.response = tracing.stream(g.pop("trace"), response.response)
+    return response
+
+def _end_request_trace(exc):
+    tracing.end_trace(g.pop("trace", None), exc)
+
+if tracing.ENABLED:
+    app.before_request(_start_request_trace)
+    app.after_request(_tag_trace)
+    app.teardown_request(_end_request_trace)
 
 def init_database():
     """Initialize the database with required tables"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Check if we're using PostgreSQL or SQLite
-        if hasattr(conn, 'server_version'):  # PostgreSQL
-            # Create incident schema if it doesn't exist
-            cur.execute("CREATE SCHEMA IF NOT EXISTS incident;")
-            # Create hp_incidents table if it doesn't exist
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS incident.hp_incidents (
-                    id SERIAL PRIMARY KEY,
-                    ticket_id VARCHAR(20) UNIQUE NOT NULL,
-                    name VARCHAR(100) NOT NULL,
-                    department VARCHAR(100) NOT NULL,
-                    issue_type VARCHAR(100) NOT NULL,
-                    description TEXT NOT NULL,
-                    priority VARCHAR(20) DEFAULT 'Medium',
-                    status VARCHAR(20) DEFAULT 'Open',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            # Ensure due_date column exists (for legacy tables)
-            cur.execute("""
-                DO $$
-                BEGIN
-                    IF NOT EXISTS (
-                        SELECT 1 FROM information_schema.columns 
-                        WHERE table_schema='incident' AND table_name='hp_incidents'
-                    ) THEN
-                    END IF;
-                END$$;
-            """)
-        else:  # SQLite
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS hp_incidents (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    ticket_id TEXT UNIQUE NOT NULL,
-                    name TEXT NOT NULL,
-                    department TEXT NOT NULL,
-                    issue_type TEXT NOT NULL,
-                    description TEXT NOT NULL,
-                    priority TEXT DEFAULT 'Medium',
-                    status TEXT DEFAULT 'Open',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-        
-        # Commit the changes
-        conn.commit()
-        cur.close()
-        conn.close()
+        tickets.init_schema()
+        jobs.init_schema()
         print("✅ Database initialized successfully")
-        
     except Exception as e:
         print(f"❌ Database initialization error: {e}")
         print("💡 Run 'python fix_database.py' to fix database structure issues")
 
-# Initialize database on startup
+# Initialize database on startup, and again whenever the backend switches
 init_database()
+db.on_switch(lambda _db: init_database())
+
+# Background threads belong to the process serving requests. With
+# PRELOAD_APP=1 (set by gunicorn.conf.py) this module is imported once in the
+# pre-fork parent, which loads what workers can share copy-on-write, and each
+# worker starts its own threads after the fork.
+PRELOAD_APP = os.environ.get("PRELOAD_APP", "0").lower() in ("1", "true", "yes")
+# Work needed once per deployment rather than per worker (embedding tickets
+# for similar-incident search, recounting the counters) runs in whichever
+# worker holds this lock; another takes over when it exits. Unset (one
+# process), this process always runs it.
+BACKGROUND_LOCK_FILE = os.environ.get("BACKGROUND_LOCK_FILE", "")
+_background_lock = {"file": None, "guard": threading.Lock()}
+
+def holds_background_lock():
+    """Whether this process runs the once-per-deployment background work"""
+    if not BACKGROUND_LOCK_FILE:
+        return True
+    with _background_lock["guard"]:
+        if _background_lock["file"] is None:
+            import fcntl  # POSIX only, like gunicorn which sets the lock file
+
+            lock_file = open(BACKGROUND_LOCK_FILE, "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            _background_lock["file"] = lock_file
+            print(f"🔒 Worker {os.getpid()} now runs the shared background work")
+        return True
+
+def preload():
+    """Run in the pre-fork parent: load the embedder, FAISS index and chat graph"""
+    if enricher.enabled:
+        enricher.reset_running()
+    if retrieval.WARMUP:
+        retrieval.warm_up()
+
+def before_fork():
+    """Close connections so no two processes share a socket or file handle"""
+    db.pool.close_idle()
+    llm_cache.engine.dispose()
+
+def start_background_services():
+    """Start this process's workers, syncs and exporters"""
+    if COUNTERS_RECONCILE_INTERVAL > 0:
+        counters.start_reconciler(COUNTERS_RECONCILE_INTERVAL, should_run=holds_background_lock)
+    # Opt-in (AUTO_TRIAGE=1) background enrichment of newly created tickets
+    enricher.start(reset=not PRELOAD_APP)
+    # Opt-in (SIMILAR_SEARCH=1): embeds existing tickets in the background, then
+    # new ones as they arrive (one worker embeds, every worker loads the vectors)
+    similar_incidents.start(may_embed=holds_background_lock)
+    # Load the embedder, FAISS index and chat graph now rather than on the first /chat
+    if not PRELOAD_APP:
+        retrieval.start_warm_up()
+    # Writes finished spans to TRACE_FILE or the OTLP collector (no-op when off)
+    tracing.exporter.start()
+    # Workers for /jobs, async /process_ticket/ and async /chat
+    if JOBS_WORKERS > 0:
+        jobs.start_workers(JOBS_WORKERS)
+    db.start_probe()
+
+def stop_background_services():
+    """Let background threads finish their current item, then flush spans"""
+    jobs.stop_workers()
+    enricher.stop()
+    similar_incidents.stop()
+    tracing.exporter.stop()
+
+def _analyze_text(ticket_text):
+    """Run structured extraction on one ticket text"""
+    # Lazy import to avoid failing app startup if env is missing
+    from app.nodes.struc_output import llm_structured  # noqa: WPS433
+    result_model = llm_structured.invoke([HumanMessage(content=ticket_text)], config=metrics.llm_config())
+    return result_model.model_dump()
+
+def _answer_query(query):
+    """Run the LangGraph pipeline to completion and return the answer text"""
+    from app.graph import graph  # noqa: WPS433
+    state_in = {"messages": [HumanMessage(content=query)]}
+    result_state = graph.invoke(state_in, config=metrics.llm_config())
+    messages = result_state.get("messages", [])
+    answer_text = messages[-1].content if messages else ""
+    if not answer_text:
+        answer_text = "Sorry, I couldn't generate a response right now. Please try again."
+    return answer_text
+
+def _enqueue_job(kind, payload, ticket_id=None, callback_url=None):
+    """Queue background work and answer 202 with where to poll for it"""
+    try:
+        job_id = jobs.enqueue(kind, payload, ticket_id=ticket_id, callback_url=callback_url)
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 429, {"Retry-After": "5"}
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/jobs/{job_id}"
+    }), 202
 
 @app.route('/process_ticket/', methods=['POST'])
 def process_ticket():
@@ -112,17 +256,40 @@ def process_ticket():
     ticket_text = data.get("text", "")
     if not ticket_text:
         return jsonify({"error": "No ticket text provided"}), 400
+    if data.get("async", False):
+        return _enqueue_job(
+            "process_ticket", {"text": ticket_text},
+            ticket_id=data.get("ticket_id"), callback_url=data.get("callback_url")
+        )
     # Generate structured output using LangChain structured LLM
     try:
-        # Lazy import to avoid failing app startup if env is missing
-        from app.nodes.struc_output import llm_structured  # noqa: WPS433
-        result_model = llm_structured.invoke([HumanMessage(content=ticket_text)])
-        structured_output = result_model.model_dump()
+        structured_output = _analyze_text(ticket_text)
     except Exception as exc:
         return jsonify({"error": f"Failed to analyze ticket: {str(exc)}"}), 500
 
     return jsonify({"structured_output": structured_output}), 200
 
+@app.route('/process_tickets/batch', methods=['POST'])
+def process_tickets_batch():
+    """Analyze many ticket texts concurrently, isolating per-item failures"""
+    data = request.json or {}
+    texts = data.get("texts")
+    if not isinstance(texts, list) or not texts:
+        return jsonify({"error": "Provide a non-empty 'texts' list"}), 400
+    if len(texts) > TRIAGE_MAX_BATCH_SIZE:
+        return jsonify({"error": f"At most {TRIAGE_MAX_BATCH_SIZE} texts per batch"}), 400
+    max_concurrency = data.get("max_concurrency", TRIAGE_MAX_CONCURRENCY)
+    if isinstance(max_concurrency, bool) or not isinstance(max_concurrency, int) or max_concurrency < 1:
+        return jsonify({"error": "'max_concurrency' must be a positive integer"}), 400
+    max_concurrency = min(max_concurrency, TRIAGE_MAX_CONCURRENCY)
+
+    try:
+        results = analyze_batch(texts, max_concurrency=max_concurrency)
+    except Exception as exc:
+        return jsonify({"error": f"Failed to analyze tickets: {str(exc)}"}), 500
+
+    return jsonify({"results": results}), 200
+
 @app.route('/ticket', methods=['POST'])
 def create_ticket():
     data = request.json
@@ -130,75 +297,7 @@ def create_ticket():
         return jsonify({"error": "No data provided"}), 400
     
     try:
-        # Generate a unique ticket ID
-        ticket_id = str(uuid.uuid4())[:8].upper()
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        # Print received data for debugging
-        print(f"Debug - Received data: {data}")
-        print(f"Debug - Generated ticket_id: {ticket_id}")
-        print(f"Debug - Current time: {current_time}")
-        
-        # Get database connection
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Check if we're using PostgreSQL or SQLite
-        if hasattr(conn, 'server_version'):  # PostgreSQL
-            cur.execute("""
-                INSERT INTO incident.hp_incidents 
-                (ticket_id, name, department, issue_type, description, priority, status, created_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                ticket_id,
-                data.get("name", ""),
-                data.get("department", ""),
-                data.get("issue_type", ""),
-                data.get("description", ""),
-                data.get("priority", "Medium"),
-                "Open",
-                current_time
-            ))
-        else:  # For SQLite
-            print("Using SQLite")
-            try:
-                # Close the current connection and create a direct SQLite connection
-                if conn:
-                    conn.close()
-                
-                import sqlite3
-                sqlite_conn = sqlite3.connect('incidents.db')
-                sqlite_cur = sqlite_conn.cursor()
-                
-                # Use direct SQLite connection with minimal parameters
-                sqlite_cur.execute(
-                    "INSERT INTO incidents (ticket_id, name, department, issue_type, description, priority, status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                    (ticket_id, data.get("name", ""), data.get("department", ""), data.get("issue_type", ""), 
-                     data.get("description", ""), data.get("priority", "Medium"), "Open", current_time)
-                )
-                
-                # Commit and close the direct connection
-                sqlite_conn.commit()
-                sqlite_conn.close()
-                
-                # Reopen the original connection for consistency
-                conn = get_db_connection()
-                cur = conn.cursor()
-                
-            except Exception as e:
-                print(f"SQLite execution error: {e}")
-                print(f"Error details: {type(e).__name__}")
-                import traceback
-                print(traceback.format_exc())
-                raise
-        
-        # Commit the transaction
-        conn.commit()
-        
-        # Close database connection
-        cur.close()
-        conn.close()
-        
+        ticket_id = tickets.create_ticket(data)
         return jsonify({
             "ticket_id": ticket_id, 
             "message": "Ticket created successfully and stored in database"
@@ -211,73 +310,157 @@ def create_ticket():
         print(f"Error details: {error_details}")
         return jsonify({"error": f"Database error: {str(e)}"}), 500
 
+def _read_ndjson(stream):
+    """Yield one parsed record per non-blank NDJSON line (or the parse error)"""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield e
+
+@app.route('/tickets/bulk', methods=['POST'])
+def create_tickets_bulk():
+    """Create many tickets from a JSON array or an NDJSON stream"""
+    batch_size = request.args.get("batch_size", BULK_BATCH_SIZE, type=int)
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        records = _read_ndjson(request.stream)
+    else:
+        records = request.get_json(silent=True)
+        if not isinstance(records, list):
+            return jsonify({"error": "Expected a JSON array of tickets"}), 400
+
+    try:
+        results = tickets.create_tickets(records, batch_size=batch_size)
+    except Exception as e:
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+
+    created = sum(1 for result in results if "ticket_id" in result)
+    return jsonify({
+        "created": created,
+        "failed": len(results) - created,
+        "results": results
+    }), 200
+
+def _ticket_filters(args):
+    """Collect list/export filters from query-string arguments"""
+    keys = TICKET_FILTERS + ("created_from", "created_to")
+    return {key: args[key] for key in keys if args.get(key)}
+
 @app.route('/tickets', methods=['GET'])
 def get_tickets():
+    """List tickets one keyset page at a time (newest first)"""
+    fields = request.args.get("fields")
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Check if we're using PostgreSQL or SQLite
-        if hasattr(conn, 'server_version'):  # PostgreSQL
-            cur.execute("""
-                SELECT ticket_id, status, updated_at
-                FROM incident.hp_incidents
-                ORDER BY created_at DESC
-            """)
-        else:  # SQLite
-            cur.execute("""
-                SELECT ticket_id, status, updated_at
-                FROM incidents
-                ORDER BY created_at DESC
-            """)
-        
-        tickets = []
-        for row in cur.fetchall():
-            tickets.append({
-                "ticket_id": row[0],
-                "status": row[1],
-                "updated_at": row[2]
-            })
-        
-        cur.close()
-        conn.close()
-        
-        return jsonify({"tickets": tickets}), 200
+        page, next_cursor = tickets.list_tickets(
+            filters=_ticket_filters(request.args),
+            fields=fields.split(",") if fields else None,
+            limit=request.args.get("limit", 50, type=int),
+            cursor=request.args.get("cursor"),
+        )
+        return jsonify({"tickets": page, "next_cursor": next_cursor}), 200
         
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": f"Database error: {str(e)}"}), 500
 
+@app.route('/tickets/export', methods=['GET'])
+def export_tickets():
+    """Stream matching tickets as NDJSON or CSV with constant memory"""
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"error": "format must be 'ndjson' or 'csv'"}), 400
+    fields = request.args.get("fields")
+    try:
+        rows = tickets.iter_tickets(
+            filters=_ticket_filters(request.args),
+            fields=fields.split(",") if fields else None,
+            since=request.args.get("since"),
+            batch_size=request.args.get("batch_size", EXPORT_BATCH_SIZE, type=int),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def generate_ndjson():
+        for row in rows:
+            yield json.dumps(row, default=str) + "\n"
+
+    def generate_csv():
+        columns = fields.split(",") if fields else tickets.columns
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=list(dict.fromkeys(columns)))
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            # Flush roughly every 64 KB so the client sees steady progress
+            if buffer.tell() > 65536:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    if fmt == "csv":
+        return Response(
+            stream_with_context(generate_csv()),
+            mimetype="text/csv",
+            headers={"Content-Disposition": "attachment; filename=tickets.csv"},
+        )
+    return Response(stream_with_context(generate_ndjson()), mimetype="application/x-ndjson")
+
+@app.route('/tickets/search', methods=['GET'])
+def search_tickets():
+    """Find tickets whose descriptions are semantically closest to ?q="""
+    query = request.args.get("q", "")
+    if not query:
+        return jsonify({"error": "No query provided"}), 400
+    if not similar_incidents.enabled:
+        return jsonify({"error": "Similar-incident search is disabled (set SIMILAR_SEARCH=1)"}), 503
+    try:
+        results = similar_incidents.search(
+            query,
+            k=request.args.get("k", SIMILAR_DEFAULT_K, type=int),
+            filters=_ticket_filters(request.args),
+        )
+        return jsonify({"tickets": results}), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Search error: {str(e)}"}), 500
+
+@app.route('/tickets/<ticket_id>/similar', methods=['GET'])
+def get_similar_tickets(ticket_id):
+    """Prior incidents most like this one, optionally filtered"""
+    if not similar_incidents.enabled:
+        return jsonify({"error": "Similar-incident search is disabled (set SIMILAR_SEARCH=1)"}), 503
+    try:
+        results = similar_incidents.similar(
+            ticket_id,
+            k=request.args.get("k", SIMILAR_DEFAULT_K, type=int),
+            filters=_ticket_filters(request.args),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Search error: {str(e)}"}), 500
+    if results is None:
+        return jsonify({"error": "Ticket not found"}), 404
+    return jsonify({"ticket_id": ticket_id, "similar": results}), 200
+
+@app.route('/tickets/similar/stats', methods=['GET'])
+def get_similar_stats():
+    """Size of the similar-incident index and its last sync"""
+    return jsonify({"similar": similar_incidents.stats()}), 200
+
 @app.route('/ticket/<ticket_id>/status', methods=['GET'])
 def get_ticket_status(ticket_id):
     """Get status of a specific ticket (minimal columns)"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Check if we're using PostgreSQL or SQLite
-        if hasattr(conn, 'server_version'):  # PostgreSQL
-            cur.execute("""
-                SELECT ticket_id, status, updated_at
-                FROM incident.hp_incidents
-                WHERE ticket_id = %s
-            """, (ticket_id,))
-        else:  # SQLite
-            cur.execute("""
-                SELECT ticket_id, status, updated_at
-                FROM incidents
-                WHERE ticket_id = ?
-            """, (ticket_id,))
-        
-        row = cur.fetchone()
-        cur.close()
-        conn.close()
-        
-        if row:
-            ticket = {
-                "ticket_id": row[0],
-                "status": row[1],
-                "updated_at": row[2]
-            }
+        ticket = tickets.get_status(ticket_id)
+        if ticket:
             return jsonify({"ticket": ticket}), 200
         else:
             return jsonify({"error": "Ticket not found"}), 404
@@ -295,138 +478,124 @@ def update_ticket_status(ticket_id):
         return jsonify({"error": "No status provided"}), 400
     
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Check if we're using PostgreSQL or SQLite
-        if hasattr(conn, 'server_version'):  # PostgreSQL
-            cur.execute("""
-                UPDATE incident.hp_incidents
-                SET status = %s, updated_at = CURRENT_TIMESTAMP
-                WHERE ticket_id = %s
-            """, (new_status, ticket_id))
-        else:  # SQLite
-            cur.execute("""
-                UPDATE incidents
-                SET status = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE ticket_id = ?
-            """, (new_status, ticket_id))
-        
-        if cur.rowcount == 0:
-            cur.close()
-            conn.close()
+        if not tickets.update_status(ticket_id, new_status):
             return jsonify({"error": "Ticket not found"}), 404
         
-        # Commit the transaction
-        conn.commit()
-        cur.close()
-        conn.close()
-        
         return jsonify({"message": f"Ticket {ticket_id} status updated to {new_status}"}), 200
         
     except Exception as e:
         return jsonify({"error": f"Database error: {str(e)}"}), 500
 
+@app.route('/tickets/status', methods=['PATCH'])
+def update_ticket_statuses():
+    """Update the status of many tickets in one transaction
+
+    Body: {"updates": [{"ticket_id", "status"?, "expected_updated_at"?}, ...],
+    "status": default for updates without one, "atomic": all-or-nothing}.
+    A list of "ticket_ids" may be given instead of "updates".
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    updates = data.get("updates")
+    if updates is None and isinstance(data.get("ticket_ids"), list):
+        updates = [{"ticket_id": ticket_id} for ticket_id in data["ticket_ids"]]
+    if not isinstance(updates, list) or not updates:
+        return jsonify({"error": "No updates provided"}), 400
+    default_status = data.get("status")
+    if default_status:
+        updates = [
+            {"status": default_status, **update} if isinstance(update, dict) else update
+            for update in updates
+        ]
+    atomic = bool(data.get("atomic", False))
+
+    try:
+        results = tickets.update_statuses(updates, atomic=atomic)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+
+    updated = sum(1 for result in results if result["result"] == "updated")
+    body = {"updated": updated, "failed": len(results) - updated, "results": results}
+    # An all-or-nothing batch that was not applied is a conflict as a whole
+    return jsonify(body), 409 if atomic and updated < len(results) else 200
+
 @app.route('/ticket-stats', methods=['GET'])
 def get_ticket_stats():
-    """Get ticket statistics"""
+    """Get ticket statistics from the incrementally maintained counters"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Check if we're using PostgreSQL or SQLite
-        if hasattr(conn, 'server_version'):  # PostgreSQL
-            cur.execute("""
-                SELECT 
-                    COUNT(*) as total_tickets,
-                    COUNT(CASE WHEN status = 'Open' THEN 1 END) as open_tickets,
-                    COUNT(CASE WHEN status = 'In Progress' THEN 1 END) as in_progress_tickets,
-                    COUNT(CASE WHEN status = 'Resolved' THEN 1 END) as resolved_tickets,
-                    COUNT(CASE WHEN priority = 'Critical' THEN 1 END) as critical_tickets
-                FROM incident.hp_incidents
-            """)
-        else:  # SQLite
-            cur.execute("""
-                SELECT 
-                    COUNT(*) as total_tickets,
-                    COUNT(CASE WHEN status = 'Open' THEN 1 END) as open_tickets,
-                    COUNT(CASE WHEN status = 'In Progress' THEN 1 END) as in_progress_tickets,
-                    COUNT(CASE WHEN status = 'Resolved' THEN 1 END) as resolved_tickets,
-                    COUNT(CASE WHEN priority = 'Critical' THEN 1 END) as critical_tickets
-                FROM incidents
-            """)
-        
-        row = cur.fetchone()
-        cur.close()
-        conn.close()
-        
-        stats = {
-            "total_tickets": row[0],
-            "open_tickets": row[1],
-            "in_progress_tickets": row[2],
-            "resolved_tickets": row[3],
-            "critical_tickets": row[4]
-        }
-        
-        return jsonify({"stats": stats}), 200
+        return jsonify({"stats": counters.snapshot()}), 200
         
     except Exception as e:
         return jsonify({"error": f"Database error: {str(e)}"}), 500
 
+@app.route('/analytics/timeseries', methods=['GET'])
+def get_timeseries():
+    """Incident volume per hour/day/week from the pre-aggregated rollups"""
+    end = request.args.get("end") or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    start = request.args.get("start")
+    try:
+        end_time = datetime.fromisoformat(end)
+        start_time = datetime.fromisoformat(start) if start else end_time - timedelta(days=7)
+        if start_time >= end_time:
+            return jsonify({"error": "start must be before end"}), 400
+    except (ValueError, TypeError):
+        # TypeError: one bound has a UTC offset and the other does not
+        return jsonify({"error": "start and end must be ISO 8601 timestamps"}), 400
+    start = start or start_time.strftime("%Y-%m-%d %H:%M:%S")
+    group_by = request.args.get("group_by")
+    filters = {d: request.args[d] for d in ROLLUP_DIMENSIONS if request.args.get(d)}
+    try:
+        series = rollups.timeseries(
+            granularity=request.args.get("granularity", "day"),
+            start=start,
+            end=end,
+            group_by=group_by.split(",") if group_by else None,
+            filters=filters,
+        )
+        return jsonify({"start": start, "end": end, "series": series}), 200
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+
 @app.route('/chat', methods=['POST'])
 def chat():
     data = request.json
     query = data.get("query", "")
     if not query:
         return jsonify({"error": "No query provided"}), 400
+    if data.get("async", False):
+        return _enqueue_job("chat", {"query": query}, callback_url=data.get("callback_url"))
 
     try:
-        # Import cache
-        from app.utils.cache_utils import response_cache
-        
-        # Check if response is in cache for non-streaming requests
+        # Check if response (or one for a paraphrase) is already cached
         use_cache = data.get("use_cache", True)  # Default to using cache
-        if use_cache and not data.get("stream", False):
-            cached_response = response_cache.get(query)
-            if cached_response:
-                print("Using cached response")
-                return jsonify({"answer": cached_response, "cached": True}), 200
-        
-        # Use LangGraph pipeline to generate LLM answer
-        from app.graph import graph  # noqa: WPS433
-        from flask import Response, stream_with_context
-        import json
-        
-        def generate_stream():
-            state_in = {"messages": [HumanMessage(content=query)]}
-            # Use stream=True for streaming response
-            full_response = ""
-            for chunk_state in graph.stream(state_in):
-                messages = chunk_state.get("messages", [])
-                if messages and hasattr(messages[-1], "content"):
-                    chunk_text = messages[-1].content
-                    if chunk_text:
-                        full_response = chunk_text  # Keep track of full response
-                        yield f"data: {json.dumps({'chunk': chunk_text})}\n\n"
-            
-            # Cache the full response when streaming is complete
-            if use_cache and full_response:
-                response_cache.set(query, full_response)
-                
-            yield f"data: {json.dumps({'done': True})}\n\n"
-        
+        stream = data.get("stream", False)
+        if use_cache:
+            match = response_cache.lookup(query)
+            if match and stream:
+                return _sse_response(stream_cached(match["answer"], match["similarity"]))
+            if match:
+                return jsonify({
+                    "answer": match["answer"],
+                    "cached": True,
+                    "similarity": round(match["similarity"], 4)
+                }), 200
+
         # Check if client requested streaming
-        if data.get("stream", False):
-            return Response(stream_with_context(generate_stream()), 
-                           mimetype="text/event-stream")
+        if stream:
+            # Use LangGraph pipeline to generate LLM answer, token by token
+            from app.graph import graph  # noqa: WPS433
+
+            on_complete = (lambda answer: response_cache.set(query, answer)) if use_cache else None
+            return _sse_response(stream_answer(graph, query, on_complete=on_complete, stats=chat_stream_stats))
         else:
             # Non-streaming fallback
-            state_in = {"messages": [HumanMessage(content=query)]}
-            result_state = graph.invoke(state_in)
-            messages = result_state.get("messages", [])
-            answer_text = messages[-1].content if messages else ""
-            if not answer_text:
-                answer_text = "Sorry, I couldn't generate a response right now. Please try again."
+            answer_text = _answer_query(query)
             
             # Cache the response
             if use_cache:
@@ -436,14 +605,118 @@ def chat():
     except Exception as e:
         return jsonify({"error": f"Chat error: {str(e)}"}), 500
 
+def _sse_response(events):
+    """Send SSE events as they are produced (no proxy buffering)"""
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route('/chat/stream-stats', methods=['GET'])
+def get_chat_stream_stats():
+    """Time-to-first-token and size of streamed /chat answers"""
+    return jsonify({"streaming": chat_stream_stats.snapshot()}), 200
+
+@app.route('/retrieval/search', methods=['GET'])
+def retrieval_search():
+    """Debug JCI retrieval: fused results with their ranks and per-stage latency"""
+    query = request.args.get("q", "")
+    if not query:
+        return jsonify({"error": "No query provided"}), 400
+    try:
+        documents, timings = retrieval.get_retriever().search(
+            query,
+            k=request.args.get("k", type=int),
+            mode=request.args.get("mode"),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Retrieval error: {str(e)}"}), 500
+    return jsonify({
+        "results": [{"content": doc.page_content, "metadata": doc.metadata} for doc in documents],
+        "timings_ms": timings
+    }), 200
+
+@app.route('/retrieval/stats', methods=['GET'])
+def retrieval_stats():
+    """p50/p95 latency of each retrieval stage"""
+    return jsonify({"retrieval": retrieval.get_retriever().stats()}), 200
+
+@app.route('/chat/cache-stats', methods=['GET'])
+def get_chat_cache_stats():
+    """Semantic chat cache size and hit rate"""
+    return jsonify({"cache": response_cache.stats()}), 200
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue ticket analysis or a chat query; poll /jobs/<id> for the result"""
+    data = request.json or {}
+    kind = data.get("kind", "process_ticket")
+    if kind == "process_ticket":
+        if not data.get("text"):
+            return jsonify({"error": "No ticket text provided"}), 400
+        payload = {"text": data["text"]}
+    elif kind == "chat":
+        if not data.get("query"):
+            return jsonify({"error": "No query provided"}), 400
+        payload = {"query": data["query"]}
+    else:
+        return jsonify({"error": f"Unknown job kind: {kind}"}), 400
+    return _enqueue_job(kind, payload, ticket_id=data.get("ticket_id"), callback_url=data.get("callback_url"))
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status (and, once finished, the result) of a background job"""
+    try:
+        job = jobs.get(job_id)
+    except Exception as e:
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({"job": job}), 200
+
+# Background job handlers for /jobs, async /process_ticket/ and async /chat
+jobs.register("process_ticket", lambda payload: _analyze_text(payload["text"]))
+jobs.register("chat", lambda payload: {"answer": _answer_query(payload["query"])})
+
+@app.route('/enrichment/stats', methods=['GET'])
+def get_enrichment_stats():
+    """Auto-triage queue depth and enrichment lag"""
+    try:
+        return jsonify({"enrichment": enricher.stats()}), 200
+    except Exception as e:
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+
+@app.get('/metrics')
+def get_metrics():
+    """Prometheus text exposition of every registered metric"""
+    if not metrics.ENABLED:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.get('/healthz')
 def healthz():
     return jsonify({"status": "ok"}), 200
 
+@app.get('/readyz')
+def readyz():
+    """Ready once the retrieval index and chat graph have been warmed up"""
+    state = retrieval.readiness()
+    if state["ready"]:
+        return jsonify({"status": "ready", **state}), 200
+    return jsonify({"status": "failed" if state["error"] else "warming_up", **state}), 503
+
 @app.get('/test')
 def test():
     return jsonify({"message": "Backend is running!"}), 200
 
+if PRELOAD_APP:
+    preload()
+else:
+    start_background_services()
+
 if __name__ == '__main__':
     print("🚀 Starting Flask server...")
     print("📡 Server will be available at: http://127.0.0.1:8000")
@@ -1,9 +1,9 @@
 # app.py
 import streamlit as st
-import time
-import requests
+import json
+import pandas as pd
 
-BACKEND_URL = "http://127.0.0.1:8000"  # 👈 change to your backend host/port
+import backend_client as backend
 
 st.set_page_config(
     page_title="Hospital Incident Assistant",
@@ -23,36 +23,56 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+def sse_events(response):
+    """Yield the JSON payload of each `data:` event in an SSE response"""
+    for line in response.iter_lines(decode_unicode=True):
+        if line and line.startswith("data: "):
+            yield json.loads(line[len("data: "):])
+
+# ---------- DATA ----------
+# Keyset pagination for the Ticket Status tab: remember the cursor of every
+# page visited so far, starting over whenever the status filter changes
+filter_key = ",".join(st.session_state.get("status_filter", []))
+if st.session_state.get("ticket_filter") != filter_key:
+    st.session_state.ticket_filter = filter_key
+    st.session_state.ticket_cursors = [None]
+ticket_params = {"limit": 50, "fields": "ticket_id,status,updated_at"}
+if filter_key:
+    ticket_params["status"] = filter_key
+if st.session_state.ticket_cursors[-1]:
+    ticket_params["cursor"] = st.session_state.ticket_cursors[-1]
+
+# Sidebar and ticket list data are independent: fetch them in parallel
+data = backend.fetch_concurrently(
+    health=backend.check_health,
+    stats=backend.fetch_stats,
+    tickets=lambda: backend.fetch_tickets(ticket_params),
+)
+
 # ---------- SIDEBAR ----------
 with st.sidebar:
     st.subheader("Quick Stats")
     
     # Test backend connection first
-    try:
-        test_r = requests.get("http://127.0.0.1:8000/test", timeout=5)
-        if test_r.status_code == 200:
-            st.success("✅ Connected")
-        else:
-            st.error("❌ Backend not responding properly")
-    except Exception as e:
-        st.error(f"❌ Backend not reachable: {e}")
+    if isinstance(data["health"], backend.BackendError):
+        st.error("❌ Backend not responding properly")
+    elif isinstance(data["health"], Exception):
+        st.error(f"❌ Backend not reachable: {data['health']}")
+    else:
+        st.success("✅ Connected")
     
     # Get ticket statistics
-    try:
-        stats_r = requests.get("http://127.0.0.1:8000/ticket-stats", timeout=5)
-        if stats_r.status_code == 200:
-            stats = stats_r.json().get("stats", {})
-            col1, col2 = st.columns(2)
-            with col1:
-                st.metric("Total Tickets", stats.get("total_tickets", 0))
-                st.metric("Open Tickets", stats.get("open_tickets", 0))
-            with col2:
-                st.metric("In Progress", stats.get("in_progress_tickets", 0))
-                st.metric("Critical", stats.get("critical_tickets", 0))
-        else:
-            st.warning("⚠️ Could not fetch ticket stats")
-    except Exception as e:
+    if isinstance(data["stats"], Exception):
         st.warning("⚠️ Could not fetch ticket stats")
+    else:
+        stats = data["stats"]
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Total Tickets", stats.get("total_tickets", 0))
+            st.metric("Open Tickets", stats.get("open_tickets", 0))
+        with col2:
+            st.metric("In Progress", stats.get("in_progress_tickets", 0))
+            st.metric("Critical", stats.get("critical_tickets", 0))
     
     st.divider()
     st.caption("⚙️ Connected to backend ")
@@ -131,14 +151,11 @@ with tab1:
                 "harm_severity": harm_severity,
             }
             try:
-                # Change POST endpoint to /ticket (or /tickets/create if that's your backend)
-                r = requests.post(f"http://127.0.0.1:8000/ticket", json=payload)
-                if r.status_code == 200:
-                    ticket_id = r.json().get("ticket_id", "N/A")
-                    st.success(f"✅ Ticket created: {ticket_id}")
-                    st.info("💡 You can check the ticket status in the 'Ticket Status' tab")
-                else:
-                    st.error(f"❌ Failed to create ticket: {r.text}")
+                ticket_id = backend.create_ticket(payload)
+                st.success(f"✅ Ticket created: {ticket_id}")
+                st.info("💡 You can check the ticket status in the 'Ticket Status' tab")
+            except backend.BackendError as e:
+                st.error(f"❌ Failed to create ticket: {e}")
             except Exception as e:
                 st.error(f"⚠️ Could not connect to backend: {e}")
 
@@ -154,9 +171,8 @@ with tab2:
         if st.button("🔍 Search", use_container_width=True):
             if search_ticket_id:
                 try:
-                    r = requests.get(f"http://127.0.0.1:8000/ticket/{search_ticket_id}/status")
-                    if r.status_code == 200:
-                        ticket = r.json().get("ticket")
+                    ticket = backend.get_ticket(search_ticket_id)
+                    if ticket:
                         st.success(f"✅ Found ticket: {search_ticket_id}")
                         
                         # Display ticket details
@@ -189,19 +205,17 @@ with tab2:
                         
                         if st.button("🔄 Update Status"):
                             try:
-                                update_r = requests.put(
-                                    f"http://127.0.0.1:8000/ticket/{search_ticket_id}/status",
-                                    json={"status": new_status}
-                                )
-                                if update_r.status_code == 200:
-                                    st.success(f"✅ Status updated to: {new_status}")
-                                    st.rerun()
-                                else:
-                                    st.error(f"❌ Failed to update status: {update_r.text}")
+                                backend.update_status(search_ticket_id, new_status)
+                                st.success(f"✅ Status updated to: {new_status}")
+                                st.rerun()
+                            except backend.BackendError as e:
+                                st.error(f"❌ Failed to update status: {e}")
                             except Exception as e:
                                 st.error(f"⚠️ Error updating status: {e}")
                     else:
                         st.error(f"❌ Ticket not found: {search_ticket_id}")
+                except backend.BackendError:
+                    st.error(f"❌ Ticket not found: {search_ticket_id}")
                 except Exception as e:
                     st.error(f"⚠️ Error searching ticket: {e}")
     
@@ -209,48 +223,73 @@ with tab2:
     
     # Display all tickets
     st.markdown("### 📋 All Tickets")
-    try:
-        r = requests.get("http://127.0.0.1:8000/tickets")
-        if r.status_code == 200:
-            tickets_data = r.json().get("tickets", [])
-            if tickets_data:
-                import pandas as pd
-                df = pd.DataFrame(tickets_data)
-                if 'ticket_id' in df.columns and 'status' in df.columns:
-                    display_df = df[["ticket_id", "status"]]
-                    st.dataframe(display_df, use_container_width=True)
+    st.multiselect(
+        "Filter by Status",
+        options=["Open", "In Progress", "Resolved", "Closed"],
+        default=[],
+        key="status_filter",
+    )
+
+    page = data["tickets"]
+    if isinstance(page, backend.BackendError):
+        st.error(f"Failed to fetch tickets: {page}")
+    elif isinstance(page, Exception):
+        st.error(f"Could not fetch tickets: {page}")
+    elif page.get("tickets"):
+        df = pd.DataFrame(page["tickets"])
+        next_cursor = page.get("next_cursor")
+        if 'ticket_id' in df.columns and 'status' in df.columns:
+            display_df = df[["ticket_id", "status"]]
+            st.dataframe(display_df, use_container_width=True)
+
+            # Bulk status change: one PATCH for every selected ticket. Each
+            # update carries the updated_at shown on this page, so tickets
+            # changed by someone else in the meantime are reported, not overwritten
+            st.markdown("#### Update Selected Tickets")
+            with st.form("bulk_status"):
+                selected = st.multiselect(
+                    "Tickets",
+                    options=list(df["ticket_id"]),
+                    default=list(df.loc[df["status"] == "Resolved", "ticket_id"]),
+                )
+                bulk_status = st.selectbox("New Status", options=["Open", "In Progress", "Resolved", "Closed"], index=3)
+                if st.form_submit_button("✅ Apply to selected", use_container_width=True):
+                    if selected:
+                        seen = dict(zip(df["ticket_id"], df["updated_at"])) if "updated_at" in df.columns else {}
+                        updates = [
+                            {"ticket_id": ticket_id, "expected_updated_at": seen.get(ticket_id)}
+                            for ticket_id in selected
+                        ]
+                        try:
+                            st.session_state.bulk_result = backend.update_statuses(updates, status=bulk_status)
+                            st.rerun()
+                        except backend.BackendError as e:
+                            st.error(f"Failed to update tickets: {e}")
+                        except Exception as e:
+                            st.error(f"Error updating tickets: {e}")
+                    else:
+                        st.warning("Select at least one ticket.")
 
-                    st.markdown("#### Close a Ticket")
-                    for idx, row in display_df.iterrows():
-                        ticket_id = row['ticket_id']
-                        status = row['status']
-                        cols = st.columns([2, 2, 1])
-                        cols[0].write(f"**{ticket_id}**")
-                        cols[1].write(f"{status}")
-                        if status != "Closed":
-                            if cols[2].button(f"Close Ticket", key=f"close_{ticket_id}"):
-                                try:
-                                    update_r = requests.put(
-                                        f"http://127.0.0.1:8000/ticket/{ticket_id}/status",
-                                        json={"status": "Closed"}
-                                    )
-                                    if update_r.status_code == 200:
-                                        st.success(f"Ticket {ticket_id} closed.")
-                                        st.rerun()
-                                    else:
-                                        st.error(f"Failed to close ticket {ticket_id}: {update_r.text}")
-                                except Exception as e:
-                                    st.error(f"Error closing ticket {ticket_id}: {e}")
-                        else:
-                            cols[2].write(":white_check_mark: Closed")
-                else:
-                    st.info("No ticket_id or status fields found in tickets.")
-            else:
-                st.info("No tickets found in database.")
+            bulk_result = st.session_state.pop("bulk_result", None)
+            if bulk_result:
+                st.success(f"Updated {bulk_result['updated']} ticket(s).")
+                for result in bulk_result["results"]:
+                    if result["result"] != "updated":
+                        st.warning(f"{result['ticket_id']}: {result['error']}")
+
+            nav = st.columns(2)
+            if len(st.session_state.ticket_cursors) > 1:
+                if nav[0].button("⬅️ Previous page", use_container_width=True):
+                    st.session_state.ticket_cursors.pop()
+                    st.rerun()
+            if next_cursor:
+                if nav[1].button("Next page ➡️", use_container_width=True):
+                    st.session_state.ticket_cursors.append(next_cursor)
+                    st.rerun()
         else:
-            st.error(f"Failed to fetch tickets: {r.text}")
-    except Exception as e:
-        st.error(f"Could not fetch tickets: {e}")
+            st.info("No ticket_id or status fields found in tickets.")
+    else:
+        st.info("No tickets found in database.")
 
 # === TAB 3: Chatbot ===
 with tab3:
@@ -274,20 +313,32 @@ with tab3:
         with st.chat_message("user", avatar="🧑"):
             st.markdown(user_query)
 
-        # Send to backend
+        # Stream the answer from the backend as it is generated
         with st.chat_message("assistant", avatar="🤖"):
-            with st.spinner("Thinking..."):
-                try:
-                    r = requests.post("http://127.0.0.1:8000/chat", json={"query": user_query})
-                    if r.status_code == 200:
-                        answer = r.json().get("answer", "(no response)")
-                    else:
+            placeholder = st.empty()
+            placeholder.markdown("_Thinking..._")
+            answer = ""
+            try:
+                with backend.post_chat(user_query) as r:
+                    if r.status_code != 200:
                         answer = f"❌ Backend error: {r.text}"
-                except Exception as e:
-                    answer = f"⚠️ Could not connect to backend: {e}"
+                    elif r.headers.get("Content-Type", "").startswith("text/event-stream"):
+                        for event in sse_events(r):
+                            if "delta" in event:
+                                answer += event["delta"]
+                                placeholder.markdown(answer + "▌")
+                            elif event.get("reset"):
+                                answer = ""
+                            elif "error" in event:
+                                answer = f"❌ {event['error']}"
+                    else:
+                        # Backend without streaming support: plain JSON answer
+                        answer = r.json().get("answer", "(no response)")
+            except Exception as e:
+                answer = f"⚠️ Could not connect to backend: {e}"
 
-                time.sleep(0.2)
-                st.markdown(answer)
+            answer = answer or "(no response)"
+            placeholder.markdown(answer)
 
         st.session_state.messages.append({"role": "assistant", "content": answer})
 
@@ -0,0 +1,126 @@
+"""
+Backend API client for the Streamlit dashboard (app.py).
+
+One pooled ``requests.Session`` per Streamlit server process
+(``st.cache_resource``) keeps connections to the Flask backend alive across
+reruns. Reads repeated on every rerun (health check, ticket stats, ticket
+pages) are cached with ``st.cache_data`` for a few seconds and cleared
+whenever the dashboard creates a ticket or changes a status, so users see
+their own edits immediately.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+BACKEND_URL = os.environ.get("BACKEND_URL", "http://127.0.0.1:8000")
+CACHE_TTL = float(os.environ.get("DASHBOARD_CACHE_TTL", "10"))
+TIMEOUT = 5
+POOL_SIZE = 16
+
+
+class BackendError(Exception):
+    """The backend answered with a non-200 status."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """Return the process-wide pooled session."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _request(method: str, path: str, **kwargs) -> Dict[str, Any]:
+    kwargs.setdefault("timeout", TIMEOUT)
+    r = get_session().request(method, f"{BACKEND_URL}{path}", **kwargs)
+    if r.status_code != 200:
+        raise BackendError(r.text, r.status_code)
+    return r.json()
+
+
+# --- cached reads ---
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def check_health() -> bool:
+    _request("GET", "/test")
+    return True
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def fetch_stats() -> Dict[str, Any]:
+    return _request("GET", "/ticket-stats").get("stats", {})
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def fetch_tickets(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Return one ``/tickets`` page: ``{"tickets": [...], "next_cursor": ...}``."""
+    return _request("GET", "/tickets", params=params)
+
+
+def invalidate() -> None:
+    """Drop cached stats and ticket pages after a write."""
+    fetch_stats.clear()
+    fetch_tickets.clear()
+
+
+def fetch_concurrently(**calls: Callable[[], Any]) -> Dict[str, Any]:
+    """Run independent fetches in parallel; each result is a value or the exception raised."""
+    ctx = get_script_run_ctx()
+
+    def run(fn):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        try:
+            return fn()
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        futures = {name: pool.submit(run, fn) for name, fn in calls.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+# --- uncached reads and writes ---
+
+def get_ticket(ticket_id: str) -> Dict[str, Any]:
+    return _request("GET", f"/ticket/{ticket_id}/status").get("ticket")
+
+
+def create_ticket(payload: Dict[str, Any]) -> str:
+    ticket_id = _request("POST", "/ticket", json=payload).get("ticket_id", "N/A")
+    invalidate()
+    return ticket_id
+
+
+def update_status(ticket_id: str, status: str) -> None:
+    _request("PUT", f"/ticket/{ticket_id}/status", json={"status": status})
+    invalidate()
+
+
+def update_statuses(updates: List[Dict[str, Any]], status: Optional[str] = None) -> Dict[str, Any]:
+    """PATCH many statuses in one request; returns the per-ticket results."""
+    payload: Dict[str, Any] = {"updates": updates}
+    if status:
+        payload["status"] = status
+    result = _request("PATCH", "/tickets/status", json=payload)
+    invalidate()
+    return result
+
+
+def post_chat(query: str, stream: bool = True) -> requests.Response:
+    """POST /chat; with ``stream`` the caller reads the SSE body incrementally."""
+    return get_session().post(
+        f"{BACKEND_URL}/chat", json={"query": query, "stream": stream}, stream=stream, timeout=(TIMEOUT, 300)
+    )
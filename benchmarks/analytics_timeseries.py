@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Rollup-backed /analytics/timeseries queries vs naive GROUP BY on raw tickets.
+
+Builds a throwaway SQLite database with synthetic incidents spread over a
+year, derives the rollups, then times the same range queries both ways.
+
+    python benchmarks/analytics_timeseries.py --tickets 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import TicketRollups  # noqa: E402
+from storage import INSERT_COLUMNS, Database, TicketRepository  # noqa: E402
+
+DEPARTMENTS = ["ICU", "ER", "Surgery", "Pediatrics", "Oncology", "Radiology", "Pharmacy", "Cardiology"]
+ISSUE_TYPES = ["Patient Safety", "Medication", "Infection Control", "Facility Safety", "Equipment", "Other"]
+PRIORITIES = ["Low", "Medium", "High", "Critical"]
+SEVERITIES = ["None", "Mild", "Moderate", "Severe", "Death"]
+STATUSES = ["Open", "In Progress", "Resolved", "Closed"]
+
+
+def seed(tickets, n, batch=50000):
+    rng = random.Random(42)
+    start = datetime(2025, 1, 1)
+    placeholders = ", ".join("?" for _ in INSERT_COLUMNS)
+    sql = f"INSERT INTO incidents ({', '.join(INSERT_COLUMNS)}) VALUES ({placeholders})"
+    with tickets.db.connection() as conn:
+        for offset in range(0, n, batch):
+            rows = [
+                (
+                    f"T{offset + i:09d}", "Synthetic", rng.choice(DEPARTMENTS),
+                    rng.choice(ISSUE_TYPES), "Synthetic incident", rng.choice(PRIORITIES),
+                    rng.choice(STATUSES),
+                    (start + timedelta(seconds=rng.randrange(365 * 86400))).strftime("%Y-%m-%d %H:%M:%S"),
+                    rng.choice(SEVERITIES),
+                )
+                for i in range(min(batch, n - offset))
+            ]
+            conn.executemany(sql, rows)
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rollups vs naive GROUP BY benchmark")
+    parser.add_argument("--tickets", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(backend="sqlite", sqlite_path=os.path.join(tmp, "bench.db"), probe_interval=0)
+        tickets = TicketRepository(db)
+        rollups = TicketRollups(tickets)
+        tickets.init_schema()
+
+        t0 = time.perf_counter()
+        seed(tickets, args.tickets)
+        seed_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        rollups.rebuild()
+        rebuild_s = time.perf_counter() - t0
+
+        queries = {
+            "hour, 1 week, by department": ("hour", "2025-06-02", "2025-06-09", ["department"], {}),
+            "day, 90 days, by priority": ("day", "2025-03-01", "2025-05-30", ["priority"], {}),
+            "week, full year, by issue_type": ("week", "2025-01-01", "2026-01-01", ["issue_type"], {}),
+            "day, full year, ICU severe by severity": (
+                "day", "2025-01-01", "2026-01-01", ["harm_severity"],
+                {"department": "ICU", "harm_severity": "Severe,Death"},
+            ),
+        }
+        results = {}
+        for name, (granularity, start, end, group_by, filters) in queries.items():
+            rollup_s, fast = best_of(
+                lambda: rollups.timeseries(granularity, start, end, group_by, filters), args.repeat
+            )
+            naive_s, slow = best_of(
+                lambda: rollups.naive_timeseries(granularity, start, end, group_by, filters), args.repeat
+            )
+            results[name] = {
+                "points": len(fast),
+                "matches_naive": fast == slow,
+                "rollup_ms": round(rollup_s * 1000, 2),
+                "naive_ms": round(naive_s * 1000, 2),
+                "speedup": round(naive_s / rollup_s, 1) if rollup_s else None,
+            }
+
+        print(json.dumps({
+            "tickets": args.tickets,
+            "seed_s": round(seed_s, 2),
+            "rollup_rebuild_s": round(rebuild_s, 2),
+            "queries": results,
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
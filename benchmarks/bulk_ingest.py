@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Compare N single POST /ticket calls with one POST /tickets/bulk upload.
+
+    python UI.py &
+    python benchmarks/bulk_ingest.py --tickets 2000 --batch-size 500
+"""
+
+import argparse
+import json
+import time
+
+import requests
+
+
+def make_tickets(n):
+    return [
+        {
+            "name": f"Bulk User {i}",
+            "department": "ICU",
+            "issue_type": "Patient Safety",
+            "description": f"Migrated paper incident form #{i}",
+            "priority": "Medium",
+        }
+        for i in range(n)
+    ]
+
+
+def time_single_posts(base, tickets):
+    session = requests.Session()
+    start = time.perf_counter()
+    for ticket in tickets:
+        session.post(f"{base}/ticket", json=ticket, timeout=30).raise_for_status()
+    return time.perf_counter() - start
+
+
+def time_bulk(base, tickets, batch_size, ndjson):
+    start = time.perf_counter()
+    if ndjson:
+        body = "\n".join(json.dumps(t) for t in tickets)
+        r = requests.post(
+            f"{base}/tickets/bulk",
+            params={"batch_size": batch_size},
+            data=body.encode(),
+            headers={"Content-Type": "application/x-ndjson"},
+            timeout=300,
+        )
+    else:
+        r = requests.post(
+            f"{base}/tickets/bulk", params={"batch_size": batch_size}, json=tickets, timeout=300
+        )
+    r.raise_for_status()
+    elapsed = time.perf_counter() - start
+    failed = r.json().get("failed", 0)
+    if failed:
+        print(f"⚠️ {failed} records failed in bulk upload")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk vs single ticket ingestion benchmark")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--tickets", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--ndjson", action="store_true", help="upload as NDJSON instead of a JSON array")
+    args = parser.parse_args()
+
+    base = args.base_url.rstrip("/")
+    tickets = make_tickets(args.tickets)
+
+    single = time_single_posts(base, tickets)
+    bulk = time_bulk(base, tickets, args.batch_size, args.ndjson)
+
+    print(json.dumps({
+        "tickets": args.tickets,
+        "batch_size": args.batch_size,
+        "single_posts": {"seconds": round(single, 3), "tickets_per_s": round(args.tickets / single, 1)},
+        "bulk": {"seconds": round(bulk, 3), "tickets_per_s": round(args.tickets / bulk, 1)},
+        "speedup": round(single / bulk, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
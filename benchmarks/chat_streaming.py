@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Token-level /chat streaming vs the old per-node snapshot stream.
+
+Runs a one-node LangGraph around a fake streaming chat model that sleeps
+between tokens, checks that the SSE deltas concatenate to the final answer
+(exiting non-zero if not), and compares time-to-first-token and bytes sent
+with re-sending ``messages[-1].content`` after every node update.
+
+    python benchmarks/chat_streaming.py --tokens 400 --token-delay 0.01
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+from langgraph.graph import END, START, MessagesState, StateGraph  # noqa: E402
+
+from streaming import StreamStats, sse, stream_answer  # noqa: E402
+
+
+_streaming = threading.local()
+
+
+class SlowFakeChatModel(GenericFakeChatModel):
+    """Fake model paying ``token_delay`` per token whether streamed or not."""
+
+    token_delay: float = 0.0
+
+    def _generate(self, *args, **kwargs):
+        result = super()._generate(*args, **kwargs)
+        if not getattr(_streaming, "active", False):
+            tokens = [t for t in re.split(r"(\s)", result.generations[0].message.content) if t]
+            time.sleep(self.token_delay * len(tokens))
+        return result
+
+    def _stream(self, *args, **kwargs):
+        _streaming.active = True
+        try:
+            for chunk in super()._stream(*args, **kwargs):
+                time.sleep(self.token_delay)
+                yield chunk
+        finally:
+            _streaming.active = False
+
+
+def build_graph(answer, token_delay):
+    model = SlowFakeChatModel(messages=iter([AIMessage(content=answer)] * 100), token_delay=token_delay)
+
+    def respond(state):
+        return {"messages": [model.invoke(state["messages"])]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("respond", respond)
+    builder.add_edge(START, "respond")
+    builder.add_edge("respond", END)
+    return builder.compile()
+
+
+def snapshot_stream(graph, query):
+    """The previous generate_stream(): whole message content per node update."""
+    for update in graph.stream({"messages": [HumanMessage(content=query)]}):
+        for node_state in update.values():
+            messages = node_state.get("messages", [])
+            if messages and messages[-1].content:
+                yield sse({"chunk": messages[-1].content})
+    yield sse({"done": True})
+
+
+def measure(events):
+    started = time.perf_counter()
+    first = None
+    sent = 0
+    payloads = []
+    for event in events:
+        payload = json.loads(event[len("data: "):])
+        if first is None and (payload.get("delta") or payload.get("chunk")):
+            first = time.perf_counter() - started
+        sent += len(event.encode())
+        payloads.append(payload)
+    return payloads, {
+        "ttft_ms": round(first * 1000, 1) if first is not None else None,
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        "bytes": sent,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat streaming benchmark")
+    parser.add_argument("--tokens", type=int, default=300)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    args = parser.parse_args()
+
+    answer = " ".join(f"word{i}" for i in range(args.tokens))
+    graph = build_graph(answer, args.token_delay)
+
+    completed = []
+    payloads, token_level = measure(stream_answer(graph, "q", on_complete=completed.append, stats=StreamStats()))
+    streamed = "".join(p["delta"] for p in payloads if "delta" in p)
+    ok = streamed == answer and completed == [answer] and payloads[-1].get("done")
+
+    _, snapshot = measure(snapshot_stream(graph, "q"))
+    print(json.dumps({
+        "answer_chars": len(answer),
+        "deltas_concatenate_to_answer": ok,
+        "token_level": {**token_level, "deltas": payloads[-1]["deltas"]},
+        "snapshot": snapshot,
+    }, indent=2))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
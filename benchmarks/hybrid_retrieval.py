@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation of vector, BM25 and hybrid (RRF) retrieval on JCI lookups.
+
+Each question in standard_lookups.json is labelled with the 8th-edition
+standard codes a correct chunk must mention. Reports hit@k and MRR per
+retrieval mode, plus per-stage latency, against an index built by
+build_index.py.
+
+    python benchmarks/hybrid_retrieval.py --index vector_database/vectorstore/jci_index --k 4
+"""
+
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from retrieval import RETRIEVAL_MODES, VECTORSTORE_PATH, HybridRetriever, load_vectorstore  # noqa: E402
+
+LOOKUPS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "standard_lookups.json")
+
+
+def evaluate(retriever, lookups, k, mode):
+    hits, reciprocal_ranks, latencies = 0, [], []
+    for lookup in lookups:
+        documents, timings = retriever.search(lookup["question"], k=k, mode=mode)
+        latencies.append(timings)
+        rank = next(
+            (i for i, doc in enumerate(documents, start=1)
+             if any(code in doc.page_content for code in lookup["codes"])),
+            None,
+        )
+        hits += rank is not None
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+    stages = {}
+    for stage in latencies[0]:
+        samples = sorted(t[stage] for t in latencies)
+        stages[stage] = {"p50_ms": samples[len(samples) // 2], "max_ms": samples[-1]}
+    return {
+        f"hit@{k}": round(hits / len(lookups), 3),
+        "mrr": round(sum(reciprocal_ranks) / len(lookups), 3),
+        "latency": stages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hybrid retrieval evaluation")
+    parser.add_argument("--index", default=VECTORSTORE_PATH)
+    parser.add_argument("--lookups", default=LOOKUPS)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--fetch-k", type=int, default=20)
+    parser.add_argument("--rrf-k", type=int, default=60)
+    args = parser.parse_args()
+
+    with open(args.lookups) as f:
+        lookups = json.load(f)
+    retriever = HybridRetriever(load_vectorstore(args.index), k=args.k, fetch_k=args.fetch_k, rrf_k=args.rrf_k)
+    retriever.search("warm up", k=1)
+
+    report = {"questions": len(lookups), "k": args.k, "fetch_k": args.fetch_k, "rrf_k": args.rrf_k}
+    for mode in RETRIEVAL_MODES:
+        report[mode] = evaluate(retriever, lookups, args.k, mode)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
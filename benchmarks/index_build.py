@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Throughput of the FAISS index build over the bundled JCI PDF.
+
+Each configuration does a full rebuild into a temporary directory and reports
+wall time and embedding throughput. ``--workers 0`` embeds in-process on a
+background thread (torch intra-op threads only) and is the closest to the
+old single-call build.
+
+    python benchmarks/index_build.py --workers 0 2 4 --batch-sizes 32 64 128
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from build_index import build_vectorstore  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index build throughput benchmark")
+    parser.add_argument("--pdf", default=os.path.join(ROOT, "jci standards.pdf"))
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[32, 64, 128])
+    args = parser.parse_args()
+
+    runs = []
+    for workers, batch_size in itertools.product(args.workers, args.batch_sizes):
+        with tempfile.TemporaryDirectory() as index_path:
+            stats = build_vectorstore([args.pdf], index_path=index_path, full=True,
+                                      workers=workers, batch_size=batch_size)
+        runs.append({"workers": workers, "batch_size": batch_size, **stats})
+
+    best = max(runs, key=lambda run: run["chunks_per_s"] or 0)
+    print(json.dumps({"pdf": args.pdf, "runs": runs, "best": best}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Load test: submission latency of async triage jobs as LLM latency grows.
+
+Runs the UI.py app in-process (Flask test client) against a throwaway SQLite
+database, swaps the process_ticket job handler for a fake model that sleeps
+for the given latency, and fires concurrent POST /jobs requests. Submission
+latency should stay flat while the time to drain the queue grows with the
+model latency.
+
+    python benchmarks/job_queue_latency.py --jobs 200 --latencies 0.1 1 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async job submission latency benchmark")
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latencies", type=float, nargs="+", default=[0.05, 0.5, 2.0])
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.update({
+        "DB_BACKEND": "sqlite",
+        "SQLITE_PATH": os.path.join(tmp, "bench.db"),
+        "JOBS_WORKERS": "0",  # started below, after the fake handler is in place
+        "JOBS_MAX_QUEUED": str(args.jobs * 10),
+        "JOBS_POLL_INTERVAL": "0.05",
+    })
+    import UI  # noqa: E402
+
+    latency = {"seconds": 0.0}
+
+    def fake_model(payload):
+        time.sleep(latency["seconds"])
+        return {"category": "Patient Safety", "priority": "High", "text": payload["text"][:40]}
+
+    UI.jobs.register("process_ticket", fake_model)
+    UI.jobs.start_workers(args.workers)
+
+    report = {}
+    for seconds in args.latencies:
+        latency["seconds"] = seconds
+
+        def submit(i):
+            client = UI.app.test_client()
+            start = time.perf_counter()
+            r = client.post("/jobs", json={"kind": "process_ticket", "text": f"Patient fall #{i}"})
+            return time.perf_counter() - start, r.status_code, r.get_json().get("job_id")
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            submitted = list(pool.map(submit, range(args.jobs)))
+        while UI.jobs.queue_depth() > 0 or any(
+            UI.jobs.get(job_id)["status"] == "running" for _, _, job_id in submitted[-args.workers:]
+        ):
+            time.sleep(0.05)
+        drained = time.perf_counter() - started
+
+        submit_ms = [elapsed * 1000 for elapsed, _, _ in submitted]
+        report[str(seconds)] = {
+            "accepted": sum(1 for _, status, _ in submitted if status == 202),
+            "submit_p50_ms": round(statistics.median(submit_ms), 2),
+            "submit_p99_ms": round(percentile(submit_ms, 99), 2),
+            "drain_s": round(drained, 2),
+        }
+
+    UI.jobs.stop_workers()
+    print(json.dumps({"jobs": args.jobs, "workers": args.workers, "llm_latency_s": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+Load test of the ticket and chat APIs with a concurrent mixed workload.
+
+``run`` starts UI.py in a child process against a throwaway SQLite file (or
+a scratch PostgreSQL database), seeds it with generate_incidents.py, then
+drives weighted create / list / status lookup / status update / stats /
+chat requests from ``--concurrency`` client threads for ``--duration``
+seconds. /chat is answered by a fake chat model with a fixed per-token
+delay, so the numbers measure the backend rather than an LLM provider.
+Results (req/s, p50/p95/p99 per operation and overall, plus the commit and
+settings) are written as JSON; ``compare`` diffs two such files.
+
+    python benchmarks/load_suite.py run --tickets 100000 --duration 30 --out base.json
+    git checkout my-branch
+    python benchmarks/load_suite.py run --tickets 100000 --duration 30 --out head.json
+    python benchmarks/load_suite.py compare base.json head.json --threshold 10
+
+    # Production serving (gunicorn.conf.py) instead of Flask's dev server
+    python benchmarks/load_suite.py run --server gunicorn --workers 4 --threads 8
+
+    # PostgreSQL: the named database's "incident" schema is dropped and re-seeded
+    python benchmarks/load_suite.py run --backend postgres --pg-database incidents_bench
+
+The client is a single Python process; past a few thousand req/s it becomes
+the bottleneck, so compare runs made with the same settings on one machine.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import generate_incidents  # noqa: E402
+
+DEPARTMENTS = list(generate_incidents.DEPARTMENTS)
+ISSUE_TYPES = list(generate_incidents.ISSUE_TYPES)
+PRIORITIES = list(generate_incidents.PRIORITIES)
+STATUSES = ["Open", "In Progress", "Resolved", "Closed"]
+QUERIES = [
+    "What are the JCI requirements for medication labelling?",
+    "How should a patient fall in the ICU be reported?",
+    "Which standard covers hand hygiene compliance?",
+    "What is the escalation path for a sentinel event?",
+]
+DEFAULT_MIX = "create=10,list=20,lookup=30,update=15,stats=15,chat=10,chat_stream=0"
+
+
+# --- fake LLM (runs in the server process) ---
+
+def install_fake_graph(token_delay, words):
+    """Register a one-node ``app.graph`` whose model sleeps ``token_delay`` per word."""
+    import types
+    from typing import Any, List, Optional
+
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.messages import AIMessage, AIMessageChunk
+    from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+    from langgraph.graph import END, START, MessagesState, StateGraph
+
+    answer = " ".join(f"word{i}" for i in range(words))
+
+    class FakeChatModel(BaseChatModel):
+        @property
+        def _llm_type(self) -> str:
+            return "fake-load-test"
+
+        def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+            time.sleep(token_delay * words)
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=answer))])
+
+        def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+            for i, word in enumerate(answer.split(" ")):
+                time.sleep(token_delay)
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+
+    model = FakeChatModel()
+
+    def respond(state):
+        return {"messages": [model.invoke(state["messages"])]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("respond", respond)
+    builder.add_edge(START, "respond")
+    builder.add_edge("respond", END)
+
+    package = types.ModuleType("app")
+    package.__path__ = []
+    module = types.ModuleType("app.graph")
+    module.graph = builder.compile()
+    package.graph = module
+    sys.modules["app"], sys.modules["app.graph"] = package, module
+
+
+def create_app(token_delay=0.005, words=40, real_llm=False):
+    """The UI.py Flask app, answering /chat with the fake model unless ``real_llm``.
+
+    Also the gunicorn entry point: ``load_suite:create_app(0.005, 40, False)``.
+    """
+    if not real_llm:
+        install_fake_graph(token_delay, words)
+    import UI
+
+    return UI.app
+
+
+def serve(args):
+    app = create_app(args.llm_token_delay, args.llm_words, args.real_llm)
+    app.run(host="127.0.0.1", port=args.port, threaded=True, debug=False, use_reloader=False)
+
+
+# --- database seeding (runs in the benchmark process) ---
+
+def prepare_database(args):
+    """Create and seed the benchmark database; return (env for the server, seeded ticket IDs, seconds)."""
+    env = {"DB_BACKEND": args.backend}
+    if args.backend == "postgres":
+        env["PGDATABASE"] = args.pg_database
+    else:
+        env["SQLITE_PATH"] = os.path.join(args.workdir, "load.db")
+    os.environ.update(env)
+
+    if args.backend == "postgres":
+        from storage import Database
+
+        db = Database("postgres", probe_interval=0)
+        with db.connection() as conn:
+            conn.cursor().execute("DROP SCHEMA IF EXISTS incident CASCADE")
+        db.pool.close()
+    tickets, derived = generate_incidents.open_repository(args.backend, env.get("SQLITE_PATH", ""))
+    generator = generate_incidents.IncidentGenerator(args.seed)
+    timings = generate_incidents.load(tickets, generator, args.tickets, derived)
+    tickets.db.pool.close()
+    return env, [generator.ticket_id(i) for i in range(args.tickets)], timings["total"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_name(args):
+    if args.server == "gunicorn":
+        return f"gunicorn-gthread-{args.workers}x{args.threads}"
+    return "flask-dev-threaded"
+
+
+def start_server(args, env):
+    port = free_port()
+    if args.server == "gunicorn":
+        command = [
+            sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"),
+            "--bind", f"127.0.0.1:{port}", "--workers", str(args.workers), "--threads", str(args.threads),
+            f"load_suite:create_app({args.llm_token_delay}, {args.llm_words}, {args.real_llm})",
+        ]
+    else:
+        command = [
+            sys.executable, os.path.abspath(__file__), "serve", "--port", str(port),
+            "--llm-token-delay", str(args.llm_token_delay), "--llm-words", str(args.llm_words),
+        ]
+        if args.real_llm:
+            command.append("--real-llm")
+    server_env = {
+        **os.environ, **env,
+        "PYTHONPATH": os.pathsep.join([ROOT, os.path.dirname(os.path.abspath(__file__))]),
+        "RETRIEVAL_WARMUP": "0",
+        "SIMILAR_SEARCH": "0",
+        "AUTO_TRIAGE": "0",
+        "DB_PROBE_INTERVAL": "0",
+    }
+    log = open(os.path.join(args.workdir, "server.log"), "w")
+    # cwd: UI.py puts its LLM cache file in the working directory
+    process = subprocess.Popen(command, cwd=args.workdir, env=server_env, stdout=log, stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with {process.returncode}; see {log.name}")
+        try:
+            if requests.get(f"{base}/healthz", timeout=1).ok:
+                return process, base
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Server did not become healthy; see {log.name}")
+
+
+# --- workload ---
+
+class Workload:
+    """The operations of the mix; each returns True when the response was a success."""
+
+    def __init__(self, base, ticket_ids):
+        self.base = base
+        self.ticket_ids = ticket_ids  # appended to by create (list.append is atomic)
+        self.ttft = []
+
+    def create(self, session, rng):
+        ticket = {
+            "name": f"Load User {rng.randrange(500)}",
+            "department": rng.choice(DEPARTMENTS),
+            "issue_type": rng.choice(ISSUE_TYPES),
+            "description": "Incident reported during load test",
+            "priority": rng.choice(PRIORITIES),
+        }
+        r = session.post(f"{self.base}/ticket", json=ticket, timeout=30)
+        if r.ok:
+            self.ticket_ids.append(r.json()["ticket_id"])
+        return r.ok
+
+    def list(self, session, rng):
+        params = {"limit": 50}
+        if rng.random() < 0.5:
+            params["department"] = rng.choice(DEPARTMENTS)
+        return session.get(f"{self.base}/tickets", params=params, timeout=30).ok
+
+    def lookup(self, session, rng):
+        ticket_id = rng.choice(self.ticket_ids)
+        return session.get(f"{self.base}/ticket/{ticket_id}/status", timeout=30).ok
+
+    def update(self, session, rng):
+        ticket_id = rng.choice(self.ticket_ids)
+        r = session.put(f"{self.base}/ticket/{ticket_id}/status", json={"status": rng.choice(STATUSES)}, timeout=30)
+        return r.ok
+
+    def stats(self, session, rng):
+        return session.get(f"{self.base}/ticket-stats", timeout=30).ok
+
+    def chat(self, session, rng):
+        r = session.post(f"{self.base}/chat", json={"query": rng.choice(QUERIES), "use_cache": False}, timeout=120)
+        return r.ok and "error" not in r.json()
+
+    def chat_stream(self, session, rng):
+        started = time.perf_counter()
+        payload = {"query": rng.choice(QUERIES), "use_cache": False, "stream": True}
+        with session.post(f"{self.base}/chat", json=payload, stream=True, timeout=120) as r:
+            first = None
+            ok = r.ok
+            for line in r.iter_lines():
+                if first is None and line.startswith(b"data:"):
+                    first = time.perf_counter() - started
+                if line.startswith(b"data:") and b'"error"' in line:
+                    ok = False
+        if first is not None:
+            self.ttft.append(first)
+        return ok
+
+
+def parse_mix(text):
+    mix = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise SystemExit(f"Unknown operation {name!r}; choose from {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise SystemExit("The mix needs at least one operation with a positive weight")
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+OPERATIONS = [name for name in vars(Workload) if not name.startswith("_")]
+
+
+def drive(workload, mix, concurrency, seconds, seed):
+    """Run the mix from ``concurrency`` threads; return [(operation, seconds, ok)]."""
+    names, weights = list(mix), list(mix.values())
+    deadline = time.perf_counter() + seconds
+    samples = [[] for _ in range(concurrency)]
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        session = requests.Session()
+        out = samples[index]
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                ok = getattr(workload, name)(session, rng)
+            except requests.RequestException:
+                ok = False
+            out.append((name, time.perf_counter() - started, ok))
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [sample for thread_samples in samples for sample in thread_samples], time.perf_counter() - started
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def summarize(latencies, errors, wall):
+    latencies = sorted(latencies)
+    ms = lambda value: round(value * 1000, 2) if value is not None else None  # noqa: E731
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "req_per_s": round(len(latencies) / wall, 1),
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+    }
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    cwd=ROOT, capture_output=True, text=True).stdout.strip())
+        return {"commit": commit or None, "dirty": dirty}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+def run(args):
+    if args.backend == "postgres" and not args.pg_database:
+        raise SystemExit("--backend postgres needs --pg-database (a scratch database; its incident schema is dropped)")
+    mix = parse_mix(args.mix)
+    args.workdir = tempfile.mkdtemp(prefix="load_suite_")
+    with contextlib.redirect_stdout(sys.stderr):  # keep stdout for the JSON result
+        env, ticket_ids, seed_seconds = prepare_database(args)
+    print(f"🌱 Seeded {len(ticket_ids)} incidents in {seed_seconds:.1f}s ({args.backend})", file=sys.stderr)
+    if not ticket_ids:
+        for name in ("lookup", "update"):  # nothing to hit until create has run
+            mix.pop(name, None)
+
+    process, base = start_server(args, env)
+    try:
+        workload = Workload(base, ticket_ids)
+        if args.warmup > 0:
+            drive(workload, mix, args.concurrency, args.warmup, args.seed + 1)
+            workload.ttft.clear()
+        print(f"🚦 {args.concurrency} clients for {args.duration:g}s: {mix}", file=sys.stderr)
+        samples, wall = drive(workload, mix, args.concurrency, args.duration, args.seed)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    operations = {}
+    for name in mix:
+        own = [(seconds, ok) for op, seconds, ok in samples if op == name]
+        operations[name] = summarize([s for s, _ in own], sum(1 for _, ok in own if not ok), wall)
+    if workload.ttft:
+        operations["chat_stream"]["ttft_p50_ms"] = round(percentile(sorted(workload.ttft), 50) * 1000, 2)
+        operations["chat_stream"]["ttft_p95_ms"] = round(percentile(sorted(workload.ttft), 95) * 1000, 2)
+    total = summarize([s for _, s, _ in samples], sum(1 for *_, ok in samples if not ok), wall)
+
+    result = {
+        "meta": {
+            **git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "server": server_name(args),
+            "backend": args.backend,
+            "tickets": args.tickets,
+            "seed": args.seed,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "mix": mix,
+            "fake_llm": None if args.real_llm else {"token_delay_s": args.llm_token_delay, "words": args.llm_words},
+            "seed_seconds": round(seed_seconds, 2),
+        },
+        "total": total,
+        "operations": operations,
+    }
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+    error_rate = total["errors"] / max(1, total["requests"])
+    if error_rate > args.max_error_rate:
+        print(f"❌ Error rate {error_rate:.2%} above {args.max_error_rate:.2%}; see {args.workdir}/server.log",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+# --- comparing runs ---
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    def change(old, new):
+        return round((new - old) / old * 100, 1) if old and new is not None else None
+
+    rows = {}
+    regressions = []
+    names = ["total"] + [name for name in head["operations"] if name in base["operations"]]
+    for name in names:
+        old = base["total"] if name == "total" else base["operations"][name]
+        new = head["total"] if name == "total" else head["operations"][name]
+        rows[name] = {
+            "req_per_s": [old["req_per_s"], new["req_per_s"], change(old["req_per_s"], new["req_per_s"])],
+            "p95_ms": [old["p95_ms"], new["p95_ms"], change(old["p95_ms"], new["p95_ms"])],
+            "p99_ms": [old["p99_ms"], new["p99_ms"], change(old["p99_ms"], new["p99_ms"])],
+        }
+        throughput, p95 = rows[name]["req_per_s"][2], rows[name]["p95_ms"][2]
+        if (throughput is not None and throughput < -args.threshold) or (p95 is not None and p95 > args.threshold):
+            regressions.append(name)
+
+    for key in ("backend", "tickets", "concurrency", "duration_s", "mix", "server"):
+        if base["meta"].get(key) != head["meta"].get(key):
+            print(f"⚠️ Runs differ in {key}: {base['meta'].get(key)} vs {head['meta'].get(key)}", file=sys.stderr)
+
+    print(json.dumps({
+        "base": base["meta"].get("commit"),
+        "head": head["meta"].get("commit"),
+        "columns": ["base", "head", "change_%"],
+        "operations": rows,
+        "regressions": regressions,
+    }, indent=2))
+    if regressions:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="seed, start the backend and drive the workload")
+    run_parser.add_argument("--server", choices=["flask", "gunicorn"], default="flask",
+                            help="Flask's threaded dev server or gunicorn.conf.py")
+    run_parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    run_parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    run_parser.add_argument("--backend", choices=["sqlite", "postgres"], default="sqlite")
+    run_parser.add_argument("--pg-database", help="scratch PostgreSQL database (PGHOST/PGUSER/... from the env)")
+    run_parser.add_argument("--tickets", type=int, default=10000, help="incidents to seed")
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--duration", type=float, default=20, help="measured seconds")
+    run_parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds first")
+    run_parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation=weight,... (default {DEFAULT_MIX})")
+    run_parser.add_argument("--max-error-rate", type=float, default=0.01, help="exit 1 above this")
+    run_parser.add_argument("--out", help="also write the JSON result here")
+
+    serve_parser = commands.add_parser("serve", help=argparse.SUPPRESS)
+    serve_parser.add_argument("--port", type=int, required=True)
+    for sub in (run_parser, serve_parser):
+        sub.add_argument("--llm-token-delay", type=float, default=0.005, help="fake model seconds per word")
+        sub.add_argument("--llm-words", type=int, default=40, help="fake model answer length")
+        sub.add_argument("--real-llm", action="store_true", help="use app.graph instead of the fake model")
+
+    compare_parser = commands.add_parser("compare", help="diff two run results")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.add_argument("--threshold", type=float, default=10,
+                                help="percent drop in req/s or rise in p95 that counts as a regression")
+
+    args = parser.parse_args()
+    {"run": run, "serve": serve, "compare": compare}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Cost of the /metrics instrumentation.
+
+Times the recording primitives and the per-request HTTP hooks in isolation,
+then serves the same requests through the Flask test client (no network,
+throwaway SQLite database) with the hooks attached and detached, alternating
+for several rounds and reporting medians; on a busy machine the end-to-end
+difference is within run-to-run noise, so ``hooks_only`` is the figure to
+trust. DB pool timings are recorded in both
+cases; their cost is a few histogram observations per transaction (see
+``primitives``).
+
+    python benchmarks/metrics_overhead.py --requests 3000 --rounds 7
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SAMPLE_TICKET = {
+    "name": "Benchmark User",
+    "department": "ICU",
+    "issue_type": "Patient Safety",
+    "description": "Benchmark ticket",
+    "priority": "Medium",
+}
+
+
+def per_call_ns(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return round((time.perf_counter() - start) / n * 1e9, 1)
+
+
+def primitives(n):
+    import metrics
+
+    histogram = metrics.Histogram("bench_seconds", "benchmark", ("route", "status"))
+    child = histogram.labels("/tickets", 200)
+    counter = metrics.Counter("bench_total", "benchmark", ("route",)).labels("/tickets")
+    return {
+        "histogram_observe_ns": per_call_ns(lambda: child.observe(0.0123), n),
+        "histogram_labels_observe_ns": per_call_ns(lambda: histogram.labels("/tickets", 200).observe(0.0123), n),
+        "counter_inc_ns": per_call_ns(counter.inc, n),
+    }
+
+
+def requests_us(n, rounds):
+    os.environ.update(METRICS_ENABLED="1", DB_BACKEND="sqlite", RETRIEVAL_WARMUP="0", SIMILAR_SEARCH="0")
+    os.environ.setdefault("SQLITE_PATH", os.path.join(tempfile.mkdtemp(), "bench.db"))
+    import UI
+
+    hooks = (
+        (UI.app.before_request_funcs[None], UI._start_request_timer),
+        (UI.app.after_request_funcs[None], UI._record_request),
+        (UI.app.teardown_request_funcs[None], UI._finish_request),
+    )
+    # The hooks alone, without the rest of the request around them
+    response = UI.Response("ok")
+    with UI.app.test_request_context("/tickets"):
+        UI.request.url_rule = UI.app.url_map.bind("localhost").match("/tickets", return_rule=True)[0]
+        hook_us = per_call_ns(
+            lambda: (UI._start_request_timer(), UI._record_request(response), UI._finish_request(None)), n * 10
+        ) / 1000
+
+    client = UI.app.test_client()
+    ticket_id = client.post("/ticket", json=SAMPLE_TICKET).get_json()["ticket_id"]
+    endpoints = {
+        "GET /healthz": lambda: client.get("/healthz"),
+        "GET /ticket/<id>/status": lambda: client.get(f"/ticket/{ticket_id}/status"),
+        "GET /tickets": lambda: client.get("/tickets?limit=20"),
+    }
+    results = {"hooks_only": round(hook_us, 2)}
+    for name, call in endpoints.items():
+        timings = {"metrics_on": [], "metrics_off": []}
+        for _ in range(min(n, 500)):  # warm up
+            call()
+        for round_ in range(rounds):
+            # Alternate which runs first so drift does not favour either side
+            for enabled in ((False, True) if round_ % 2 else (True, False)):
+                if not enabled:
+                    for hook_list, hook in hooks:
+                        hook_list.remove(hook)
+                timings["metrics_on" if enabled else "metrics_off"].append(per_call_ns(call, n) / 1000)
+                if not enabled:
+                    for hook_list, hook in hooks:
+                        hook_list.append(hook)
+        on, off = (statistics.median(timings[key]) for key in ("metrics_on", "metrics_off"))
+        results[name] = {"metrics_on": round(on, 1), "metrics_off": round(off, 1), "overhead_us": round(on - off, 1)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Metrics instrumentation overhead")
+    parser.add_argument("--requests", type=int, default=3000, help="requests per endpoint per round")
+    parser.add_argument("--rounds", type=int, default=7)
+    args = parser.parse_args()
+
+    print(json.dumps({
+        "primitives": primitives(200_000),
+        "us_per_request": requests_us(args.requests, args.rounds),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
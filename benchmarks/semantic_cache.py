@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Hit rate of the semantic /chat cache on a paraphrase set.
+
+Each group below is one question followed by paraphrases a clinician might
+type. The first form is cached; the paraphrases should hit it, and the
+unrelated control questions should not. Near misses differ from a cached
+question only in the standard code or number and must never hit. Run with
+several thresholds to pick CHAT_CACHE_THRESHOLD.
+
+    python benchmarks/semantic_cache.py --thresholds 0.85 0.9 0.92 0.95
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semantic_cache import SemanticCache, default_embedder  # noqa: E402
+
+PARAPHRASES = [
+    ["What is the JCI hand hygiene standard?", "JCI hand hygiene standard?",
+     "what is the jci standard for hand hygiene", "Which JCI standard covers hand hygiene?"],
+    ["How do I report a medication error?", "how to report a medication error",
+     "What's the process for reporting medication errors?", "Steps to report a medication error"],
+    ["What does IPSG.1 require?", "IPSG.1 requirements", "what are the requirements of IPSG 1",
+     "Explain IPSG.1"],
+    ["What does MOI.1 cover?", "MOI.1 scope", "what is covered by MOI 1", "Explain MOI.1"],
+    ["How should a patient fall be triaged?", "triage steps for a patient fall",
+     "What do I do after a patient falls?", "patient fall triage"],
+    ["What are the JCI requirements for high-alert medications?",
+     "JCI rules for high alert medications", "high-alert medication requirements under JCI",
+     "How does JCI treat high-alert meds?"],
+    ["When must a sentinel event be reported?", "sentinel event reporting deadline",
+     "How quickly do we report a sentinel event?", "timeline for reporting sentinel events"],
+]
+CONTROLS = [
+    "How do I dispose of sharps waste?",
+    "What is the visiting policy for the ICU?",
+    "Who approves staff overtime?",
+    "How often is fire safety equipment inspected?",
+]
+NEAR_MISSES = [
+    "What does IPSG.2 require?",
+    "IPSG.1.1 requirements",
+    "what are the requirements of IPSG 6",
+    "What does MOI.2 cover?",
+    "Explain MOI.11",
+    "What does PCI.1 require?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Semantic cache paraphrase benchmark")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.85, 0.9, 0.92, 0.95])
+    args = parser.parse_args()
+
+    embed = default_embedder()
+    embed("warm up")
+
+    report = {}
+    for threshold in args.thresholds:
+        cache = SemanticCache(embed=embed, threshold=threshold)
+        for group in PARAPHRASES:
+            cache.set(group[0], f"answer: {group[0]}")
+        cache.hits = cache.misses = 0
+
+        correct = wrong = 0
+        start = time.perf_counter()
+        for group in PARAPHRASES:
+            for paraphrase in group[1:]:
+                match = cache.lookup(paraphrase)
+                if match and match["query"] == group[0]:
+                    correct += 1
+                elif match:
+                    wrong += 1
+        false_hits = sum(1 for question in CONTROLS if cache.lookup(question))
+        near_miss_hits = [question for question in NEAR_MISSES if cache.lookup(question)]
+        lookups = sum(len(g) - 1 for g in PARAPHRASES) + len(CONTROLS) + len(NEAR_MISSES)
+        elapsed = time.perf_counter() - start
+
+        paraphrases = sum(len(g) - 1 for g in PARAPHRASES)
+        report[str(threshold)] = {
+            "paraphrase_hit_rate": round(correct / paraphrases, 3),
+            "wrong_answer_hits": wrong,
+            "control_false_hits": false_hits,
+            "near_miss_false_hits": near_miss_hits,
+            "lookup_ms": round(elapsed / lookups * 1000, 2),
+            "stats": cache.stats(),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
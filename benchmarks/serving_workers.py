@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Throughput and latency of the backend vs gunicorn worker count.
+
+Runs benchmarks/load_suite.py once with Flask's threaded dev server as the
+baseline and once per ``--workers`` value under gunicorn.conf.py, same
+seed, data and mix each time, and prints one JSON summary. The default mix
+includes /chat against the fake model, whose per-word sleeps release the
+GIL, so threads matter as well as processes; use ``--mix`` for CPU-bound
+ticket traffic only. Scaling past the machine's cores (and past what the
+single-process load client can send) is not expected.
+
+    python benchmarks/serving_workers.py --workers 1,2,4,8 --threads 8 --duration 20
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+LOAD_SUITE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "load_suite.py")
+
+
+def run_once(args, server, workers=None):
+    out = tempfile.NamedTemporaryFile(suffix=".json", delete=False).name
+    command = [
+        sys.executable, LOAD_SUITE, "run", "--server", server,
+        "--tickets", str(args.tickets), "--concurrency", str(args.concurrency),
+        "--duration", str(args.duration), "--warmup", str(args.warmup), "--out", out,
+    ]
+    if workers is not None:
+        command += ["--workers", str(workers), "--threads", str(args.threads)]
+    if args.mix:
+        command += ["--mix", args.mix]
+    print(f"⏱️ {server} {workers or ''}", file=sys.stderr)
+    subprocess.run(command, stdout=subprocess.DEVNULL, check=False)
+    with open(out) as f:
+        result = json.load(f)
+    os.unlink(out)
+    return {
+        "server": result["meta"]["server"],
+        "workers": workers or 1,
+        **{key: result["total"][key] for key in ("req_per_s", "p50_ms", "p95_ms", "p99_ms", "errors")},
+        "req_per_s_by_operation": {name: op["req_per_s"] for name, op in result["operations"].items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend throughput vs gunicorn worker count")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--threads", type=int, default=8, help="threads per worker")
+    parser.add_argument("--tickets", type=int, default=50000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--mix", help="load_suite operation mix (default: its own)")
+    args = parser.parse_args()
+
+    runs = [run_once(args, "flask")]
+    for workers in (int(w) for w in args.workers.split(",") if w.strip()):
+        runs.append(run_once(args, "gunicorn", workers))
+
+    baseline = runs[0]["req_per_s"]
+    for run in runs:
+        run["speedup_vs_dev_server"] = round(run["req_per_s"] / baseline, 2) if baseline else None
+    print(json.dumps({
+        "cpus": os.cpu_count(),
+        "threads_per_worker": args.threads,
+        "concurrency": args.concurrency,
+        "runs": runs,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
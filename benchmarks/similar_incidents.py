@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Query latency of similar-incident search at 100k+ tickets.
+
+Seeds a throwaway SQLite database with synthetic incident descriptions,
+syncs the description index, then times /tickets/search and
+/tickets/<id>/similar lookups with and without metadata filters. The default
+hashing embedder keeps seeding fast and isolates index/SQL cost; pass
+``--embedder minilm`` to embed with the production model (slow to sync on CPU).
+
+    python benchmarks/similar_incidents.py --tickets 100000 --queries 200
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from similar import SimilarIncidents  # noqa: E402
+from storage import INSERT_COLUMNS, Database, TicketRepository  # noqa: E402
+
+DEPARTMENTS = ["ICU", "ER", "Surgery", "Pediatrics", "Oncology", "Radiology", "Pharmacy", "Cardiology"]
+ISSUE_TYPES = ["Patient Safety", "Medication", "Infection Control", "Facility Safety", "Equipment", "Other"]
+EVENTS = [
+    "patient fall near the bed", "wrong medication dose administered", "infusion pump alarm failure",
+    "hand hygiene not performed", "patient identification error", "delayed lab result escalation",
+    "pressure injury found on sacrum", "needle stick injury to nurse", "oxygen supply interrupted",
+    "allergy not documented before antibiotic", "wet floor slip in corridor", "surgical count discrepancy",
+]
+DETAILS = [
+    "during night shift", "after transfer from ER", "while staff were short", "on a weekend",
+    "reported by family member", "no harm observed", "required additional monitoring", "escalated to charge nurse",
+]
+QUERIES = ["patient fell out of bed", "medication given at wrong dose", "pump alarm did not sound",
+           "staff skipped hand washing", "wrong patient wristband", "slipped on wet floor"]
+
+
+class HashingEmbeddings:
+    """Deterministic bag-of-words random projection with MiniLM's dimension."""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def embed_query(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            seed = int(hashlib.md5(word.encode()).hexdigest()[:8], 16)
+            vector += np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def seed(tickets, n, batch=50000):
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    placeholders = ", ".join("?" for _ in INSERT_COLUMNS)
+    sql = f"INSERT INTO incidents ({', '.join(INSERT_COLUMNS)}) VALUES ({placeholders})"
+    with tickets.db.connection() as conn:
+        for offset in range(0, n, batch):
+            rows = [
+                (
+                    f"T{offset + i:09d}", "Synthetic", rng.choice(DEPARTMENTS), rng.choice(ISSUE_TYPES),
+                    f"{rng.choice(EVENTS)} {rng.choice(DETAILS)}", "Medium", "Open",
+                    (start + timedelta(seconds=rng.randrange(2 * 365 * 86400))).strftime("%Y-%m-%d %H:%M:%S"),
+                    "None",
+                )
+                for i in range(min(batch, n - offset))
+            ]
+            conn.executemany(sql, rows)
+
+
+def latency(fn, args_list):
+    timings = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+    return {
+        "p50_ms": round(float(np.percentile(timings, 50)) * 1000, 2),
+        "p99_ms": round(float(np.percentile(timings, 99)) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Similar-incident search benchmark")
+    parser.add_argument("--tickets", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--embedder", choices=["hash", "minilm"], default="hash")
+    args = parser.parse_args()
+
+    embeddings = HashingEmbeddings() if args.embedder == "hash" else None
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(backend="sqlite", sqlite_path=os.path.join(tmp, "bench.db"), probe_interval=0)
+        tickets = TicketRepository(db)
+        similar = SimilarIncidents(tickets, embeddings=embeddings, enabled=False)
+        tickets.init_schema()
+        seed(tickets, args.tickets)
+        sync = similar.sync()
+
+        # A fresh process only loads the stored vectors
+        reload = SimilarIncidents(TicketRepository(db), embeddings=embeddings, enabled=False).sync()
+
+        queries = [rng.choice(QUERIES) for _ in range(args.queries)]
+        ticket_ids = [f"T{rng.randrange(args.tickets):09d}" for _ in range(args.queries)]
+        department = {"department": "ICU"}
+        narrow = {"department": "ICU", "issue_type": "Medication",
+                  "created_from": "2025-01-01", "created_to": "2025-03-31"}
+        report = {
+            "tickets": args.tickets,
+            "embedder": args.embedder,
+            "k": args.k,
+            "sync": sync,
+            "reload_in_new_process": reload,
+            "search": latency(lambda q: similar.search(q, args.k), [(q,) for q in queries]),
+            "search_department": latency(lambda q: similar.search(q, args.k, department), [(q,) for q in queries]),
+            "search_narrow": latency(lambda q: similar.search(q, args.k, narrow), [(q,) for q in queries]),
+            "similar": latency(lambda t: similar.similar(t, args.k), [(t,) for t in ticket_ids]),
+            "similar_department": latency(lambda t: similar.similar(t, args.k, department),
+                                          [(t,) for t in ticket_ids]),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Compare N single PUT /ticket/<id>/status calls with one PATCH /tickets/status.
+
+Creates 2 x N tickets through /tickets/bulk, closes the first N one PUT at a
+time and the second N in a single PATCH (with optimistic updated_at checks).
+
+    python UI.py &
+    python benchmarks/status_batch.py --tickets 200
+"""
+
+import argparse
+import json
+import time
+
+import requests
+
+
+def create_tickets(session, base, n):
+    tickets = [
+        {
+            "name": f"Audit User {i}",
+            "department": "Radiology",
+            "issue_type": "Equipment",
+            "description": f"Resolved during audit #{i}",
+            "priority": "Low",
+        }
+        for i in range(n)
+    ]
+    r = session.post(f"{base}/tickets/bulk", json=tickets, timeout=300)
+    r.raise_for_status()
+    return [result["ticket_id"] for result in r.json()["results"]]
+
+
+def updated_at(session, base, ticket_ids):
+    wanted = set(ticket_ids)
+    seen = {}
+    params = {"limit": 500, "fields": "ticket_id,updated_at", "department": "Radiology"}
+    while len(seen) < len(wanted):
+        page = session.get(f"{base}/tickets", params=params, timeout=30).json()
+        seen.update({t["ticket_id"]: t["updated_at"] for t in page["tickets"] if t["ticket_id"] in wanted})
+        if not page.get("next_cursor"):
+            break
+        params["cursor"] = page["next_cursor"]
+    return seen
+
+
+def time_single_puts(session, base, ticket_ids):
+    start = time.perf_counter()
+    for ticket_id in ticket_ids:
+        session.put(f"{base}/ticket/{ticket_id}/status", json={"status": "Closed"}, timeout=30).raise_for_status()
+    return time.perf_counter() - start
+
+
+def time_batch(session, base, ticket_ids, seen):
+    updates = [{"ticket_id": t, "expected_updated_at": seen.get(t)} for t in ticket_ids]
+    start = time.perf_counter()
+    r = session.patch(f"{base}/tickets/status", json={"status": "Closed", "updates": updates}, timeout=300)
+    r.raise_for_status()
+    elapsed = time.perf_counter() - start
+    failed = r.json().get("failed", 0)
+    if failed:
+        print(f"⚠️ {failed} updates failed in batch")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch vs single status update benchmark")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--tickets", type=int, default=200)
+    args = parser.parse_args()
+
+    base = args.base_url.rstrip("/")
+    session = requests.Session()
+    ticket_ids = create_tickets(session, base, 2 * args.tickets)
+    singles, batched = ticket_ids[:args.tickets], ticket_ids[args.tickets:]
+
+    single = time_single_puts(session, base, singles)
+    batch = time_batch(session, base, batched, updated_at(session, base, batched))
+
+    print(json.dumps({
+        "tickets": args.tickets,
+        "single_puts": {"seconds": round(single, 3), "round_trips": args.tickets},
+        "batch_patch": {"seconds": round(batch, 3), "round_trips": 1},
+        "speedup": round(single / batch, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Requests/sec benchmark for the ticket endpoints of a running backend.
+
+Run it once against the old build and once against the new one, e.g.
+
+    python UI.py &                      # on the commit you want to measure
+    python benchmarks/ticket_endpoints.py --requests 2000 --concurrency 16
+
+and compare the printed req/s (or the --json output) between the two runs.
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+SAMPLE_TICKET = {
+    "name": "Benchmark User",
+    "department": "ICU",
+    "issue_type": "Patient Safety",
+    "description": "Benchmark ticket",
+    "priority": "Medium",
+}
+
+
+def run_endpoint(session_factory, method, url, total, concurrency, payload=None):
+    """Fire ``total`` requests at ``url`` from ``concurrency`` threads."""
+    local = threading.local()
+    latencies = []
+    errors = 0
+
+    def one(_):
+        if not hasattr(local, "session"):
+            local.session = session_factory()
+        session = local.session
+        start = time.perf_counter()
+        r = session.request(method, url, json=payload, timeout=30)
+        return time.perf_counter() - start, r.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for elapsed, status in pool.map(one, range(total)):
+            latencies.append(elapsed)
+            if status >= 400:
+                errors += 1
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "req_per_s": round(total / wall, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    base = args.base_url.rstrip("/")
+    r = requests.post(f"{base}/ticket", json=SAMPLE_TICKET, timeout=10)
+    r.raise_for_status()
+    ticket_id = r.json()["ticket_id"]
+
+    endpoints = [
+        ("GET /ticket/<id>/status", "GET", f"{base}/ticket/{ticket_id}/status", None),
+        ("PUT /ticket/<id>/status", "PUT", f"{base}/ticket/{ticket_id}/status", {"status": "In Progress"}),
+        ("GET /ticket-stats", "GET", f"{base}/ticket-stats", None),
+        ("GET /tickets", "GET", f"{base}/tickets", None),
+        ("POST /ticket", "POST", f"{base}/ticket", SAMPLE_TICKET),
+    ]
+
+    results = {}
+    for name, method, url, payload in endpoints:
+        results[name] = run_endpoint(
+            requests.Session, method, url, args.requests, args.concurrency, payload
+        )
+        if not args.json:
+            res = results[name]
+            print(f"{name:28} {res['req_per_s']:>9} req/s  "
+                  f"p50 {res['p50_ms']:>7} ms  p99 {res['p99_ms']:>7} ms  errors {res['errors']}")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
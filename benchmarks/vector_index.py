@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Recall@k, query latency and memory of each FAISS index type against flat.
+
+Vectors come from an existing index built by build_index.py (``--from-index``)
+or, by default, from a synthetic clustered set with MiniLM's dimension so the
+corpus can be scaled to the size we expect once years of incidents are
+indexed. Queries are held-out vectors with a little noise; ground truth is
+the exact flat search.
+
+    python benchmarks/vector_index.py --n 200000 --queries 1000 --k 10
+    python benchmarks/vector_index.py --from-index vector_database/vectorstore/jci_index
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import faiss  # noqa: E402
+import numpy as np  # noqa: E402
+
+from build_index import INDEX_TYPES, configure_search, make_index, train_index  # noqa: E402
+
+
+def synthetic_vectors(n, dim, clusters, seed):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim)).astype(np.float32)
+    points = centres[rng.integers(clusters, size=n)] + 0.35 * rng.normal(size=(n, dim)).astype(np.float32)
+    return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+
+def index_vectors(index_path):
+    index = faiss.read_index(os.path.join(index_path, "index.faiss"))
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def percentile(values, pct):
+    return round(float(np.percentile(values, pct)) * 1000, 3)
+
+
+def measure(index, corpus, queries, truth, k):
+    started = time.perf_counter()
+    trained_on = train_index(index, corpus)
+    index.add(corpus)
+    build_s = time.perf_counter() - started
+
+    latencies = []
+    found = []
+    for query in queries:
+        started = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - started)
+        found.append(ids[0])
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    return {
+        "trained_on": trained_on,
+        "build_s": round(build_s, 3),
+        f"recall@{k}": round(float(recall), 4),
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "memory_mb": round(faiss.serialize_index(index).nbytes / 2**20, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS index type benchmark")
+    parser.add_argument("--from-index", help="reuse vectors from a build_index.py index directory")
+    parser.add_argument("--n", type=int, default=100000, help="synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    faiss.omp_set_num_threads(1)  # per-query latency, as in the request path
+
+    if args.from_index:
+        vectors = index_vectors(args.from_index)
+    else:
+        vectors = synthetic_vectors(args.n + args.queries, args.dim, args.clusters, args.seed)
+    rng = np.random.default_rng(args.seed)
+    order = rng.permutation(len(vectors))
+    corpus = np.ascontiguousarray(vectors[order[args.queries:]])
+    queries = vectors[order[:args.queries]]
+    queries = np.ascontiguousarray(queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32))
+
+    exact = faiss.IndexFlatL2(corpus.shape[1])
+    exact.add(corpus)
+    _, truth = exact.search(queries, args.k)
+
+    results = {}
+    for index_type in args.types:
+        index, meta = make_index(corpus.shape[1], len(corpus), index_type)
+        configure_search(index, meta)
+        results[index_type] = {"factory": meta["factory"], **measure(index, corpus, queries, truth, args.k)}
+
+    print(json.dumps({
+        "corpus": len(corpus),
+        "dim": corpus.shape[1],
+        "queries": len(queries),
+        "k": args.k,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,450 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
 import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.document_loaders import PyMuPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
+
+from retrieval import MANIFEST_NAME, MODEL, VECTORSTORE_PATH, configure_search, load_manifest, save_compact
 
 
 PDF_PATH = "vector_database/jci standards.pdf"
-VECTORSTORE_PATH = "vector_database/vectorstore/jci_index"
-MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 50
+EMBED_BATCH_SIZE = int(os.environ.get("INDEX_EMBED_BATCH_SIZE", "64"))
+EMBED_WORKERS = int(os.environ.get("INDEX_EMBED_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# FAISS index layout: flat (exact), ivf_flat, hnsw or ivf_pq
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+INDEX_TYPE = os.environ.get("INDEX_TYPE", "flat")
+INDEX_NLIST = int(os.environ.get("INDEX_NLIST", "0"))  # 0 = ~4*sqrt(n)
+INDEX_NPROBE = int(os.environ.get("INDEX_NPROBE", "16"))
+INDEX_HNSW_M = int(os.environ.get("INDEX_HNSW_M", "32"))
+INDEX_EF_CONSTRUCTION = int(os.environ.get("INDEX_EF_CONSTRUCTION", "80"))
+INDEX_EF_SEARCH = int(os.environ.get("INDEX_EF_SEARCH", "64"))
+INDEX_PQ_M = int(os.environ.get("INDEX_PQ_M", "48"))  # sub-quantizers; must divide the dimension
+INDEX_TRAIN_SIZE = int(os.environ.get("INDEX_TRAIN_SIZE", "50000"))
+# FAISS warns below ~39 training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+# Source PDFs indexed together (JCI, HA, internal SOPs...), comma-separated
+SOURCES = [p.strip() for p in os.environ.get("INDEX_SOURCES", PDF_PATH).split(",") if p.strip()]
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(source, text, occurrence=0):
+    """Content-addressed docstore ID: changes exactly when the chunk's text does.
+
+    Position is left out so inserting or removing a page keeps the IDs of
+    every other chunk; ``occurrence`` only tells apart repeats of the same
+    text within one source.
+    """
+    return _sha256(f"{source}\0{occurrence}\0{text}".encode())[:32]
+
+
+def save_manifest(index_path, manifest):
+    path = os.path.join(index_path, MANIFEST_NAME)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def save_index(vectorstore, index_path):
+    """Write ``index.faiss``/``index.pkl`` to temp files and swap them in.
+
+    Servers memory-map ``index.faiss``; rewriting it in place would tear
+    their mapping, while a replaced file keeps the old inode alive for them.
+    """
+    vectorstore.save_local(index_path, index_name="index.tmp")
+    for ext in ("faiss", "pkl"):
+        os.replace(os.path.join(index_path, f"index.tmp.{ext}"), os.path.join(index_path, f"index.{ext}"))
+
+
+def new_manifest():
+    return {
+        "model": MODEL,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "index": {"type": "flat"},
+        "sources": {},
+    }
+
+
+def make_index(dim, n, index_type=INDEX_TYPE):
+    """Return an untrained FAISS index for ``n`` vectors and the metadata describing it.
+
+    Approximate layouts fall back to flat when ``n`` is too small to train them.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"index type must be one of {', '.join(INDEX_TYPES)}")
+    meta = {"type": index_type, "dim": dim}
+    nlist = INDEX_NLIST or int(4 * n ** 0.5)
+    nlist = max(1, min(nlist, n // MIN_POINTS_PER_CENTROID))
+    if index_type in ("ivf_flat", "ivf_pq") and nlist < 2:
+        print(f"[!] {n} vectors are too few to train {index_type}, using flat")
+        index_type = meta["type"] = "flat"
+    if index_type == "ivf_pq" and n < 256:
+        print(f"[!] {n} vectors are too few to train PQ codebooks, using ivf_flat")
+        index_type = meta["type"] = "ivf_flat"
+
+    if index_type == "flat":
+        factory = "Flat"
+    elif index_type == "ivf_flat":
+        factory = f"IVF{nlist},Flat"
+        meta.update(nlist=nlist, nprobe=min(INDEX_NPROBE, nlist))
+    elif index_type == "hnsw":
+        factory = f"HNSW{INDEX_HNSW_M}"
+        meta.update(m=INDEX_HNSW_M, ef_construction=INDEX_EF_CONSTRUCTION, ef_search=INDEX_EF_SEARCH)
+    else:
+        if dim % INDEX_PQ_M:
+            raise ValueError(f"INDEX_PQ_M={INDEX_PQ_M} does not divide dimension {dim}")
+        factory = f"IVF{nlist},PQ{INDEX_PQ_M}"
+        meta.update(nlist=nlist, nprobe=min(INDEX_NPROBE, nlist), pq_m=INDEX_PQ_M)
+    meta["factory"] = factory
+
+    index = faiss.index_factory(dim, factory, faiss.METRIC_L2)
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = INDEX_EF_CONSTRUCTION
+    return index, meta
+
+
+def train_index(index, vectors):
+    """Train ``index`` on a random sample of at most INDEX_TRAIN_SIZE vectors."""
+    if index.is_trained:
+        return 0
+    sample = vectors
+    if len(vectors) > INDEX_TRAIN_SIZE:
+        rows = np.random.default_rng(0).choice(len(vectors), INDEX_TRAIN_SIZE, replace=False)
+        sample = vectors[np.sort(rows)]
+    index.train(sample)
+    return len(sample)
+
+
+def new_vectorstore(embeddings, text_embeddings, metadatas, ids, index_type=INDEX_TYPE):
+    """Build a LangChain FAISS store over precomputed embeddings with the chosen index layout."""
+    vectors = np.asarray([vector for _, vector in text_embeddings], dtype=np.float32)
+    index, meta = make_index(vectors.shape[1], len(vectors), index_type)
+    meta["trained_on"] = train_index(index, vectors)
+    configure_search(index, meta)
+    vectorstore = FAISS(embeddings, index, InMemoryDocstore(), {})
+    vectorstore.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+    return vectorstore, meta
+
+
+def load_vectorstore(index_path, embeddings):
+    """Load a saved index with the search parameters recorded in its manifest."""
+    vectorstore = FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+    manifest = load_manifest(index_path) or {}
+    configure_search(vectorstore.index, manifest.get("index", {}))
+    return vectorstore
+
+
+def remove_chunks(vectorstore, ids):
+    """Delete docstore ``ids`` from ``vectorstore``.
+
+    LangChain's delete() assumes removal renumbers positions the way a flat
+    index does, which IVF indexes don't and HNSW can't, so approximate
+    indexes are compacted instead: the kept vectors are reconstructed and
+    re-added to an emptied copy of the trained index.
+    """
+    if isinstance(vectorstore.index, faiss.IndexFlat):
+        vectorstore.delete(ids=ids)
+        return
+    drop = set(ids)
+    index = vectorstore.index
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    present = set(vectorstore.index_to_docstore_id.values())
+    keep = [(pos, doc_id) for pos, doc_id in sorted(vectorstore.index_to_docstore_id.items())
+            if doc_id not in drop]
+    fresh = faiss.clone_index(index)
+    fresh.reset()
+    if keep:
+        fresh.add(index.reconstruct_batch(np.array([pos for pos, _ in keep], dtype=np.int64)))
+    vectorstore.index = fresh
+    vectorstore.index_to_docstore_id = {i: doc_id for i, (_, doc_id) in enumerate(keep)}
+    vectorstore.docstore.delete(list(drop & present))
+
+
+def iter_chunks(path, splitter):
+    """Yield ID-tagged chunks of one PDF, parsing and splitting page by page."""
+    repeats = Counter()
+    for page in PyMuPDFLoader(path).lazy_load():
+        for chunk in splitter.split_documents([page]):
+            text_hash = _sha256(chunk.page_content.encode())
+            chunk.metadata["source"] = path
+            chunk.metadata["chunk_id"] = chunk_id(path, chunk.page_content, repeats[text_hash])
+            repeats[text_hash] += 1
+            yield chunk
+
+
+class LazyEmbeddings(Embeddings):
+    """HuggingFace embeddings that load the model on first use.
+
+    The vector store needs an embedding function, but when a process pool
+    embeds the chunks the builder itself never calls it, so the model (and
+    torch's thread pool) is never loaded in this process.
+    """
+
+    def __init__(self, model_name=MODEL):
+        self.model_name = model_name
+        self._model = None
+
+    def _embeddings(self):
+        if self._model is None:
+            from langchain_huggingface import HuggingFaceEmbeddings
+
+            self._model = HuggingFaceEmbeddings(model_name=self.model_name)
+        return self._model
+
+    def embed_documents(self, texts):
+        return self._embeddings().embed_documents(texts)
+
+    def embed_query(self, text):
+        return self._embeddings().embed_query(text)
+
+
+_worker_model = None
+
+
+def _init_worker(model_name, threads):
+    """Load one SentenceTransformer per embedding process."""
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _embed_batch(texts, batch_size):
+    return _worker_model.encode(texts, batch_size=batch_size, show_progress_bar=False).tolist()
+
+
+class EmbeddingPipeline:
+    """Embed a stream of chunks in batches while the stream is still being produced.
+
+    The caller's iterator (PDF parsing and splitting) runs in this process
+    while up to ``2 * workers`` batches are embedded concurrently in a
+    process pool, each process holding its own model. Workers are spawned
+    rather than forked, so they start clean instead of copying this process's
+    memory and threads. With ``workers=0`` the batches are embedded by
+    ``embeddings`` on a background thread, using torch's intra-op threads
+    instead.
+    """
+
+    def __init__(self, embeddings, workers=EMBED_WORKERS, batch_size=EMBED_BATCH_SIZE,
+                 progress_every=5.0):
+        self.embeddings = embeddings
+        self.workers = workers
+        self.batch_size = batch_size
+        self.progress_every = progress_every
+        self.embedded = 0
+        self.seconds = 0.0
+        if workers > 0:
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            self._executor = ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker, initargs=(MODEL, threads),
+            )
+        else:
+            self._executor = ThreadPoolExecutor(1)
+
+    def _submit(self, chunks):
+        texts = [c.page_content for c in chunks]
+        if self.workers > 0:
+            return self._executor.submit(_embed_batch, texts, self.batch_size)
+        return self._executor.submit(self.embeddings.embed_documents, texts)
+
+    def run(self, chunks):
+        """Yield ``(chunks, vectors)`` per batch, in input order."""
+        started = last_report = time.perf_counter()
+        in_flight = deque()
+        batch = []
+
+        def drain(limit):
+            nonlocal last_report
+            while len(in_flight) > limit:
+                done_chunks, future = in_flight.popleft()
+                vectors = future.result()
+                self.embedded += len(done_chunks)
+                now = time.perf_counter()
+                if now - last_report >= self.progress_every:
+                    rate = self.embedded / (now - started)
+                    print(f"[…] {self.embedded} chunks embedded ({rate:.1f} chunks/s)")
+                    last_report = now
+                yield done_chunks, vectors
+
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= self.batch_size:
+                in_flight.append((batch, self._submit(batch)))
+                batch = []
+                # Bound the work queued ahead of the embedders
+                yield from drain(2 * max(1, self.workers))
+        if batch:
+            in_flight.append((batch, self._submit(batch)))
+        yield from drain(0)
+        self.seconds = time.perf_counter() - started
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def build_vectorstore(sources=None, index_path=VECTORSTORE_PATH, full=False,
+                      workers=EMBED_WORKERS, batch_size=EMBED_BATCH_SIZE, index_type=INDEX_TYPE):
+    """Bring the FAISS index in line with ``sources``, embedding only what changed.
+
+    Each source's file hash and chunk IDs are recorded in a manifest next to
+    the index. Unchanged files are skipped without being opened, new or edited
+    chunks are embedded and added, and chunks that disappeared (including
+    every chunk of a source no longer listed) are deleted. Parsing, splitting
+    and embedding overlap; see ``EmbeddingPipeline``. Approximate index types
+    are trained on a sample of the first full build and reused afterwards;
+    changing ``index_type`` forces a rebuild. Returns build statistics.
+    """
+    sources = sources or SOURCES
+    started = time.perf_counter()
+    manifest = None if full else load_manifest(index_path)
+    if manifest and (manifest.get("model"), manifest.get("chunk_size"), manifest.get("chunk_overlap")) != (
+        MODEL, CHUNK_SIZE, CHUNK_OVERLAP
+    ):
+        print("[!] Embedding model or chunking changed, rebuilding from scratch")
+        manifest = None
+    if manifest and manifest.get("index", {}).get("requested", "flat") != index_type:
+        print(f"[!] Index type changed to {index_type}, rebuilding from scratch")
+        manifest = None
+    if manifest and not os.path.exists(os.path.join(index_path, "index.faiss")):
+        manifest = None
+    rebuild = manifest is None
+    manifest = manifest or new_manifest()
+    stats = {"embedded": 0, "deleted": 0, "chunks_per_s": None}
+
+    changed = {}
+    for path in sources:
+        digest = file_hash(path)
+        previous = manifest["sources"].get(path)
+        if previous and previous["sha256"] == digest:
+            print(f"[=] {path} unchanged, skipping")
+        else:
+            changed[path] = digest
+    removed = [path for path in manifest["sources"] if path not in sources]
+
+    if not rebuild and not changed and not removed:
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        print(f"[✓] Index up to date ({stats['seconds']:.2f}s)")
+        return stats
+
+    # Only loads the model here if workers == 0; pool workers load their own
+    embeddings = LazyEmbeddings()
+    vectorstore = None
+    if not rebuild:
+        vectorstore = load_vectorstore(index_path, embeddings)
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    seen = {path: [] for path in changed}
+
+    def new_chunks():
+        for path in changed:
+            previous = manifest["sources"].get(path)
+            old_ids = set(previous["chunk_ids"]) if previous else set()
+            for chunk in iter_chunks(path, splitter):
+                seen[path].append(chunk.metadata["chunk_id"])
+                if chunk.metadata["chunk_id"] not in old_ids:
+                    yield chunk
+
+    # Approximate indexes need the whole first build to pick nlist and train
+    buffered = ([], [], [])
+    with EmbeddingPipeline(embeddings, workers=workers, batch_size=batch_size) as pipeline:
+        for chunks, vectors in pipeline.run(new_chunks()):
+            text_embeddings = list(zip([c.page_content for c in chunks], vectors))
+            metadatas = [c.metadata for c in chunks]
+            ids = [c.metadata["chunk_id"] for c in chunks]
+            if vectorstore is not None:
+                vectorstore.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+            elif index_type == "flat":
+                vectorstore, manifest["index"] = new_vectorstore(embeddings, text_embeddings, metadatas, ids, "flat")
+            else:
+                for pending, items in zip(buffered, (text_embeddings, metadatas, ids)):
+                    pending.extend(items)
+        stats["embedded"] = pipeline.embedded
+        if pipeline.seconds:
+            stats["chunks_per_s"] = round(pipeline.embedded / pipeline.seconds, 1)
+    if buffered[0]:
+        vectorstore, manifest["index"] = new_vectorstore(embeddings, *buffered, index_type)
+    if rebuild and vectorstore is not None:
+        manifest["index"]["requested"] = index_type
+
+    to_delete = set()
+    for path, digest in changed.items():
+        previous = manifest["sources"].get(path)
+        if previous:
+            to_delete |= set(previous["chunk_ids"]) - set(seen[path])
+        manifest["sources"][path] = {"sha256": digest, "chunk_ids": seen[path]}
+        print(f"[✓] {path}: {len(seen[path])} chunks")
+    for path in removed:
+        print(f"[-] {path} no longer indexed, removing its chunks")
+        to_delete |= set(manifest["sources"].pop(path)["chunk_ids"])
 
-def build_vectorstore():
-    loader = PyMuPDFLoader(PDF_PATH)
-    documents = loader.load()
-    print(f"[✓] Loaded {len(documents)} pages from PDF")
+    if vectorstore is None:
+        print("[!] No chunks to index")
+        return stats
+    if to_delete:
+        remove_chunks(vectorstore, list(to_delete))
+    stats["deleted"] = len(to_delete)
+    manifest.setdefault("index", {"type": "flat"})["ntotal"] = vectorstore.index.ntotal
+    stats["index"] = manifest["index"]
 
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=50)
-    chunks = splitter.split_documents(documents)
-    print(f"[✓] Split into {len(chunks)} chunks")
+    save_index(vectorstore, index_path)
+    save_compact(vectorstore, index_path)
+    # Written last: servers reload when the version changes
+    manifest["version"] = time.time_ns()
+    save_manifest(index_path, manifest)
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    print(f"[✓] Embedded {stats['embedded']} chunks ({stats['chunks_per_s']} chunks/s), "
+          f"removed {stats['deleted']}")
+    print(f"[✓] FAISS vectorstore saved to {index_path} ({stats['seconds']:.2f}s total)")
+    return stats
 
-    embeddings = HuggingFaceEmbeddings(model_name=MODEL)
-    vectorstore = FAISS.from_documents(chunks, embeddings)
-    vectorstore.save_local(VECTORSTORE_PATH)
-    print(f"[✓] FAISS vectorstore saved to {VECTORSTORE_PATH}")
 
 if __name__ == "__main__":
-    build_vectorstore()
+    parser = argparse.ArgumentParser(description="Build or incrementally update the FAISS index")
+    parser.add_argument("sources", nargs="*", help=f"PDFs to index (default: {', '.join(SOURCES)})")
+    parser.add_argument("--index", default=VECTORSTORE_PATH, help="index directory")
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and rebuild")
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS,
+                        help="embedding processes (0 = embed in-process with torch threads)")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="chunks per embedding batch")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=INDEX_TYPE, help="FAISS index layout")
+    args = parser.parse_args()
+    build_vectorstore(args.sources or None, index_path=args.index, full=args.full,
+                      workers=args.workers, batch_size=args.batch_size, index_type=args.index_type)
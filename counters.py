@@ -0,0 +1,174 @@
+"""
+Incrementally maintained ticket counters behind /ticket-stats.
+
+Counts per status, priority, department and issue type live in a small
+``ticket_counters`` table that is updated in the same transaction as every
+ticket insert and status change, so reading the stats is a lookup of a few
+rows instead of a scan of the incidents table. The total is the sum of the
+per-status rows, so concurrent inserts of different statuses do not all update
+one shared row. ``reconcile()`` re-derives the counts from the incidents table
+every ``COUNTERS_RECONCILE_INTERVAL`` seconds (0 disables it) in case they ever
+drift (e.g. rows edited by hand or recreated by fix_database.py).
+
+    python counters.py        # reconcile once and print any corrections
+"""
+
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+from storage import TicketRepository
+
+DIMENSIONS = ("status", "priority", "department", "issue_type")
+COUNTERS_TABLE = "ticket_counters"
+RECONCILE_INTERVAL = float(os.environ.get("COUNTERS_RECONCILE_INTERVAL", "3600"))
+
+
+class TicketCounters:
+    """Ticket counts kept in step with the incidents table."""
+
+    def __init__(self, tickets: TicketRepository):
+        self.tickets = tickets
+        tickets.add_listener(self)
+
+    def _sql(self, sql: str) -> str:
+        return self.tickets.sql(sql, counters=COUNTERS_TABLE)
+
+    # --- TicketRepository listener hooks ---
+
+    def init_schema(self, cur) -> None:
+        cur.execute(self._sql("""
+            CREATE TABLE IF NOT EXISTS {counters} (
+                dimension VARCHAR(20) NOT NULL,
+                value VARCHAR(100) NOT NULL,
+                ticket_count BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (dimension, value)
+            )
+        """))
+        # First start against an existing table: derive the counts once
+        cur.execute(self._sql("SELECT COUNT(*) FROM {counters}"))
+        if cur.fetchone()[0] == 0:
+            self._rebuild(cur)
+
+    def on_insert(self, cur, tickets: List[Dict[str, Any]]) -> None:
+        deltas: Counter = Counter()
+        for ticket in tickets:
+            for dimension in DIMENSIONS:
+                deltas[(dimension, ticket.get(dimension) or "")] += 1
+        self._apply(cur, deltas)
+
+    def on_status_change(self, cur, changes: List[Dict[str, Any]]) -> None:
+        deltas: Counter = Counter()
+        for change in changes:
+            deltas[("status", change["old_status"] or "")] -= 1
+            deltas[("status", change["new_status"] or "")] += 1
+        self._apply(cur, deltas)
+
+    # --- reads and maintenance ---
+
+    def _apply(self, cur, deltas: Counter) -> None:
+        rows = [(dimension, value, n) for (dimension, value), n in deltas.items() if n]
+        if not rows:
+            return
+        cur.executemany(self._sql("""
+            INSERT INTO {counters} AS c (dimension, value, ticket_count)
+            VALUES (?, ?, ?)
+            ON CONFLICT (dimension, value)
+            DO UPDATE SET ticket_count = c.ticket_count + excluded.ticket_count
+        """), rows)
+
+    def _read(self, cur) -> Dict[tuple, int]:
+        cur.execute(self._sql("SELECT dimension, value, ticket_count FROM {counters}"))
+        return {(dimension, value): n for dimension, value, n in cur.fetchall()}
+
+    def _rebuild(self, cur) -> None:
+        cur.execute(self._sql("DELETE FROM {counters}"))
+        for dimension in DIMENSIONS:
+            cur.execute(self._sql(f"""
+                INSERT INTO {{counters}} (dimension, value, ticket_count)
+                SELECT '{dimension}', COALESCE({dimension}, ''), COUNT(*)
+                FROM {{table}}
+                GROUP BY COALESCE({dimension}, '')
+            """))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the /ticket-stats payload from the counters table."""
+        with self.tickets.db.connection() as conn:
+            cur = conn.cursor()
+            counts = self._read(cur)
+            cur.close()
+
+        breakdown: Dict[str, Dict[str, int]] = {dimension: {} for dimension in DIMENSIONS}
+        for (dimension, value), n in counts.items():
+            if dimension in breakdown and n:
+                breakdown[dimension][value] = n
+        return {
+            "total_tickets": sum(breakdown["status"].values()),
+            "open_tickets": breakdown["status"].get("Open", 0),
+            "in_progress_tickets": breakdown["status"].get("In Progress", 0),
+            "resolved_tickets": breakdown["status"].get("Resolved", 0),
+            "critical_tickets": breakdown["priority"].get("Critical", 0),
+            "breakdown": breakdown,
+        }
+
+    def reconcile(self) -> Dict[str, int]:
+        """Re-derive every counter from the incidents table.
+
+        Writers are blocked for the duration so no ticket is counted twice or
+        missed. Returns the counters that had drifted, keyed ``dimension:value``,
+        with the size of the correction.
+        """
+        with self.tickets.db.connection() as conn:
+            cur = conn.cursor()
+            self.tickets.begin_write(cur)
+            if self.tickets.db.dialect == "postgres":
+                cur.execute(self._sql("LOCK TABLE {table} IN SHARE MODE"))
+            before = self._read(cur)
+            self._rebuild(cur)
+            after = self._read(cur)
+            cur.close()
+
+        drift = {}
+        for key in set(before) | set(after):
+            if key[0] not in DIMENSIONS:
+                continue
+            delta = after.get(key, 0) - before.get(key, 0)
+            if delta:
+                drift[f"{key[0]}:{key[1]}"] = delta
+        return drift
+
+    def start_reconciler(self, interval: float = RECONCILE_INTERVAL,
+                         should_run: Optional[Callable[[], bool]] = None) -> None:
+        """Reconcile in a daemon thread every ``interval`` seconds.
+
+        ``should_run`` is asked each time, so only one of several worker
+        processes recounts the table.
+        """
+        def loop():
+            while True:
+                time.sleep(interval)
+                if should_run is not None and not should_run():
+                    continue
+                try:
+                    drift = self.reconcile()
+                    if drift:
+                        print(f"⚠️ Ticket counters drifted, corrected: {drift}")
+                except Exception as e:
+                    print(f"❌ Ticket counter reconciliation failed: {e}")
+
+        threading.Thread(target=loop, name="counters-reconcile", daemon=True).start()
+
+
+if __name__ == "__main__":
+    from storage import get_database
+
+    tickets = TicketRepository(get_database())
+    counters = TicketCounters(tickets)
+    tickets.init_schema()
+    drift = counters.reconcile()
+    if drift:
+        print(f"🔧 Corrected {len(drift)} drifted counters: {drift}")
+    else:
+        print("✅ Ticket counters already match the incidents table")
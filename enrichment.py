@@ -0,0 +1,263 @@
+"""
+Opt-in auto-triage of newly created tickets.
+
+When ``AUTO_TRIAGE`` is enabled, every inserted ticket is marked
+``enrichment_status = 'pending'`` in the same transaction as the insert, so
+creating a ticket never waits on the model. A background thread claims pending
+tickets in batches, runs their descriptions through the structured extractor
+(``triage.analyze_batch``), and stores the model's issue type, priority and
+harm severity in ``predicted_*`` columns next to the reporter's values.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from storage import TicketRepository
+from triage import MAX_CONCURRENCY, analyze_batch
+
+ENABLED = os.environ.get("AUTO_TRIAGE", "0").lower() in ("1", "true", "yes")
+BATCH_SIZE = int(os.environ.get("AUTO_TRIAGE_BATCH_SIZE", "16"))
+# How long to let new tickets accumulate into a batch after a wake-up
+BATCH_WINDOW = float(os.environ.get("AUTO_TRIAGE_BATCH_WINDOW", "0.5"))
+POLL_INTERVAL = float(os.environ.get("AUTO_TRIAGE_POLL_INTERVAL", "5"))
+
+# Predicted column -> keys tried, in order, in the structured output
+PREDICTED_FIELDS = {
+    "predicted_issue_type": ("issue_type", "category"),
+    "predicted_priority": ("priority",),
+    "predicted_harm_severity": ("harm_severity", "severity"),
+}
+PREDICTED_COLUMN_TYPES = {
+    "predicted_issue_type": "VARCHAR(100)",
+    "predicted_priority": "VARCHAR(20)",
+    "predicted_harm_severity": "VARCHAR(20)",
+    "enrichment_status": "VARCHAR(20)",
+    "enriched_at": "TIMESTAMP",
+}
+
+
+def _predictions(output: Dict[str, Any]) -> List[Optional[str]]:
+    values = []
+    for keys in PREDICTED_FIELDS.values():
+        value = next((output[k] for k in keys if output.get(k) is not None), None)
+        values.append(str(value) if value is not None else None)
+    return values
+
+
+def _age_seconds(created_at: Any) -> Optional[float]:
+    try:
+        created = created_at if isinstance(created_at, datetime) else datetime.fromisoformat(str(created_at))
+    except ValueError:
+        return None
+    return max(0.0, (datetime.now() - created).total_seconds())
+
+
+class TicketEnricher:
+    """Background structured extraction for stored tickets."""
+
+    def __init__(self, tickets: TicketRepository, enabled: bool = ENABLED, runnable=None):
+        self.tickets = tickets
+        self.enabled = enabled
+        self.runnable = runnable
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lags: deque = deque(maxlen=200)
+        self._last_batch: Dict[str, Any] = {}
+        self._processed = 0
+        self._failed = 0
+        tickets.add_listener(self)
+        tickets.extra_columns.extend(PREDICTED_COLUMN_TYPES)
+        tickets.extra_indexes["enrichment"] = "enrichment_status, id"
+
+    # --- TicketRepository listener hooks ---
+
+    def init_schema(self, cur) -> None:
+        for column, pg_type in PREDICTED_COLUMN_TYPES.items():
+            self.tickets.add_column(cur, column, pg_type)
+
+    def on_insert(self, cur, tickets: List[Dict[str, Any]]) -> None:
+        if not self.enabled:
+            return
+        ids = [ticket["ticket_id"] for ticket in tickets]
+        cur.execute(self.tickets.sql(f"""
+            UPDATE {{table}} SET enrichment_status = 'pending'
+            WHERE ticket_id IN ({', '.join('?' for _ in ids)})
+        """), ids)
+        self._wakeup.set()
+
+    def on_status_change(self, cur, changes: List[Dict[str, Any]]) -> None:
+        pass
+
+    # --- worker ---
+
+    def claim(self, limit: int = BATCH_SIZE) -> List[tuple]:
+        """Move up to ``limit`` pending tickets to running; return (id, text, created_at)."""
+        with self.tickets.db.connection() as conn:
+            cur = conn.cursor()
+            if self.tickets.db.dialect == "postgres":
+                cur.execute(self.tickets.sql("""
+                    UPDATE {table} SET enrichment_status = 'running'
+                    WHERE id IN (
+                        SELECT id FROM {table}
+                        WHERE enrichment_status = 'pending'
+                        ORDER BY id
+                        FOR UPDATE SKIP LOCKED
+                        LIMIT ?
+                    )
+                    RETURNING ticket_id, description, created_at
+                """), (limit,))
+                rows = cur.fetchall()
+            else:
+                self.tickets.begin_write(cur)
+                cur.execute(self.tickets.sql("""
+                    SELECT ticket_id, description, created_at FROM {table}
+                    WHERE enrichment_status = 'pending'
+                    ORDER BY id
+                    LIMIT ?
+                """), (limit,))
+                rows = cur.fetchall()
+                if rows:
+                    cur.execute(self.tickets.sql(f"""
+                        UPDATE {{table}} SET enrichment_status = 'running'
+                        WHERE ticket_id IN ({', '.join('?' for _ in rows)})
+                    """), [row[0] for row in rows])
+            cur.close()
+        return rows
+
+    def run_once(self) -> int:
+        """Enrich one batch of pending tickets; returns how many were claimed."""
+        rows = self.claim()
+        if not rows:
+            return 0
+        started = time.perf_counter()
+        try:
+            self._enrich(rows)
+        except Exception:
+            # Don't strand the batch in 'running' until the next restart
+            self.release([row[0] for row in rows])
+            raise
+        self._last_batch = {
+            "size": len(rows),
+            "seconds": round(time.perf_counter() - started, 3),
+            "finished_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        return len(rows)
+
+    def _enrich(self, rows: List[tuple]) -> None:
+        results = analyze_batch(
+            [row[1] for row in rows], runnable=self.runnable, max_concurrency=MAX_CONCURRENCY
+        )
+        enriched_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        updates = []
+        for (ticket_id, _, _), result in zip(rows, results):
+            if "structured_output" in result:
+                output = result["structured_output"]
+                updates.append((*_predictions(output), "done", enriched_at, json.dumps(output), ticket_id))
+            else:
+                updates.append((None, None, None, "failed", enriched_at, json.dumps(result), ticket_id))
+
+        with self.tickets.db.connection() as conn:
+            cur = conn.cursor()
+            cur.executemany(self.tickets.sql("""
+                UPDATE {table}
+                SET predicted_issue_type = ?, predicted_priority = ?, predicted_harm_severity = ?,
+                    enrichment_status = ?, enriched_at = ?, triage_result = ?
+                WHERE ticket_id = ?
+            """), updates)
+            cur.close()
+
+        # Counted once stored, so a failed write doesn't skew the stats
+        for (_, _, created_at), update in zip(rows, updates):
+            if update[3] == "done":
+                self._processed += 1
+                lag = _age_seconds(created_at)
+                if lag is not None:
+                    self._lags.append(lag)
+            else:
+                self._failed += 1
+
+    def release(self, ticket_ids: List[str]) -> None:
+        """Return claimed tickets to pending so a later batch retries them."""
+        with self.tickets.db.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self.tickets.sql(f"""
+                UPDATE {{table}} SET enrichment_status = 'pending'
+                WHERE enrichment_status = 'running' AND ticket_id IN ({', '.join('?' for _ in ticket_ids)})
+            """), ticket_ids)
+            cur.close()
+
+    def _loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                if self.run_once() >= BATCH_SIZE:
+                    continue  # more are probably waiting
+            except Exception as e:
+                print(f"❌ Auto-triage batch failed: {e}")
+            if self._wakeup.wait(POLL_INTERVAL):
+                # Let tickets created in the same burst join the next batch
+                time.sleep(BATCH_WINDOW)
+            self._wakeup.clear()
+
+    def reset_running(self) -> None:
+        """Put tickets left running by a previous process back to pending."""
+        with self.tickets.db.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self.tickets.sql(
+                "UPDATE {table} SET enrichment_status = 'pending' WHERE enrichment_status = 'running'"
+            ))
+            cur.close()
+
+    def start(self, reset: bool = True) -> None:
+        """Start the background enrichment thread (no-op when disabled).
+
+        Pass ``reset=False`` when other processes may be enriching already
+        (pre-forked workers); the parent resets once before forking.
+        """
+        if not self.enabled or self._thread is not None:
+            return
+        if reset:
+            self.reset_running()
+        self._thread = threading.Thread(target=self._loop, name="auto-triage", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30) -> None:
+        """Stop the enrichment thread after its current batch."""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and enrichment lag for monitoring."""
+        with self.tickets.db.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self.tickets.sql("""
+                SELECT enrichment_status, COUNT(*), MIN(created_at)
+                FROM {table}
+                WHERE enrichment_status IN ('pending', 'running')
+                GROUP BY enrichment_status
+            """))
+            rows = cur.fetchall()
+            cur.close()
+        depth = {status: count for status, count, _ in rows}
+        oldest = [created for status, _, created in rows if status == "pending" and created]
+        lags = sorted(self._lags)
+        return {
+            "enabled": self.enabled,
+            "pending": depth.get("pending", 0),
+            "running": depth.get("running", 0),
+            "oldest_pending_age_s": round(_age_seconds(min(oldest)) or 0, 1) if oldest else 0,
+            "processed": self._processed,
+            "failed": self._failed,
+            "lag_p50_s": round(lags[len(lags) // 2], 2) if lags else None,
+            "lag_max_s": round(lags[-1], 2) if lags else None,
+            "last_batch": self._last_batch,
+        }
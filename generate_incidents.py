@@ -0,0 +1,403 @@
+"""
+Deterministic synthetic incidents for scale testing.
+
+Generates realistic tickets: departments and JCI/HA issue types with
+department-specific mixes, harm severity driving priority, more incidents on
+weekday day shifts and in recent months, and status / updated_at following
+from each ticket's age and a priority-dependent resolution time. The same
+``--seed`` and ``--count`` always produce the same rows, and ticket IDs
+("S" + 7 hex digits) never collide with the UUID-derived IDs of real tickets.
+
+Rows are written with the backend's bulk path: COPY on PostgreSQL, batched
+``executemany`` with ``synchronous=OFF`` on SQLite. Into an empty table the
+secondary indexes are dropped for the load and rebuilt afterwards. The
+ticket counters and analytics rollups are re-derived at the end, since bulk
+loading bypasses the repository listeners.
+
+    python generate_incidents.py --count 1000000 --sqlite-path bench.db
+    DB_BACKEND=postgres PGDATABASE=incidents_bench python generate_incidents.py --count 5000000
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import random
+import time
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from analytics import TicketRollups
+from counters import TicketCounters
+from storage import DB_BACKEND, INSERT_COLUMNS, SQLITE_PATH, Database, TicketRepository
+
+COLUMNS = INSERT_COLUMNS + ("updated_at",)
+BATCH_SIZE = 50000
+ID_SPACE = 1 << 28  # "S" + 7 hex digits
+ID_MULTIPLIER = 0x9E3779B  # odd, so i -> i * m mod 2^28 is a permutation
+
+# Relative incident volume per department
+DEPARTMENTS = {
+    "ER": 16, "ICU": 10, "Surgery": 10, "Internal Medicine": 12, "Pediatrics": 7,
+    "Oncology": 6, "Cardiology": 7, "Radiology": 5, "Pharmacy": 6, "Laboratory": 5,
+    "Maternity": 5, "Outpatient": 8, "Facilities": 3,
+}
+# The JCI/HA issue types offered by the dashboard, with their base frequency
+ISSUE_TYPES = {
+    "Patient Safety": 20, "Medication": 16, "Infection Control": 9, "Facility Safety": 6,
+    "Clinical Governance": 4, "Data Privacy": 3, "Emergency": 4, "Staffing": 6,
+    "Equipment": 9, "Cleanliness": 5, "Medical Records": 6, "Waste Management": 2,
+    "Pharmacy": 4, "Other": 6,
+}
+# Multipliers on the base frequency where a department sees more of a type
+DEPARTMENT_ISSUES = {
+    "ER": {"Emergency": 4, "Staffing": 2, "Patient Safety": 1.5},
+    "ICU": {"Infection Control": 2.5, "Equipment": 2, "Medication": 1.5},
+    "Surgery": {"Patient Safety": 2, "Infection Control": 2, "Equipment": 1.5},
+    "Pediatrics": {"Medication": 2, "Patient Safety": 1.5},
+    "Oncology": {"Medication": 2.5},
+    "Cardiology": {"Equipment": 2},
+    "Radiology": {"Equipment": 4, "Data Privacy": 2},
+    "Pharmacy": {"Pharmacy": 8, "Medication": 4},
+    "Laboratory": {"Medical Records": 2.5, "Waste Management": 3, "Infection Control": 1.5},
+    "Outpatient": {"Data Privacy": 2, "Medical Records": 2},
+    "Facilities": {"Facility Safety": 8, "Cleanliness": 4, "Waste Management": 4},
+}
+SEVERITIES = {"None": 55, "Mild": 25, "Moderate": 13, "Severe": 6, "Death": 1}
+# Priority weights (Low, Medium, High, Critical) given the harm severity
+PRIORITIES = ("Low", "Medium", "High", "Critical")
+PRIORITY_BY_SEVERITY = {
+    "None": (50, 40, 9, 1),
+    "Mild": (20, 55, 22, 3),
+    "Moderate": (5, 35, 50, 10),
+    "Severe": (0, 5, 45, 50),
+    "Death": (0, 0, 10, 90),
+}
+# Mean days to resolution by priority (exponentially distributed)
+RESOLUTION_DAYS = {"Low": 21, "Medium": 10, "High": 4, "Critical": 1.5}
+# Day-shift peak, quieter nights; weekends at roughly 60% of weekdays
+HOUR_WEIGHTS = (2, 1.5, 1.2, 1, 1, 1.5, 3, 5, 7, 8, 8, 7.5, 7, 7.5, 8, 7.5, 7, 6, 5, 4.5, 4, 3.5, 3, 2.5)
+WEEKDAY_WEIGHTS = (1, 1, 1, 1, 0.95, 0.6, 0.55)
+# Volume grows towards the end of the range (1 = flat)
+TREND = 0.85
+
+FIRST_NAMES = (
+    "Aisha", "Ben", "Carmen", "David", "Elena", "Farid", "Grace", "Hiro", "Ines", "James",
+    "Kavya", "Liam", "Mei", "Nadia", "Omar", "Priya", "Quinn", "Rosa", "Sam", "Tariq",
+)
+LAST_NAMES = (
+    "Ahmed", "Brown", "Chen", "Dubois", "Evans", "Fischer", "Garcia", "Hassan", "Ito", "Jones",
+    "Khan", "Lopez", "Martin", "Nguyen", "Okafor", "Patel", "Rossi", "Silva", "Tanaka", "Wong",
+)
+DRUGS = ("heparin", "insulin", "morphine", "vancomycin", "warfarin", "potassium chloride", "paracetamol")
+EQUIPMENT = ("infusion pump", "ventilator", "defibrillator", "patient monitor", "bed rail", "CT scanner")
+DESCRIPTIONS = {
+    "Patient Safety": (
+        "Patient fall in {department} room {room}, {harm}.",
+        "Wrong patient identification wristband found during {shift} shift handover.",
+        "Pressure injury identified on admission review in {department}.",
+    ),
+    "Medication": (
+        "{drug} administered at the wrong dose in room {room}; prescriber informed.",
+        "Omitted dose of {drug} on the {shift} medication round.",
+        "Look-alike packaging of {drug} led to a near miss in {department}.",
+    ),
+    "Infection Control": (
+        "Hand hygiene audit below target in {department} on the {shift} shift.",
+        "Isolation signage missing for a contact-precautions patient in room {room}.",
+        "Suspected surgical site infection reported {days} days after the procedure.",
+    ),
+    "Facility Safety": (
+        "Water leak from the ceiling near room {room} in {department}.",
+        "Fire exit obstructed by stored equipment in {department}.",
+    ),
+    "Clinical Governance": (
+        "Consent form incomplete before a procedure in {department}.",
+        "Escalation of a deteriorating patient delayed on the {shift} shift.",
+    ),
+    "Data Privacy": (
+        "Patient records left visible on an unattended workstation in {department}.",
+        "Discharge summary sent to the wrong fax number.",
+    ),
+    "Emergency": (
+        "Code blue response time exceeded the target in {department}.",
+        "Rapid response team called to room {room}; {harm}.",
+    ),
+    "Staffing": (
+        "{department} below safe nurse-to-patient ratio on the {shift} shift.",
+        "Agency staff without an orientation assigned to {department}.",
+    ),
+    "Equipment": (
+        "{equipment} alarm failed during use in room {room}.",
+        "{equipment} overdue for preventive maintenance in {department}.",
+    ),
+    "Cleanliness": (
+        "Room {room} not cleaned between patients in {department}.",
+        "Spill left unattended in the {department} corridor during the {shift} shift.",
+    ),
+    "Medical Records": (
+        "Lab result filed in the wrong patient's record in {department}.",
+        "Allergy to {drug} missing from the electronic record.",
+    ),
+    "Waste Management": (
+        "Sharps container overfilled in {department} room {room}.",
+        "Clinical waste placed in a general waste bin in {department}.",
+    ),
+    "Pharmacy": (
+        "Dispensing error: {drug} labelled with the wrong strength.",
+        "Stock-out of {drug} delayed a scheduled dose by {days} hours.",
+    ),
+    "Other": (
+        "Visitor complaint about waiting times in {department}.",
+        "Security called to {department} for an aggressive visitor on the {shift} shift.",
+    ),
+}
+HARMS = ("no injury reported", "minor bruising", "assessed by the on-call doctor", "transferred for imaging")
+SHIFTS = ("morning", "afternoon", "night")
+
+
+def _weights(weights: Dict[str, float]) -> Tuple[Tuple[str, ...], List[float]]:
+    return tuple(weights), list(accumulate(weights.values()))
+
+
+class IncidentGenerator:
+    """Stream of synthetic incident rows in ``COLUMNS`` order.
+
+    ``first_index`` continues an earlier run's ID sequence (for appending);
+    rows depend only on ``seed`` and their index range.
+    """
+
+    def __init__(self, seed: int = 42, start: datetime = datetime(2024, 1, 1), days: int = 730,
+                 first_index: int = 0):
+        self.seed = seed
+        self.start = start
+        self.days = days
+        self.first_index = first_index
+        self.end = start + timedelta(days=days)  # "now" for ages, so runs do not depend on the clock
+        self._id_offset = random.Random(f"ids:{seed}").randrange(ID_SPACE)
+        self._departments = _weights(DEPARTMENTS)
+        self._issues = {
+            department: _weights({issue: weight * DEPARTMENT_ISSUES.get(department, {}).get(issue, 1)
+                                  for issue, weight in ISSUE_TYPES.items()})
+            for department in DEPARTMENTS
+        }
+        self._severities = _weights(SEVERITIES)
+        self._priorities = {severity: list(accumulate(weights)) for severity, weights in PRIORITY_BY_SEVERITY.items()}
+        self._hours = list(accumulate(HOUR_WEIGHTS))
+        self._weekday_max = max(WEEKDAY_WEIGHTS)
+
+    def ticket_id(self, index: int) -> str:
+        """ID of the ``index``-th generated ticket (0-based, counting from the first run)."""
+        if index >= ID_SPACE:
+            raise ValueError(f"At most {ID_SPACE} synthetic tickets per seed")
+        return f"S{(index * ID_MULTIPLIER + self._id_offset) % ID_SPACE:07X}"
+
+    @staticmethod
+    def _pick(rng: random.Random, choices: Sequence[str], cumulative: List[float]) -> str:
+        return choices[bisect(cumulative, rng.random() * cumulative[-1])]
+
+    # random.choice / randrange cost several times more per call
+    @staticmethod
+    def _choice(rng: random.Random, choices: Sequence[Any]) -> Any:
+        return choices[int(rng.random() * len(choices))]
+
+    @staticmethod
+    def _between(rng: random.Random, low: int, high: int) -> int:
+        return low + int(rng.random() * (high - low))
+
+    def _created_at(self, rng: random.Random) -> datetime:
+        while True:
+            day = int(self.days * rng.random() ** TREND)
+            date = self.start + timedelta(days=day)
+            if rng.random() * self._weekday_max < WEEKDAY_WEIGHTS[date.weekday()]:
+                break
+        hour = bisect(self._hours, rng.random() * self._hours[-1])
+        return date + timedelta(hours=hour, seconds=self._between(rng, 0, 3600))
+
+    def _status(self, rng: random.Random, priority: str, created: datetime) -> Tuple[str, datetime]:
+        resolved = created + timedelta(days=rng.expovariate(1 / RESOLUTION_DAYS[priority]))
+        if resolved <= self.end:
+            if rng.random() < 0.8:
+                closed = min(self.end, resolved + timedelta(hours=rng.expovariate(1 / 48)))
+                return "Closed", closed
+            return "Resolved", resolved
+        # Still being worked on: picked up some time after it was reported
+        if rng.random() < 0.5:
+            return "Open", created
+        return "In Progress", min(self.end, created + timedelta(hours=rng.expovariate(1 / 12)))
+
+    def _description(self, rng: random.Random, issue_type: str, department: str) -> str:
+        choice = self._choice
+        return choice(rng, DESCRIPTIONS[issue_type]).format(
+            department=department, room=self._between(rng, 100, 999), shift=choice(rng, SHIFTS),
+            drug=choice(rng, DRUGS), equipment=choice(rng, EQUIPMENT), harm=choice(rng, HARMS),
+            days=self._between(rng, 2, 30),
+        )
+
+    def rows(self, count: int) -> Iterator[tuple]:
+        rng = random.Random(f"rows:{self.seed}:{self.first_index}")
+        for index in range(self.first_index, self.first_index + count):
+            department = self._pick(rng, *self._departments)
+            issue_type = self._pick(rng, *self._issues[department])
+            severity = self._pick(rng, *self._severities)
+            priority = self._pick(rng, PRIORITIES, self._priorities[severity])
+            created = self._created_at(rng)
+            status, updated = self._status(rng, priority, created)
+            yield (
+                self.ticket_id(index),
+                f"{self._choice(rng, FIRST_NAMES)} {self._choice(rng, LAST_NAMES)}",
+                department,
+                issue_type,
+                self._description(rng, issue_type, department),
+                priority,
+                status,
+                created.isoformat(" ", "seconds"),
+                severity,
+                updated.isoformat(" ", "seconds"),
+            )
+
+
+# --- bulk loading ---
+
+def _count(tickets: TicketRepository, where: str = "") -> int:
+    with tickets.db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(tickets.sql(f"SELECT COUNT(*) FROM {{table}} {where}"))
+        count = cur.fetchone()[0]
+        cur.close()
+    return count
+
+
+def _drop_secondary_indexes(tickets: TicketRepository) -> None:
+    """Drop the indexes ``init_schema`` recreates after the load.
+
+    Indexes of listeners not registered on ``tickets`` (auto-triage's, say)
+    are left in place and kept up to date during the load instead.
+    """
+    with tickets.db.connection() as conn:
+        cur = conn.cursor()
+        for name in tickets.secondary_indexes():
+            cur.execute(f"DROP INDEX IF EXISTS {tickets.table_name(name)}")
+        cur.close()
+
+
+def _copy_batches(tickets: TicketRepository, batches: Iterator[List[tuple]], progress) -> None:
+    sql = f"COPY {tickets.table} ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+    with tickets.db.connection() as conn:
+        cur = conn.cursor()
+        for batch in batches:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            cur.copy_expert(sql, buffer)
+            conn.commit()
+            progress(len(batch))
+        cur.close()
+
+
+def _sqlite_batches(tickets: TicketRepository, batches: Iterator[List[tuple]], progress) -> None:
+    placeholders = ", ".join("?" for _ in COLUMNS)
+    sql = f"INSERT INTO {tickets.table} ({', '.join(COLUMNS)}) VALUES ({placeholders})"
+    with tickets.db.connection() as conn:
+        # Losing a generated dataset to a crash is fine; the default fsyncs are not needed
+        conn.execute("PRAGMA synchronous=OFF")
+        try:
+            for batch in batches:
+                conn.executemany(sql, batch)
+                conn.commit()
+                progress(len(batch))
+        finally:
+            conn.execute("PRAGMA synchronous=NORMAL")
+
+
+def load(tickets: TicketRepository, generator: IncidentGenerator, count: int,
+         derived: Sequence[Any] = (), batch_size: int = BATCH_SIZE,
+         rebuild_indexes: Optional[bool] = None) -> Dict[str, float]:
+    """Bulk-insert ``count`` generated incidents, then re-derive ``derived``.
+
+    ``tickets`` must have its schema initialised; ``derived`` are its
+    TicketCounters / TicketRollups listeners. Secondary indexes are dropped
+    and rebuilt when the table starts empty (or ``rebuild_indexes``).
+    Returns timings in seconds.
+    """
+    if rebuild_indexes is None:
+        rebuild_indexes = _count(tickets) == 0
+    timings = {}
+    started = time.perf_counter()
+    if rebuild_indexes:
+        _drop_secondary_indexes(tickets)
+
+    rows = generator.rows(count)
+    batches = iter(lambda: list(itertools.islice(rows, batch_size)), [])
+    done = [0, time.perf_counter()]
+
+    def progress(n):
+        done[0] += n
+        if time.perf_counter() - done[1] >= 5 or done[0] == count:
+            done[1] = time.perf_counter()
+            rate = done[0] / (done[1] - started)
+            print(f"📥 {done[0]:,}/{count:,} incidents ({rate:,.0f}/s)")
+
+    if tickets.db.dialect == "postgres":
+        _copy_batches(tickets, batches, progress)
+    else:
+        _sqlite_batches(tickets, batches, progress)
+    timings["insert"] = time.perf_counter() - started
+
+    step = time.perf_counter()
+    if rebuild_indexes:
+        tickets.init_schema()
+    if tickets.db.dialect == "postgres":
+        # Plan the first benchmark queries with real statistics, not autovacuum's
+        with tickets.db.connection() as conn:
+            conn.cursor().execute(f"ANALYZE {tickets.table}")
+    timings["indexes"] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    for listener in derived:
+        if isinstance(listener, TicketCounters):
+            listener.reconcile()
+        else:
+            listener.rebuild()
+    timings["derived_tables"] = time.perf_counter() - step
+    timings["total"] = time.perf_counter() - started
+    return timings
+
+
+def open_repository(backend: str = DB_BACKEND, sqlite_path: str = SQLITE_PATH):
+    """Return a repository with its schema created, and its counters and rollups."""
+    tickets = TicketRepository(Database(backend, sqlite_path, probe_interval=0))
+    derived = [TicketCounters(tickets), TicketRollups(tickets)]
+    tickets.init_schema()
+    return tickets, derived
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-load deterministic synthetic incidents")
+    parser.add_argument("--count", type=int, default=100000, help="incidents to generate")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start", type=datetime.fromisoformat, default=datetime(2024, 1, 1),
+                        help="earliest created_at (ISO date)")
+    parser.add_argument("--days", type=int, default=730, help="days covered by created_at")
+    parser.add_argument("--backend", choices=["auto", "sqlite", "postgres"], default=DB_BACKEND)
+    parser.add_argument("--sqlite-path", default=SQLITE_PATH)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--append", action="store_true",
+                        help="add to a non-empty table, continuing the synthetic ID sequence")
+    args = parser.parse_args()
+
+    tickets, derived = open_repository(args.backend, args.sqlite_path)
+    existing = _count(tickets)
+    first_index = 0
+    if existing:
+        if not args.append:
+            parser.error(f"{tickets.table} already has {existing:,} rows; pass --append to add to them")
+        first_index = _count(tickets, "WHERE ticket_id LIKE 'S%'")
+    generator = IncidentGenerator(args.seed, args.start, args.days, first_index)
+    print(f"🧪 Generating {args.count:,} incidents (seed {args.seed}) into {tickets.db.dialect} {tickets.table}")
+    timings = load(tickets, generator, args.count, derived, args.batch_size)
+    print(f"✅ Loaded {args.count:,} incidents in {timings['total']:.1f}s "
+          f"(insert {timings['insert']:.1f}s, indexes {timings['indexes']:.1f}s, "
+          f"counters/rollups {timings['derived_tables']:.1f}s)")
@@ -0,0 +1,97 @@
+"""
+Production serving: gunicorn with pre-forked, threaded workers.
+
+    gunicorn UI:app                  # picks up this file from the working directory
+    python start_backend.py          # same, with a fallback where gunicorn is unavailable
+
+The app is imported once in the master (``preload_app``) so the embedding
+model, FAISS index, chat graph and compiled code are shared copy-on-write;
+each worker starts its own background threads after the fork. On SIGTERM
+workers stop accepting connections and get ``graceful_timeout`` seconds to
+finish in-flight requests, streamed /chat answers included.
+
+Workers share a runtime directory: metric snapshots that let ``/metrics`` in
+any worker report totals for all of them (METRICS_MULTIPROC_DIR), and the
+lock naming the one worker that embeds tickets and reconciles counters
+(BACKGROUND_LOCK_FILE).
+
+Settings come from SERVER_* environment variables (see .env.example);
+gunicorn's own command-line flags still override them.
+"""
+
+import glob
+import multiprocessing
+import os
+import tempfile
+
+# Read by UI.py at import: load shared state now, start threads in workers
+os.environ["PRELOAD_APP"] = "1"
+# Set before UI (and metrics) are imported; kept if this file is re-read on HUP
+if not os.environ.get("METRICS_MULTIPROC_DIR"):
+    os.environ["METRICS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="incident-backend-")
+RUNTIME_DIR = os.environ["METRICS_MULTIPROC_DIR"]
+os.environ.setdefault("BACKGROUND_LOCK_FILE", os.path.join(RUNTIME_DIR, "background.lock"))
+
+bind = os.environ.get("SERVER_BIND", "127.0.0.1:8000")
+workers = int(os.environ.get("SERVER_WORKERS", "0")) or min(4, multiprocessing.cpu_count() + 1)
+worker_class = "gthread"
+# Threads per worker; SSE streams hold one for their whole answer
+threads = int(os.environ.get("SERVER_THREADS", "8"))
+preload_app = True
+# Long enough for a streamed answer to complete during a rolling restart
+graceful_timeout = int(os.environ.get("SERVER_GRACEFUL_TIMEOUT", "60"))
+# Heartbeat of the worker's main loop, not a per-request limit (gthread)
+timeout = int(os.environ.get("SERVER_TIMEOUT", "120"))
+keepalive = 5
+# Recycle workers now and then to bound memory growth (0 = never)
+max_requests = int(os.environ.get("SERVER_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get("SERVER_ACCESS_LOG") or None
+
+
+def _snapshots():
+    return glob.glob(os.path.join(RUNTIME_DIR, "*.json"))
+
+
+def on_starting(server):
+    # Totals start from zero with every server, not from a previous run's files
+    for path in _snapshots():
+        os.remove(path)
+
+
+def pre_fork(server, worker):
+    import UI
+
+    UI.before_fork()
+
+
+def post_fork(server, worker):
+    import metrics
+    import UI
+
+    metrics.start_multiprocess()
+    UI.start_background_services()
+
+
+def worker_exit(server, worker):
+    import metrics
+    import UI
+
+    UI.stop_background_services()
+    metrics.write_snapshot()
+
+
+def child_exit(server, worker):
+    import metrics
+
+    # Runs in the master, also for workers that crashed or were killed
+    metrics.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    for path in _snapshots() + glob.glob(os.path.join(RUNTIME_DIR, "*.lock")):
+        os.remove(path)
+    try:
+        os.rmdir(RUNTIME_DIR)
+    except OSError:
+        pass  # a directory of the operator's own with other files in it
@@ -1,6 +1,7 @@
 import requests
 
 api_url = "http://192.168.0.105:8501/process_ticket"
+batch_api_url = "http://192.168.0.105:8501/process_tickets/batch"
 
 def submit_ticket(ticket_text):
     try:
@@ -14,6 +15,22 @@ def submit_ticket(ticket_text):
     except requests.exceptions.RequestException as e:
         return {"error": str(e)}
 
+def submit_tickets(ticket_texts, max_concurrency=None, timeout=120):
+    """Analyze many tickets in one request; results come back in input order"""
+    payload = {"texts": list(ticket_texts)}
+    if max_concurrency:
+        payload["max_concurrency"] = max_concurrency
+    try:
+        response = requests.post(batch_api_url, json=payload, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+    except requests.exceptions.ConnectionError:
+        return {"error": "Could not connect to the AI API server. Please ensure it is running and accessible."}
+    except requests.exceptions.Timeout:
+        return {"error": "Request timed out. Please check server status and network connection."}
+    except requests.exceptions.RequestException as e:
+        return {"error": str(e)}
+
 # Example usage
 if __name__ == "__main__":
     ticket_data = "Sample ticket data"
@@ -0,0 +1,334 @@
+"""
+Persistent background job queue for LLM work.
+
+Jobs are rows in a ``triage_jobs`` table in the same SQLite/PostgreSQL store
+as the tickets, so queued work survives restarts and several server processes
+can share one queue. A pool of worker threads claims jobs one at a time,
+runs the handler registered for the job's kind, stores the result (and, for
+ticket analysis jobs, writes it back to the ticket row), then notifies the
+job's webhook if one was given.
+"""
+
+import ipaddress
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from storage import TicketRepository
+
+JOBS_TABLE = "triage_jobs"
+JOB_STATUSES = ("queued", "running", "done", "failed")
+WORKERS = int(os.environ.get("JOBS_WORKERS", "4"))
+MAX_QUEUED = int(os.environ.get("JOBS_MAX_QUEUED", "1000"))
+MAX_ATTEMPTS = int(os.environ.get("JOBS_MAX_ATTEMPTS", "3"))
+POLL_INTERVAL = float(os.environ.get("JOBS_POLL_INTERVAL", "1"))
+# Jobs left "running" this long (e.g. by a crashed process) are queued again;
+# keep it above the slowest handler or a live job may run twice
+STALE_AFTER = float(os.environ.get("JOBS_STALE_AFTER", "180"))
+WEBHOOK_TIMEOUT = float(os.environ.get("JOBS_WEBHOOK_TIMEOUT", "5"))
+# Comma-separated hosts callback_url may point at; empty allows any public host
+CALLBACK_HOSTS = {h.strip().lower() for h in os.environ.get("JOBS_CALLBACK_HOSTS", "").split(",") if h.strip()}
+
+JOB_COLUMNS = (
+    "job_id", "kind", "status", "payload", "result", "error", "ticket_id",
+    "callback_url", "attempts", "created_at", "started_at", "finished_at",
+)
+
+
+class QueueFull(Exception):
+    """Raised when enqueueing would exceed the backpressure limit."""
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def check_callback_url(url: str) -> None:
+    """Raise ValueError unless ``url`` is an http(s) webhook the server may call.
+
+    Hosts in JOBS_CALLBACK_HOSTS are trusted as is; otherwise every address
+    the host resolves to must be public, so clients cannot make the server
+    reach loopback, private-network or cloud-metadata endpoints.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("callback_url must be an http(s) URL")
+    host = parts.hostname.lower()
+    if CALLBACK_HOSTS:
+        if host not in CALLBACK_HOSTS:
+            raise ValueError(f"callback_url host is not allowed: {host}")
+        return
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parts.port or None)}
+    except (socket.gaierror, UnicodeError) as e:
+        raise ValueError(f"callback_url host does not resolve: {host}") from e
+    for address in addresses:
+        if not ipaddress.ip_address(address.split("%")[0]).is_global:
+            raise ValueError(f"callback_url must point at a public host: {host}")
+
+
+class JobQueue:
+    """Database-backed job queue with an in-process worker pool."""
+
+    def __init__(self, tickets: TicketRepository, max_queued: int = MAX_QUEUED):
+        self.tickets = tickets
+        self.max_queued = max_queued
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._workers: List[threading.Thread] = []
+        self._last_requeue = 0.0
+
+    def _sql(self, sql: str) -> str:
+        return self.tickets.sql(sql, jobs=JOBS_TABLE)
+
+    def init_schema(self) -> None:
+        """Create the jobs table if it does not exist."""
+        serial = "SERIAL" if self.tickets.db.dialect == "postgres" else "INTEGER"
+        autoincrement = "" if self.tickets.db.dialect == "postgres" else " AUTOINCREMENT"
+        with self.tickets.db.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self._sql(f"""
+                CREATE TABLE IF NOT EXISTS {{jobs}} (
+                    id {serial} PRIMARY KEY{autoincrement},
+                    job_id VARCHAR(36) UNIQUE NOT NULL,
+                    kind VARCHAR(50) NOT NULL,
+                    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    ticket_id VARCHAR(20),
+                    callback_url TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP NOT NULL,
+                    started_at TIMESTAMP,
+                    finished_at TIMESTAMP
+                )
+            """))
+            prefix = JOBS_TABLE
+            cur.execute(self._sql(
+                f"CREATE INDEX IF NOT EXISTS {prefix}_status_idx ON {{jobs}} (status, id)"
+            ))
+            cur.close()
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any]], Any]) -> None:
+        """Run ``handler(payload)`` for jobs of ``kind``; its return value is the result."""
+        self._handlers[kind] = handler
+
+    # --- producers ---
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        ticket_id: Optional[str] = None,
+        callback_url: Optional[str] = None,
+    ) -> str:
+        """Queue a job and return its ID; raises QueueFull under backpressure."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if ticket_id and kind != "process_ticket":
+            raise ValueError(f"ticket_id is only accepted for process_ticket jobs, not {kind}")
+        if callback_url:
+            check_callback_url(callback_url)
+        job_id = str(uuid.uuid4())
+        with self.tickets.db.connection() as conn:
+            cur = conn.cursor()
+            if self.tickets.db.dialect == "postgres":
+                # Serialize producers so concurrent counts cannot all pass the limit
+                cur.execute(self._sql("LOCK TABLE {jobs} IN SHARE ROW EXCLUSIVE MODE"))
+            # Count and insert in one statement (SQLite holds the write lock throughout)
+            cur.execute(self._sql("""
+                INSERT INTO {jobs} (job_id, kind, status, payload, ticket_id, callback_url, created_at)
+                SELECT ?, ?, 'queued', ?, ?, ?, ?
+                WHERE (SELECT COUNT(*) FROM {jobs} WHERE status = 'queued') < ?
+            """), (job_id, kind, json.dumps(payload), ticket_id, callback_url, _now(), self.max_queued))
+            inserted = cur.rowcount
+            cur.close()
+        if not inserted:
+            raise QueueFull(f"Job queue is full ({self.max_queued} queued)")
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job as a dict (payload/result decoded), or None."""
+        with self.tickets.db.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self._sql(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM {{jobs}} WHERE job_id = ?"
+            ), (job_id,))
+            row = cur.fetchone()
+            cur.close()
+        if not row:
+            return None
+        job = dict(zip(JOB_COLUMNS, row))
+        for key in ("payload", "result"):
+            if job[key] is not None:
+                job[key] = json.loads(job[key])
+        return job
+
+    def queue_depth(self) -> int:
+        """Return the number of jobs waiting for a worker."""
+        with self.tickets.db.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self._sql("SELECT COUNT(*) FROM {jobs} WHERE status = 'queued'"))
+            depth = cur.fetchone()[0]
+            cur.close()
+        return depth
+
+    # --- workers ---
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically move the oldest queued job to running and return it."""
+        with self.tickets.db.connection() as conn:
+            cur = conn.cursor()
+            if self.tickets.db.dialect == "postgres":
+                cur.execute(self._sql("""
+                    UPDATE {jobs}
+                    SET status = 'running', started_at = ?, attempts = attempts + 1
+                    WHERE id = (
+                        SELECT id FROM {jobs}
+                        WHERE status = 'queued'
+                        ORDER BY id
+                        FOR UPDATE SKIP LOCKED
+                        LIMIT 1
+                    )
+                    RETURNING job_id, kind, payload, ticket_id, callback_url, attempts
+                """), (_now(),))
+                row = cur.fetchone()
+            else:
+                self.tickets.begin_write(cur)
+                cur.execute(self._sql("""
+                    SELECT job_id, kind, payload, ticket_id, callback_url, attempts + 1
+                    FROM {jobs}
+                    WHERE status = 'queued'
+                    ORDER BY id
+                    LIMIT 1
+                """))
+                row = cur.fetchone()
+                if row:
+                    cur.execute(self._sql("""
+                        UPDATE {jobs}
+                        SET status = 'running', started_at = ?, attempts = attempts + 1
+                        WHERE job_id = ?
+                    """), (_now(), row[0]))
+            cur.close()
+        if not row:
+            return None
+        job = dict(zip(("job_id", "kind", "payload", "ticket_id", "callback_url", "attempts"), row))
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def _finish(self, job: Dict[str, Any], result: Any = None, error: Optional[str] = None) -> None:
+        retry = error is not None and job["attempts"] < MAX_ATTEMPTS
+        status = "queued" if retry else ("failed" if error else "done")
+        with self.tickets.db.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self._sql("""
+                UPDATE {jobs}
+                SET status = ?, result = ?, error = ?, finished_at = ?
+                WHERE job_id = ?
+            """), (
+                status,
+                json.dumps(result) if result is not None else None,
+                error,
+                None if retry else _now(),
+                job["job_id"],
+            ))
+            cur.close()
+        if error is None and job["kind"] == "process_ticket" and job.get("ticket_id"):
+            self.tickets.set_triage_result(job["ticket_id"], result)
+        if not retry and job.get("callback_url"):
+            self._notify(job["callback_url"], {
+                "job_id": job["job_id"],
+                "kind": job["kind"],
+                "status": status,
+                "ticket_id": job.get("ticket_id"),
+                "result": result,
+                "error": error,
+            })
+
+    @staticmethod
+    def _notify(url: str, body: Dict[str, Any]) -> None:
+        """POST the finished job to its webhook; delivery is best-effort."""
+        import requests
+
+        try:
+            # Re-checked at delivery: the host may resolve differently by now
+            check_callback_url(url)
+            requests.post(url, json=body, timeout=WEBHOOK_TIMEOUT, allow_redirects=False)
+        except (ValueError, requests.exceptions.RequestException) as e:
+            print(f"⚠️ Job webhook {url} failed: {e}")
+
+    def run_once(self) -> bool:
+        """Claim and run one job; returns False if the queue was empty."""
+        job = self.claim()
+        if job is None:
+            return False
+        handler = self._handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind: {job['kind']}")
+            result = handler(job["payload"])
+        except Exception as e:
+            self._finish(job, error=str(e))
+        else:
+            self._finish(job, result=result)
+        return True
+
+    def _worker_loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                if self.run_once():
+                    continue
+                self._requeue_stale_periodically()
+            except Exception as e:
+                print(f"❌ Job worker error: {e}")
+            # Woken early by enqueue() in this process; polls for other processes
+            self._wakeup.wait(POLL_INTERVAL)
+            self._wakeup.clear()
+
+    def requeue_stale(self, older_than: float = STALE_AFTER) -> int:
+        """Return jobs stuck in "running" for ``older_than`` seconds to the queue."""
+        cutoff = datetime.fromtimestamp(time.time() - older_than).strftime("%Y-%m-%d %H:%M:%S")
+        with self.tickets.db.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self._sql("""
+                UPDATE {jobs} SET status = 'queued'
+                WHERE status = 'running' AND started_at < ?
+            """), (cutoff,))
+            count = cur.rowcount
+            cur.close()
+        return count
+
+    def _requeue_stale_periodically(self) -> None:
+        """Recover jobs of crashed processes while this one keeps running."""
+        now = time.monotonic()
+        if now - self._last_requeue < STALE_AFTER / 2:
+            return
+        self._last_requeue = now
+        requeued = self.requeue_stale()
+        if requeued:
+            print(f"🔁 Re-queued {requeued} stale jobs")
+
+    def start_workers(self, count: int = WORKERS) -> None:
+        """Start ``count`` daemon worker threads draining the queue."""
+        self._requeue_stale_periodically()
+        for i in range(count):
+            worker = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop_workers(self, timeout: float = 30) -> None:
+        """Ask workers to exit after their current job and wait for them."""
+        self._stopping.set()
+        self._wakeup.set()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
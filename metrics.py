@@ -0,0 +1,487 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Modules declare their metrics at import time (``counter``, ``gauge``,
+``histogram``) and record into pre-resolved label children on the hot path;
+each child holds its own lock, so recording is a dict lookup, a bisect and an
+uncontended lock. Values that already live elsewhere (cache hit counts, pool
+sizes) are exposed with ``callback`` and only read when ``/metrics`` is
+scraped. ``LLMMetrics`` is a LangChain callback handler that times graph
+nodes and model calls.
+
+With several worker processes (gunicorn), set METRICS_MULTIPROC_DIR to a
+directory shared by them: each worker writes a snapshot of its registry there
+every METRICS_SNAPSHOT_INTERVAL seconds, and ``/metrics`` in any worker sums
+the snapshots. Counters and histograms keep the totals of workers that have
+exited, so they never go backwards; gauges count live workers only.
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+ENABLED = os.environ.get("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+MULTIPROC_DIR = os.environ.get("METRICS_MULTIPROC_DIR", "")
+SNAPSHOT_INTERVAL = float(os.environ.get("METRICS_SNAPSHOT_INTERVAL", "1"))
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Prometheus client defaults: request latencies from 5 ms to 10 s
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Value:
+    """A single counter or gauge series."""
+
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _Histogram:
+    """A single histogram series with fixed upper bounds."""
+
+    __slots__ = ("_lock", "bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        slot = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += value
+
+    def time(self) -> "_Timer":
+        """Context manager observing the duration of its block."""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram: _Histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start)
+
+
+class Metric:
+    """A named metric family; ``labels(...)`` returns (and caches) one series."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: Any):
+        key = tuple(map(str, values))
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def series(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        """Current ``(label values, value)`` pairs."""
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict[str, Any]:
+        """This metric as JSON-serializable data (what ``render`` prints)."""
+        return {
+            "help": self.help,
+            "kind": self.kind,
+            "labelnames": list(self.labelnames),
+            "series": [[list(key), value] for key, value in self.series()],
+        }
+
+    def render(self) -> List[str]:
+        return _render(self.name, self.snapshot())
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def series(self):
+        return [(key, child.value) for key, child in list(self._children.items())]
+
+    def reset(self) -> None:
+        for child in list(self._children.values()):
+            child.value = 0.0
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _Histogram(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def series(self):
+        pairs = []
+        for key, child in list(self._children.items()):
+            with child._lock:
+                pairs.append((key, [list(child.counts), child.sum]))
+        return pairs
+
+    def snapshot(self):
+        return {**super().snapshot(), "buckets": list(self.buckets)}
+
+    def reset(self) -> None:
+        for child in list(self._children.values()):
+            with child._lock:
+                child.counts = [0] * len(child.counts)
+                child.sum = 0.0
+
+
+class Callback(Metric):
+    """Counter or gauge whose values are read from ``fn`` at scrape time.
+
+    ``fn`` returns a number, or a dict from label-value tuples to numbers.
+    """
+
+    def __init__(self, name, help, fn: Callable[[], Any], kind: str = "gauge", labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.kind = kind
+        self._fn = fn
+
+    def series(self):
+        try:
+            values = self._fn()
+        except Exception:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [(tuple(map(str, key)), value) for key, value in values.items() if value is not None]
+
+    def reset(self) -> None:
+        pass  # read from its source, which the parent's values don't reach
+
+
+def _render(name: str, data: Dict[str, Any]) -> List[str]:
+    """Prometheus text lines for one metric's ``snapshot()``."""
+    lines = [f"# HELP {name} {data['help']}", f"# TYPE {name} {data['kind']}"]
+    labelnames = data["labelnames"]
+    for key, value in data["series"]:
+        if data["kind"] != "histogram":
+            lines.append(f"{name}{_labels(labelnames, key)} {_number(value)}")
+            continue
+        counts, total = value
+        cumulative = 0
+        for bound, count in zip(list(data["buckets"]) + [float("inf")], counts):
+            cumulative += count
+            le = f'le="{_number(float(bound))}"'
+            lines.append(f"{name}_bucket{_labels(labelnames, key, le)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labelnames, key)} {_number(total)}")
+        lines.append(f"{name}_count{_labels(labelnames, key)} {cumulative}")
+    return lines
+
+
+def _merge(snapshots: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Sum per-process registry snapshots; gauges only from live processes."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for snapshot in snapshots:
+        for name, data in snapshot["metrics"].items():
+            if data["kind"] == "gauge" and not snapshot["live"]:
+                continue
+            target = merged.setdefault(name, {**data, "series": {}})
+            if data.get("buckets") != target.get("buckets"):
+                continue  # redefined between deploys; keep the first layout
+            for key, value in data["series"]:
+                key = tuple(key)
+                previous = target["series"].get(key)
+                if previous is None:
+                    target["series"][key] = value
+                elif data["kind"] == "histogram":
+                    counts = [a + b for a, b in zip(previous[0], value[0])]
+                    target["series"][key] = [counts, previous[1] + value[1]]
+                else:
+                    target["series"][key] = previous + value
+    for data in merged.values():
+        data["series"] = [[list(key), value] for key, value in data["series"].items()]
+    return merged
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """Add ``metric``; re-registering a name returns the existing metric."""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {metric.name: metric.snapshot() for metric in list(self._metrics.values())}
+
+    def reset(self) -> None:
+        """Zero every value in place (label children stay valid for their holders)."""
+        for metric in list(self._metrics.values()):
+            metric.reset()
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name, data in self.snapshot().items():
+            lines.extend(_render(name, data))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labelnames))
+
+
+def gauge(name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, labelnames))
+
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+
+def callback(name: str, help: str, fn: Callable[[], Any], kind: str = "gauge",
+             labelnames: Sequence[str] = ()) -> Callback:
+    return REGISTRY.register(Callback(name, help, fn, kind, labelnames))
+
+
+def render() -> str:
+    """Every registered metric in Prometheus text format, summed over workers if multiprocess."""
+    if not MULTIPROC_DIR:
+        return REGISTRY.render()
+    write_snapshot()  # this worker's values as of now; others are at most one interval old
+    snapshots = []
+    for path in glob.glob(os.path.join(MULTIPROC_DIR, "*.json")):
+        try:
+            with open(path, encoding="utf-8") as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # removed or half-written by hand; ours are replaced atomically
+    lines: List[str] = []
+    for name, data in _merge(snapshots).items():
+        lines.extend(_render(name, data))
+    return "\n".join(lines) + "\n"
+
+
+# --- multiprocess ---
+
+_snapshot_thread: Optional[threading.Thread] = None
+
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(MULTIPROC_DIR, f"{pid}.json")
+
+
+def write_snapshot(live: bool = True) -> None:
+    """Write this process's registry to METRICS_MULTIPROC_DIR (no-op when unset)."""
+    if not MULTIPROC_DIR:
+        return
+    path = _snapshot_path(os.getpid())
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"pid": os.getpid(), "live": live, "metrics": REGISTRY.snapshot()}, f)
+    os.replace(tmp, path)
+
+
+def start_multiprocess() -> None:
+    """Call in each worker after fork: drop values inherited from the parent and
+    start writing snapshots every SNAPSHOT_INTERVAL seconds."""
+    global _snapshot_thread
+    if not MULTIPROC_DIR or _snapshot_thread is not None:
+        return
+    REGISTRY.reset()
+
+    def loop():
+        while True:
+            time.sleep(SNAPSHOT_INTERVAL)
+            try:
+                write_snapshot()
+            except OSError as e:
+                print(f"⚠️ Metrics snapshot failed: {e}")
+
+    _snapshot_thread = threading.Thread(target=loop, name="metrics-snapshot", daemon=True)
+    _snapshot_thread.start()
+
+
+def mark_process_dead(pid: int) -> None:
+    """Stop counting an exited worker's gauges; its counters and histograms stay in the totals."""
+    if not MULTIPROC_DIR:
+        return
+    path = _snapshot_path(pid)
+    try:
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return
+    snapshot["live"] = False
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(f"{path}.tmp", path)
+
+
+# --- LLM and graph timings ---
+
+LLM_CALL_SECONDS = histogram(
+    "llm_call_seconds", "Duration of chat model calls", ("model", "outcome"), LLM_BUCKETS
+)
+LLM_CALLS_IN_FLIGHT = gauge("llm_calls_in_flight", "Chat model calls currently running")
+GRAPH_NODE_SECONDS = histogram(
+    "graph_node_seconds", "Duration of LangGraph node runs", ("node", "outcome"), LLM_BUCKETS
+)
+GRAPH_RUN_SECONDS = histogram(
+    "graph_run_seconds", "Duration of top-level chain and graph runs", ("name", "outcome"), LLM_BUCKETS
+)
+
+
+class LLMMetrics(BaseCallbackHandler):
+    """Callback handler recording model-call, graph-node and graph-run durations.
+
+    Pass it in ``config={"callbacks": [llm_metrics]}``; a single instance is
+    safe to share between threads.
+    """
+
+    def __init__(self):
+        self._runs: Dict[UUID, Tuple[float, Any]] = {}
+
+    def _start(self, run_id: UUID, series) -> None:
+        self._runs[run_id] = (time.perf_counter(), series)
+
+    def _end(self, run_id: UUID, outcome: str) -> None:
+        started = self._runs.pop(run_id, None)
+        if started is not None:
+            start, series = started
+            series(outcome).observe(time.perf_counter() - start)
+
+    # Chains: the top-level run, and each node's own run (children of a
+    # node inherit its ``langgraph_node`` metadata but have other names)
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None,
+                       tags=None, metadata=None, **kwargs) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name") or "chain"
+        node = (metadata or {}).get("langgraph_node")
+        if parent_run_id is None:
+            self._start(run_id, lambda outcome: GRAPH_RUN_SECONDS.labels(name, outcome))
+        elif node and node == name:
+            self._start(run_id, lambda outcome: GRAPH_NODE_SECONDS.labels(node, outcome))
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs) -> None:
+        self._end(run_id, "ok")
+
+    def on_chain_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, "error")
+
+    # Models: chat models report through on_chat_model_start, others on_llm_start
+    def _model_start(self, serialized, run_id, metadata) -> None:
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get("name") or "unknown"
+        LLM_CALLS_IN_FLIGHT.inc()
+        self._start(run_id, lambda outcome: LLM_CALL_SECONDS.labels(model, outcome))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs) -> None:
+        self._model_start(serialized, run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs) -> None:
+        self._model_start(serialized, run_id, metadata)
+
+    def _model_end(self, run_id: UUID, outcome: str) -> None:
+        if run_id in self._runs:
+            LLM_CALLS_IN_FLIGHT.dec()
+        self._end(run_id, outcome)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        self._model_end(run_id, "ok")
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._model_end(run_id, "error")
+
+
+llm_metrics = LLMMetrics()
+# Handlers attached to every instrumented LLM/graph call (tracing adds its own)
+LLM_CALLBACKS: List[BaseCallbackHandler] = [llm_metrics]
+
+
+def llm_config(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Return ``config`` (a RunnableConfig dict) with the ``LLM_CALLBACKS`` handlers added."""
+    config = dict(config or {})
+    config["callbacks"] = list(config.get("callbacks") or []) + LLM_CALLBACKS
+    return config
@@ -0,0 +1,417 @@
+"""
+Read-only serving copy of the JCI retrieval index.
+
+Next to LangChain's ``index.faiss``/``index.pkl``, build_index.py writes a
+compact docstore: chunk texts and metadata in ``docstore.sqlite`` (plus an
+FTS5 full-text index of the same chunks, keyed by FAISS position) and the
+FAISS position -> chunk ID map in ``ids.npy``. The server memory-maps the
+FAISS index (``IO_FLAG_MMAP``) and opens both docstore files read-only instead
+of unpickling everything, so worker processes share the OS page cache rather
+than each holding a full copy. build_index.py swaps every file in with
+``os.replace`` and bumps the manifest ``version`` last; the server checks it
+every RETRIEVAL_RELOAD_INTERVAL seconds and reopens the index when it
+changes, leaving in-flight searches on the old mapping. ``warm_up()`` loads the embedder and index and
+runs one query at server start; ``/readyz`` reports ready once it finishes.
+
+``HybridRetriever`` fuses the dense FAISS ranking with BM25 over the FTS5
+index by reciprocal rank fusion, so exact standard codes ("IPSG.1",
+"MMU.04.00") that MiniLM embeds poorly are still found.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from collections.abc import Mapping
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+import tracing
+
+VECTORSTORE_PATH = os.environ.get("VECTORSTORE_PATH", "vector_database/vectorstore/jci_index")
+MANIFEST_NAME = "manifest.json"
+DOCSTORE_NAME = "docstore.sqlite"
+IDS_NAME = "ids.npy"
+MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+WARMUP = os.environ.get("RETRIEVAL_WARMUP", "1").lower() in ("1", "true", "yes")
+WARMUP_QUERY = "hand hygiene"
+# How often to check the manifest for a rebuilt index (0 = never reload)
+RELOAD_INTERVAL = float(os.environ.get("RETRIEVAL_RELOAD_INTERVAL", "10"))
+RETRIEVAL_MODES = ("hybrid", "vector", "bm25")
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "hybrid")
+RETRIEVAL_K = int(os.environ.get("RETRIEVAL_K", "4"))
+# Candidates taken from each ranking before fusion
+RETRIEVAL_FETCH_K = int(os.environ.get("RETRIEVAL_FETCH_K", "20"))
+# Reciprocal rank fusion constant (60 in the original RRF paper)
+RRF_K = int(os.environ.get("RETRIEVAL_RRF_K", "60"))
+STAGES = ("embed", "vector", "bm25", "fuse", "fetch", "total")
+# Standard codes in either edition's style: IPSG.1, MMU.4.1, IPSG.01.00
+STANDARD_CODE = re.compile(r"\b([A-Za-z]{2,4})\.?(\d+(?:\.\d+)*)\b")
+
+
+def load_manifest(index_path):
+    path = os.path.join(index_path, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def configure_search(index, meta):
+    """Apply the persisted query-time parameters (nprobe / efSearch) to ``index``."""
+    import faiss
+
+    params = faiss.ParameterSpace()
+    if meta.get("nprobe"):
+        params.set_index_parameter(index, "nprobe", meta["nprobe"])
+    if meta.get("ef_search"):
+        params.set_index_parameter(index, "efSearch", meta["ef_search"])
+
+
+class ChunkIds(Mapping):
+    """FAISS position -> chunk ID, backed by a memory-mapped ``.npy`` array."""
+
+    def __init__(self, path):
+        self._ids = np.load(path, mmap_mode="r")
+
+    def __getitem__(self, position):
+        if not 0 <= position < len(self._ids):
+            raise KeyError(position)
+        return self._ids[position].decode()
+
+    def __iter__(self):
+        return iter(range(len(self._ids)))
+
+    def __len__(self):
+        return len(self._ids)
+
+
+class SQLiteDocstore(Docstore):
+    """Read-only chunk lookup from ``docstore.sqlite``, one connection per thread."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro&immutable=1", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def search(self, search: str):
+        row = self._conn().execute(
+            "SELECT page_content, metadata FROM chunks WHERE chunk_id = ?", (search,)
+        ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+    def keyword_search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Return up to ``k`` (FAISS position, BM25 score) pairs, best first."""
+        match = fts_query(query)
+        if not match:
+            return []
+        try:
+            rows = self._conn().execute(
+                "SELECT rowid, bm25(chunks_fts) FROM chunks_fts WHERE chunks_fts MATCH ? "
+                "ORDER BY bm25(chunks_fts) LIMIT ?", (match, k)
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return []  # built before the full-text index existed
+        # FTS5's bm25() is negated so that smaller sorts first
+        return [(rowid, -score) for rowid, score in rows]
+
+
+def fts_query(text: str) -> str:
+    """Turn free text into an FTS5 OR-query; standard codes become phrases.
+
+    "IPSG.1" matches both "IPSG.1" (7th edition) and "IPSG.01.00" (8th).
+    """
+    terms = []
+    for code in STANDARD_CODE.finditer(text):
+        chapter, numbers = code.group(1).lower(), code.group(2).split(".")
+        terms.append(f'"{chapter} {" ".join(numbers)}"')
+        padded = " ".join(n.zfill(2) for n in numbers)
+        terms.append(f'"{chapter} {padded}"')
+    words = re.findall(r"\w+", STANDARD_CODE.sub(" ", text).lower())
+    terms.extend(f'"{word}"' for word in words if len(word) > 1)
+    return " OR ".join(dict.fromkeys(terms))
+
+
+def save_compact(vectorstore, index_path):
+    """Write the compact docstore and ID map for ``vectorstore`` into ``index_path``."""
+    ids = [vectorstore.index_to_docstore_id[i] for i in range(vectorstore.index.ntotal)]
+    width = max((len(i) for i in ids), default=1)
+    ids_path = os.path.join(index_path, IDS_NAME)
+    with open(f"{ids_path}.tmp", "wb") as f:
+        np.save(f, np.array(ids, dtype=f"S{width}"))
+
+    docstore_path = os.path.join(index_path, DOCSTORE_NAME)
+    tmp = f"{docstore_path}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    conn.execute(
+        "CREATE TABLE chunks (chunk_id TEXT PRIMARY KEY, page_content TEXT NOT NULL, metadata TEXT NOT NULL) "
+        "WITHOUT ROWID"
+    )
+    rows = []
+    for chunk_id in ids:
+        doc = vectorstore.docstore.search(chunk_id)
+        rows.append((chunk_id, doc.page_content, json.dumps(doc.metadata)))
+    conn.executemany("INSERT INTO chunks VALUES (?, ?, ?)", rows)
+    # BM25 side of hybrid retrieval; rowid is the chunk's FAISS position
+    conn.execute("CREATE VIRTUAL TABLE chunks_fts USING fts5(page_content, content='')")
+    conn.executemany(
+        "INSERT INTO chunks_fts (rowid, page_content) VALUES (?, ?)",
+        ((position, row[1]) for position, row in enumerate(rows)),
+    )
+    conn.commit()
+    conn.close()
+    os.replace(tmp, docstore_path)
+    os.replace(f"{ids_path}.tmp", ids_path)
+
+
+def read_index(path):
+    """Read a FAISS index memory-mapped where the layout supports it."""
+    import faiss
+
+    # IO_FLAG_MMAP maps IVF inverted lists; IO_FLAG_MMAP_IFC also maps flat codes
+    flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    try:
+        return faiss.read_index(path, flags)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+
+def load_vectorstore(index_path=VECTORSTORE_PATH, embeddings=None):
+    """Open ``index_path`` for querying, falling back to LangChain's pickle format."""
+    from langchain_community.vectorstores import FAISS
+
+    embeddings = embeddings or get_embeddings()
+    manifest = load_manifest(index_path) or {}
+    docstore_path = os.path.join(index_path, DOCSTORE_NAME)
+    ids_path = os.path.join(index_path, IDS_NAME)
+    if not (os.path.exists(docstore_path) and os.path.exists(ids_path)):
+        print("⚠️ No compact docstore found, loading index.pkl (re-run build_index.py to create one)")
+        vectorstore = FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+    else:
+        index = read_index(os.path.join(index_path, "index.faiss"))
+        vectorstore = FAISS(embeddings, index, SQLiteDocstore(docstore_path), ChunkIds(ids_path))
+    configure_search(vectorstore.index, manifest.get("index", {}))
+    return vectorstore
+
+
+class HybridRetriever:
+    """Dense + BM25 retrieval over the JCI index, fused by reciprocal rank."""
+
+    def __init__(self, vectorstore, k: int = RETRIEVAL_K, fetch_k: int = RETRIEVAL_FETCH_K,
+                 rrf_k: int = RRF_K, mode: str = RETRIEVAL_MODE):
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"mode must be one of {', '.join(RETRIEVAL_MODES)}")
+        self.vectorstore = vectorstore
+        self.k = k
+        self.fetch_k = fetch_k
+        self.rrf_k = rrf_k
+        self.mode = mode
+        self._timings = {stage: deque(maxlen=1000) for stage in STAGES}
+
+    def _vector_ranking(self, query: str, timings: Dict[str, float]) -> List[int]:
+        started = time.perf_counter()
+        with tracing.span("embedding.embed_query", model=MODEL):
+            vector = np.asarray([self.vectorstore.embedding_function.embed_query(query)], dtype=np.float32)
+        timings["embed"] = time.perf_counter() - started
+        started = time.perf_counter()
+        with tracing.span("retrieval.vector", fetch_k=self.fetch_k):
+            _, positions = self.vectorstore.index.search(vector, self.fetch_k)
+        timings["vector"] = time.perf_counter() - started
+        return [int(p) for p in positions[0] if p != -1]
+
+    def _bm25_ranking(self, query: str, timings: Dict[str, float]) -> List[int]:
+        started = time.perf_counter()
+        docstore = self.vectorstore.docstore
+        with tracing.span("retrieval.bm25", fetch_k=self.fetch_k):
+            hits = docstore.keyword_search(query, self.fetch_k) if hasattr(docstore, "keyword_search") else []
+        timings["bm25"] = time.perf_counter() - started
+        return [position for position, _ in hits]
+
+    def fuse(self, rankings: List[List[int]]) -> List[Tuple[int, float]]:
+        """Reciprocal rank fusion: score = sum of 1 / (rrf_k + rank) over rankings."""
+        scores: Dict[int, float] = {}
+        for ranking in rankings:
+            for rank, position in enumerate(ranking, start=1):
+                scores[position] = scores.get(position, 0.0) + 1.0 / (self.rrf_k + rank)
+        return sorted(scores.items(), key=lambda item: -item[1])
+
+    def search(self, query: str, k: Optional[int] = None, mode: Optional[str] = None):
+        """Return ``(documents, timings_ms)`` for ``query``.
+
+        Each document's metadata carries its fused score and its rank in the
+        vector and BM25 rankings (None where it was not retrieved).
+        """
+        k = k or self.k
+        mode = mode or self.mode
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"mode must be one of {', '.join(RETRIEVAL_MODES)}")
+        with tracing.span("retrieval.search", mode=mode, k=k):
+            return self._search(query, k, mode)
+
+    def _search(self, query: str, k: int, mode: str):
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
+        vector = self._vector_ranking(query, timings) if mode != "bm25" else []
+        bm25 = self._bm25_ranking(query, timings) if mode != "vector" else []
+
+        fuse_started = time.perf_counter()
+        fused = self.fuse([vector, bm25])[:k]
+        timings["fuse"] = time.perf_counter() - fuse_started
+
+        fetch_started = time.perf_counter()
+        with tracing.span("retrieval.fetch", documents=len(fused)):
+            documents = self._fetch(fused, vector, bm25)
+        timings["fetch"] = time.perf_counter() - fetch_started
+        timings["total"] = time.perf_counter() - started
+
+        for stage, seconds in timings.items():
+            self._timings[stage].append(seconds)
+        return documents, {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()}
+
+    def _fetch(self, fused: List[Tuple[int, float]], vector: List[int], bm25: List[int]) -> List[Document]:
+        vector_rank = {position: rank for rank, position in enumerate(vector, start=1)}
+        bm25_rank = {position: rank for rank, position in enumerate(bm25, start=1)}
+        documents = []
+        for position, score in fused:
+            doc = self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[position])
+            if not isinstance(doc, Document):
+                continue
+            doc.metadata = {
+                **doc.metadata,
+                "rrf_score": round(score, 6),
+                "vector_rank": vector_rank.get(position),
+                "bm25_rank": bm25_rank.get(position),
+            }
+            documents.append(doc)
+        return documents
+
+    def invoke(self, query: str, k: Optional[int] = None) -> List[Document]:
+        """Retriever-style entry point for the chat graph."""
+        return self.search(query, k)[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return p50/p95 latency in ms per retrieval stage."""
+        report: Dict[str, Any] = {"mode": self.mode, "k": self.k, "fetch_k": self.fetch_k, "rrf_k": self.rrf_k}
+        for stage, samples in self._timings.items():
+            ordered = sorted(samples)
+            report[stage] = {
+                "count": len(ordered),
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3) if ordered else None,
+                "p95_ms": round(ordered[int(len(ordered) * 0.95)] * 1000, 3) if ordered else None,
+            }
+        return report
+
+
+_lock = threading.Lock()
+_embeddings = None
+_vectorstore = None
+_retriever = None
+_loaded: Dict[str, Any] = {"path": None, "version": None, "checked_at": 0.0}
+_state: Dict[str, Any] = {"ready": not WARMUP, "error": None, "warm_up_s": None}
+
+
+def get_embeddings():
+    """Return the process-wide MiniLM embedder (shared with the semantic cache)."""
+    global _embeddings
+    with _lock:
+        if _embeddings is None:
+            from langchain_huggingface import HuggingFaceEmbeddings
+
+            _embeddings = HuggingFaceEmbeddings(model_name=MODEL)
+        return _embeddings
+
+
+def index_version(index_path):
+    """Return the build version recorded in the manifest (None before the first one)."""
+    return (load_manifest(index_path) or {}).get("version")
+
+
+def _load_consistent(index_path, embeddings, attempts=3):
+    """Load files from one build: retry if a rebuild swapped some of them meanwhile."""
+    for _ in range(attempts):
+        version = index_version(index_path)
+        vectorstore = load_vectorstore(index_path, embeddings)
+        consistent = len(vectorstore.index_to_docstore_id) == vectorstore.index.ntotal
+        if consistent and index_version(index_path) == version:
+            break
+        time.sleep(0.5)
+    return vectorstore, version
+
+
+def get_vectorstore(index_path: Optional[str] = None):
+    """Return the process-wide read-only JCI vector store.
+
+    Loaded on first use and reopened when build_index.py publishes a new
+    version; callers holding the previous store keep a valid mapping.
+    """
+    global _vectorstore
+    embeddings = get_embeddings()
+    index_path = index_path or VECTORSTORE_PATH
+    with _lock:
+        now = time.monotonic()
+        if _vectorstore is not None and _loaded["path"] == index_path:
+            if not RELOAD_INTERVAL or now - _loaded["checked_at"] < RELOAD_INTERVAL:
+                return _vectorstore
+            _loaded["checked_at"] = now
+            if index_version(index_path) == _loaded["version"]:
+                return _vectorstore
+            print(f"🔄 Retrieval index at {index_path} was rebuilt, reloading")
+        _vectorstore, version = _load_consistent(index_path, embeddings)
+        _loaded.update(path=index_path, version=version, checked_at=now)
+        return _vectorstore
+
+
+def get_retriever(index_path: Optional[str] = None) -> HybridRetriever:
+    """Return the process-wide hybrid retriever over the current JCI index."""
+    global _retriever
+    vectorstore = get_vectorstore(index_path)
+    with _lock:
+        if _retriever is None or _retriever.vectorstore is not vectorstore:
+            previous = _retriever
+            _retriever = HybridRetriever(vectorstore)
+            if previous is not None:
+                _retriever._timings = previous._timings  # keep latency history across reloads
+        return _retriever
+
+
+def warm_up(index_path: Optional[str] = None) -> bool:
+    """Load the embedder, index and chat graph and run one query; returns readiness."""
+    started = time.perf_counter()
+    try:
+        get_retriever(index_path).search(WARMUP_QUERY, k=1)
+        from app.graph import graph  # noqa: F401, WPS433
+    except Exception as e:
+        _state.update(ready=False, error=str(e))
+        print(f"❌ Retrieval warm-up failed: {e}")
+        return False
+    _state.update(ready=True, error=None, warm_up_s=round(time.perf_counter() - started, 3))
+    print(f"✅ Retrieval warmed up in {_state['warm_up_s']:.2f}s")
+    return True
+
+
+def start_warm_up(index_path: Optional[str] = None) -> None:
+    """Warm up on a background thread so the server can answer /healthz meanwhile."""
+    if not WARMUP:
+        return
+    threading.Thread(target=warm_up, args=(index_path,), name="retrieval-warm-up", daemon=True).start()
+
+
+def readiness() -> Dict[str, Any]:
+    """Return ``{"ready", "error", "warm_up_s"}``."""
+    return dict(_state)
@@ -0,0 +1,180 @@
+"""
+Semantic response cache for /chat.
+
+Queries are embedded with the same MiniLM model used by build_index.py and
+compared by cosine similarity against the cached queries, so paraphrases
+("what is the JCI hand hygiene standard" / "JCI hand hygiene standard?") are
+served from cache. Standard codes and other numbers in the query must match
+exactly as well, since "IPSG.1" and "IPSG.2" embed almost identically but
+have different answers. Entries expire after a TTL and the least recently used
+entry is evicted when the cache is full.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+import tracing
+
+THRESHOLD = float(os.environ.get("CHAT_CACHE_THRESHOLD", "0.92"))
+TTL = float(os.environ.get("CHAT_CACHE_TTL", "3600"))
+MAX_ENTRIES = int(os.environ.get("CHAT_CACHE_MAX_ENTRIES", "1000"))
+
+
+# A number with an optional chapter prefix: "IPSG.1", "ipsg 1", "MOI.2.1", "5"
+_CODE = re.compile(r"\b(?:([a-z]{2,6})[ .]?)?(\d+(?:\.\d+)*)\b")
+
+
+def _normalize(query: str) -> str:
+    # Dots inside codes are kept so "IPSG.1.1" and "IPSG.11" stay distinct
+    return re.sub(r"[^\w\s.]|\.(?!\w)", "", query.lower()).strip()
+
+
+def _codes(key: str) -> frozenset:
+    """Return the standard codes and numbers in a normalized query."""
+    return frozenset(
+        f"{prefix}.{number}" if prefix else number for prefix, number in _CODE.findall(key)
+    )
+
+
+def default_embedder() -> Callable[[str], List[float]]:
+    """Return the MiniLM query embedder shared with the retrieval index."""
+    from retrieval import get_embeddings
+
+    return get_embeddings().embed_query
+
+
+class SemanticCache:
+    """Nearest-neighbour cache of answers keyed on query embeddings."""
+
+    def __init__(
+        self,
+        embed: Optional[Callable[[str], List[float]]] = None,
+        threshold: float = THRESHOLD,
+        ttl: float = TTL,
+        max_entries: int = MAX_ENTRIES,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._embed = embed
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None  # (max_entries, dim), unit rows
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        self._lru: "OrderedDict[int, None]" = OrderedDict()  # slot -> None, oldest first
+        self._exact: Dict[str, int] = {}  # normalized query -> slot
+        self.hits = 0
+        self.misses = 0
+
+    def _vector(self, query: str) -> np.ndarray:
+        if self._embed is None:
+            self._embed = default_embedder()
+        with tracing.span("embedding.embed_query", component="semantic_cache"):
+            vector = np.asarray(self._embed(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, slot: int) -> None:
+        entry = self._entries.pop(slot)
+        self._valid[slot] = False
+        self._lru.pop(slot, None)
+        if self._exact.get(entry["key"]) == slot:
+            del self._exact[entry["key"]]
+
+    def _expired(self, slot: int, now: float) -> bool:
+        return self.ttl > 0 and now - self._entries[slot]["created"] > self.ttl
+
+    def _hit(self, slot: int, similarity: float) -> Dict[str, Any]:
+        self.hits += 1
+        self._lru.move_to_end(slot)
+        entry = self._entries[slot]
+        return {"answer": entry["answer"], "query": entry["query"], "similarity": similarity}
+
+    def lookup(self, query: str) -> Optional[Dict[str, Any]]:
+        """Return ``{"answer", "query", "similarity"}`` for the closest cached query, or None."""
+        now = time.time()
+        key = _normalize(query)
+        codes = _codes(key)
+        with self._lock:
+            slot = self._exact.get(key)
+            if slot is not None:
+                if not self._expired(slot, now):
+                    return self._hit(slot, 1.0)
+                self._drop(slot)
+            if not self._entries:
+                self.misses += 1
+                return None
+
+        vector = self._vector(query)  # embed outside the lock
+        with self._lock:
+            if self._vectors is None or not self._entries:
+                self.misses += 1
+                return None
+            similarities = self._vectors @ vector
+            similarities[~self._valid] = -np.inf
+            # Closest entry above the threshold that names the same codes
+            candidates = np.flatnonzero(similarities >= self.threshold)
+            candidates = candidates[np.argsort(-similarities[candidates])]
+            slot = next((int(c) for c in candidates if self._entries[int(c)]["codes"] == codes), None)
+            if slot is None:
+                self.misses += 1
+                return None
+            similarity = float(similarities[slot])
+            if self._expired(slot, now):
+                self._drop(slot)
+                self.misses += 1
+                return None
+            return self._hit(slot, similarity)
+
+    def get(self, query: str) -> Optional[str]:
+        """Return a cached answer for ``query`` or a close paraphrase of it."""
+        match = self.lookup(query)
+        return match["answer"] if match else None
+
+    def set(self, query: str, answer: str) -> None:
+        """Cache ``answer`` for ``query``, evicting the least recently used entry if full."""
+        vector = self._vector(query)
+        key = _normalize(query)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            slot = self._exact.get(key)
+            if slot is not None:
+                self._drop(slot)
+            elif len(self._entries) >= self.max_entries:
+                self._drop(next(iter(self._lru)))
+            slot = int(np.argmin(self._valid))  # first free slot
+            self._vectors[slot] = vector
+            self._valid[slot] = True
+            self._entries[slot] = {
+                "query": query, "key": key, "codes": _codes(key), "answer": answer, "created": time.time()
+            }
+            self._lru[slot] = None
+            self._exact[key] = slot
+
+    def clear(self) -> None:
+        """Drop every cached entry (counters are kept)."""
+        with self._lock:
+            self._valid[:] = False
+            self._entries.clear()
+            self._lru.clear()
+            self._exact.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size, hit/miss counts and hit rate."""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+        }
@@ -0,0 +1,322 @@
+"""
+Similar-incident search over ticket descriptions.
+
+Opt-in (``SIMILAR_SEARCH=1``): descriptions are embedded with the same MiniLM
+model as the JCI index and stored in a ``ticket_embeddings`` table keyed by
+``ticket_id``, so each ticket is embedded once no matter how many server
+processes run, and stored vectors stay attached to the right ticket across a
+backend switch or bulk reload. Every process keeps an in-memory FAISS
+inner-product index (unit vectors, i.e. cosine similarity) whose IDs are the
+table's ``seq`` column. A background thread embeds new tickets shortly after
+they are inserted and catches up on existing ones at startup (in one process
+only, when several run), then loads rows past the highest ``seq`` it holds.
+Metadata filters are resolved in SQL to ``seq`` values and applied inside the
+FAISS search as an ID selector, so filtered queries stay exact.
+
+    python similar.py        # embed every ticket that has no vector yet
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+import tracing
+from storage import TicketRepository
+
+EMBEDDINGS_TABLE = "ticket_embeddings"
+ENABLED = os.environ.get("SIMILAR_SEARCH", "0").lower() in ("1", "true", "yes")
+SYNC_BATCH_SIZE = int(os.environ.get("SIMILAR_SYNC_BATCH_SIZE", "256"))
+POLL_INTERVAL = float(os.environ.get("SIMILAR_POLL_INTERVAL", "30"))
+# Give the inserting transaction time to commit before syncing
+SYNC_DELAY = float(os.environ.get("SIMILAR_SYNC_DELAY", "0.5"))
+DEFAULT_K = 10
+MAX_K = 100
+RESULT_FIELDS = (
+    "ticket_id", "department", "issue_type", "priority", "status",
+    "harm_severity", "created_at", "description",
+)
+
+
+class SimilarIncidents:
+    """Vector index of ticket descriptions kept in step with the incidents table."""
+
+    def __init__(self, tickets: TicketRepository, embeddings=None, enabled: bool = ENABLED):
+        self.tickets = tickets
+        self.enabled = enabled
+        self._embeddings = embeddings
+        self._index = None
+        # Highest seq loaded into the index; rows up to it are searchable
+        self._loaded_seq = 0
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._may_embed: Callable[[], bool] = lambda: True
+        self._last_sync: Dict[str, Any] = {}
+        tickets.add_listener(self)
+
+    def _sql(self, sql: str) -> str:
+        return self.tickets.sql(sql, embeddings=EMBEDDINGS_TABLE)
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            from retrieval import get_embeddings
+
+            self._embeddings = get_embeddings()
+        return self._embeddings
+
+    # --- TicketRepository listener hooks ---
+
+    def init_schema(self, cur) -> None:
+        postgres = self.tickets.db.dialect == "postgres"
+        serial = "BIGSERIAL" if postgres else "INTEGER"
+        autoincrement = "" if postgres else " AUTOINCREMENT"
+        blob = "BYTEA" if postgres else "BLOB"
+        cur.execute(self._sql(f"""
+            CREATE TABLE IF NOT EXISTS {{embeddings}} (
+                seq {serial} PRIMARY KEY{autoincrement},
+                ticket_id VARCHAR(20) UNIQUE NOT NULL,
+                embedding {blob} NOT NULL
+            )
+        """))
+
+    def on_insert(self, cur, tickets: List[Dict[str, Any]]) -> None:
+        if self.enabled:
+            self._wakeup.set()
+
+    def on_status_change(self, cur, changes: List[Dict[str, Any]]) -> None:
+        pass
+
+    # --- index maintenance ---
+
+    @staticmethod
+    def _unit(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+    def _add(self, seqs: List[int], vectors: np.ndarray) -> None:
+        import faiss
+
+        with self._lock:
+            if self._index is None:
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vectors.shape[1]))
+            self._index.add_with_ids(vectors, np.asarray(seqs, dtype=np.int64))
+            self._loaded_seq = seqs[-1]
+
+    def _embed_batch(self) -> int:
+        """Embed and store up to SYNC_BATCH_SIZE tickets without a vector; returns how many."""
+        with self.tickets.db.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self._sql("""
+                SELECT t.ticket_id, t.description
+                FROM {table} t
+                WHERE NOT EXISTS (SELECT 1 FROM {embeddings} e WHERE e.ticket_id = t.ticket_id)
+                ORDER BY t.id
+                LIMIT ?
+            """), (SYNC_BATCH_SIZE,))
+            rows = cur.fetchall()
+            cur.close()
+        if not rows:
+            return 0
+        vectors = self._unit(self.embeddings.embed_documents([row[1] or "" for row in rows]))
+        with self.tickets.db.connection() as conn:
+            cur = conn.cursor()
+            if self.tickets.db.dialect == "postgres":
+                # Commit in seq order, so a reader past seq N never misses a row below it
+                cur.execute(self._sql("LOCK TABLE {embeddings} IN SHARE ROW EXCLUSIVE MODE"))
+            cur.executemany(self._sql("""
+                INSERT INTO {embeddings} (ticket_id, embedding)
+                VALUES (?, ?)
+                ON CONFLICT (ticket_id) DO NOTHING
+            """), [(row[0], vector.tobytes()) for row, vector in zip(rows, vectors)])
+            cur.close()
+        return len(rows)
+
+    def _load_stored(self) -> int:
+        """Load vectors stored since the last load (by any process) into memory."""
+        loaded = 0
+        while True:
+            with self.tickets.db.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(self._sql("""
+                    SELECT seq, embedding FROM {embeddings}
+                    WHERE seq > ?
+                    ORDER BY seq
+                    LIMIT ?
+                """), (self._loaded_seq, SYNC_BATCH_SIZE * 4))
+                rows = cur.fetchall()
+                cur.close()
+            if not rows:
+                return loaded
+            vectors = np.vstack([np.frombuffer(bytes(row[1]), dtype=np.float32) for row in rows])
+            self._add([row[0] for row in rows], vectors)
+            loaded += len(rows)
+
+    def sync(self, embed: bool = True) -> Dict[str, Any]:
+        """Bring the in-memory index up to date with the incidents table.
+
+        With ``embed=False`` only vectors another process stored are loaded.
+        """
+        with self._sync_lock:
+            started = time.perf_counter()
+            loaded = self._load_stored()
+            embedded = 0
+            while embed:
+                batch = self._embed_batch()
+                if not batch:
+                    break
+                embedded += batch
+                # Searchable batch by batch while catching up
+                loaded += self._load_stored()
+            self._last_sync = {
+                "loaded": loaded,
+                "embedded": embedded,
+                "seconds": round(time.perf_counter() - started, 3),
+            }
+            return self._last_sync
+
+    def _loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self.sync(embed=self._may_embed())
+            except Exception as e:
+                print(f"❌ Similar-incident sync failed: {e}")
+            if self._wakeup.wait(POLL_INTERVAL):
+                time.sleep(SYNC_DELAY)
+            self._wakeup.clear()
+
+    def start(self, may_embed: Optional[Callable[[], bool]] = None) -> None:
+        """Start the background sync thread (no-op when disabled).
+
+        ``may_embed`` is asked before each sync; with several worker
+        processes it lets exactly one of them embed while the rest only
+        load what it stored.
+        """
+        if not self.enabled or self._thread is not None:
+            return
+        if may_embed is not None:
+            self._may_embed = may_embed
+        self._thread = threading.Thread(target=self._loop, name="similar-incidents", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # --- queries ---
+
+    def _allowed_ids(self, filters: Optional[Dict[str, str]]) -> Optional[np.ndarray]:
+        """Return the FAISS IDs (seq values) of loaded tickets matching ``filters``."""
+        clauses, params = self.tickets._where(filters)
+        if not clauses:
+            return None
+        with self.tickets.db.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self._sql(f"""
+                SELECT seq FROM {{embeddings}}
+                WHERE seq <= ?
+                  AND ticket_id IN (SELECT ticket_id FROM {{table}} WHERE {' AND '.join(clauses)})
+            """), [self._loaded_seq, *params])
+            allowed = np.fromiter((row[0] for row in cur.fetchall()), dtype=np.int64)
+            cur.close()
+        return allowed
+
+    def _search(self, vector: np.ndarray, k: int, filters, exclude: Optional[int] = None):
+        import faiss
+
+        if not 1 <= k <= MAX_K:
+            raise ValueError(f"k must be between 1 and {MAX_K}")
+        allowed = self._allowed_ids(filters)
+        if allowed is not None and not len(allowed):
+            return []
+        wanted = k + (exclude is not None)
+        with self._lock:
+            if self._index is None or self._index.ntotal == 0:
+                return []
+            params = None
+            if allowed is not None:
+                selector = faiss.IDSelectorBatch(allowed)
+                params = faiss.SearchParameters(sel=selector)
+            scores, ids = self._index.search(vector[None, :], wanted, params=params)
+        hits = [
+            (int(seq), float(score))
+            for seq, score in zip(ids[0], scores[0])
+            if seq != -1 and seq != exclude
+        ]
+        return self._rows(hits[:k])
+
+    def _rows(self, hits) -> List[Dict[str, Any]]:
+        if not hits:
+            return []
+        with self.tickets.db.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self._sql(f"""
+                SELECT e.seq, {', '.join(f't.{field}' for field in RESULT_FIELDS)}
+                FROM {{embeddings}} e JOIN {{table}} t ON t.ticket_id = e.ticket_id
+                WHERE e.seq IN ({', '.join('?' for _ in hits)})
+            """), [seq for seq, _ in hits])
+            rows = {row[0]: dict(zip(RESULT_FIELDS, row[1:])) for row in cur.fetchall()}
+            cur.close()
+        results = []
+        for seq, score in hits:
+            if seq in rows:
+                results.append({**rows[seq], "score": round(score, 4)})
+        return results
+
+    def search(self, query: str, k: int = DEFAULT_K, filters: Optional[Dict[str, str]] = None):
+        """Return up to ``k`` tickets whose descriptions are closest to ``query``."""
+        if not query.strip():
+            raise ValueError("Query must not be empty")
+        with tracing.span("embedding.embed_query", component="similar_incidents"):
+            vector = self._unit([self.embeddings.embed_query(query)])[0]
+        return self._search(vector, k, filters)
+
+    def similar(self, ticket_id: str, k: int = DEFAULT_K, filters: Optional[Dict[str, str]] = None):
+        """Return up to ``k`` tickets similar to ``ticket_id`` (excluding it), or None if unknown."""
+        with self.tickets.db.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self._sql("""
+                SELECT t.description, e.seq
+                FROM {table} t LEFT JOIN {embeddings} e ON e.ticket_id = t.ticket_id
+                WHERE t.ticket_id = ?
+            """), (ticket_id,))
+            row = cur.fetchone()
+            cur.close()
+        if not row:
+            return None
+        seq = row[1]
+        with self._lock:
+            loaded = seq is not None and seq <= self._loaded_seq
+            vector = self._index.reconstruct(seq) if loaded else None
+        if vector is None:
+            # Not synced yet: embed on the fly rather than wait for the thread
+            with tracing.span("embedding.embed_query", component="similar_incidents"):
+                vector = self._unit([self.embeddings.embed_query(row[0] or "")])[0]
+        return self._search(vector, k, filters, exclude=seq)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return index size and the outcome of the last sync."""
+        return {
+            "enabled": self.enabled,
+            "indexed": self._index.ntotal if self._index is not None else 0,
+            "last_sync": self._last_sync,
+        }
+
+
+if __name__ == "__main__":
+    from storage import get_database
+
+    tickets = TicketRepository(get_database())
+    similar = SimilarIncidents(tickets)
+    tickets.init_schema()
+    print(f"✅ Similar-incident index synced: {similar.sync()}")
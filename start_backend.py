@@ -1,12 +1,17 @@
-
 #!/usr/bin/env python3
 """
 Simple startup script for the Incident Ticket Processing Backend
+
+    python start_backend.py              # gunicorn with gunicorn.conf.py (SERVER_* settings)
+    python start_backend.py --dev        # Flask debug server with auto-reload
+    python start_backend.py --install    # install requirements.txt first
 """
 
+import argparse
+import importlib.util
+import os
 import subprocess
 import sys
-import os
 
 def install_requirements():
     """Install required packages"""
@@ -19,31 +24,51 @@ def install_requirements():
         return False
     return True
 
-def start_server():
-    """Start the Flask server"""
-    print("🚀 Starting Flask server...")
+def start_dev_server():
+    """Start the Flask development server with the debugger and reloader"""
+    print("🚀 Starting Flask development server...")
     try:
         # Import and run the Flask app
         from UI import app
         app.run(host='127.0.0.1', port=8000, debug=True)
     except ImportError as e:
         print(f"❌ Import error: {e}")
-        print("💡 Make sure you're in the correct directory and all packages are installed")
+        print("💡 Make sure you're in the correct directory and all packages are installed (--install)")
     except Exception as e:
         print(f"❌ Server startup error: {e}")
 
+def start_server():
+    """Start gunicorn; exec so its master receives signals directly"""
+    if importlib.util.find_spec("gunicorn") is None:
+        # gunicorn needs a POSIX system; keep Windows and bare installs working
+        print("⚠️ gunicorn is not installed (it does not run on Windows); using Flask's threaded server")
+        from UI import app
+        host, _, port = os.environ.get("SERVER_BIND", "127.0.0.1:8000").rpartition(":")
+        app.run(host=host or "127.0.0.1", port=int(port), threaded=True, debug=False, use_reloader=False)
+        return
+    print("🚀 Starting gunicorn...")
+    os.execv(sys.executable, [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "UI:app"])
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Start the incident ticket backend")
+    parser.add_argument("--dev", action="store_true", help="Flask debug server with auto-reload")
+    parser.add_argument("--install", action="store_true", help="pip install -r requirements.txt first")
+    args = parser.parse_args()
+
     print("🏥 Incident Ticket Processing Backend")
     print("=" * 40)
-    
+
     # Check if we're in the right directory
     if not os.path.exists("UI.py"):
         print("❌ UI.py not found. Make sure you're in the correct directory.")
         sys.exit(1)
-    
-    # Install requirements if needed
-    if not install_requirements():
+
+    # Install requirements only when asked (not on every start)
+    if args.install and not install_requirements():
         sys.exit(1)
-    
+
     # Start the server
-    start_server()
+    if args.dev:
+        start_dev_server()
+    else:
+        start_server()
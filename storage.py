@@ -0,0 +1,872 @@
+"""Pooled, dialect-aware storage layer for incident tickets.
+
+The backend (PostgreSQL, or the local SQLite fallback) is chosen once when the
+database is first used instead of on every request. A background probe
+re-checks PostgreSQL periodically and switches backends when its availability
+changes, so request threads never pay the PostgreSQL connect timeout.
+"""
+
+import base64
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+import metrics
+import tracing
+
+# Load environment variables
+load_dotenv()
+
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "incidents.db")
+DB_BACKEND = os.environ.get("DB_BACKEND", "auto")  # auto | postgres | sqlite
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "5"))
+CONNECT_TIMEOUT = int(os.environ.get("DB_CONNECT_TIMEOUT", "3"))
+PROBE_INTERVAL = float(os.environ.get("DB_PROBE_INTERVAL", "30"))
+
+
+# Columns a client may request through ``fields=`` projections
+TICKET_COLUMNS = (
+    "ticket_id", "name", "department", "issue_type", "description",
+    "priority", "status", "harm_severity", "created_at", "updated_at",
+    "triage_result",
+)
+DEFAULT_LIST_FIELDS = ("ticket_id", "status", "updated_at")
+# Equality filters accepted by list queries (comma-separated values mean IN)
+TICKET_FILTERS = ("status", "priority", "department", "issue_type")
+# Each equality filter gets a composite index ending in the keyset columns
+INDEXED_COLUMNS = ("status", "priority", "department", "issue_type")
+MAX_PAGE_SIZE = 500
+BULK_BATCH_SIZE = int(os.environ.get("BULK_BATCH_SIZE", "500"))
+PRIORITIES = ("Low", "Medium", "High", "Critical")
+HARM_SEVERITIES = ("None", "Mild", "Moderate", "Severe", "Death")
+# Required ticket fields and the column widths PostgreSQL enforces
+REQUIRED_TICKET_FIELDS = {"name": 100, "department": 100, "issue_type": 100, "description": None}
+INSERT_COLUMNS = (
+    "ticket_id", "name", "department", "issue_type", "description",
+    "priority", "status", "created_at", "harm_severity",
+)
+# What listeners receive for each status change (plus ``new_status``)
+STATUS_CHANGE_COLUMNS = (
+    "ticket_id", "old_status", "priority", "department", "issue_type",
+    "harm_severity", "created_at",
+)
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "1000"))
+MAX_STATUS_UPDATES = int(os.environ.get("MAX_STATUS_UPDATES", "1000"))
+
+
+DB_POOL_WAIT = metrics.histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a free pooled connection", ("dialect",), metrics.DB_BUCKETS
+)
+DB_CONNECT = metrics.histogram(
+    "db_connect_seconds", "Time to open a new database connection", ("dialect",), metrics.DB_BUCKETS
+)
+DB_TRANSACTION = metrics.histogram(
+    "db_transaction_seconds", "Time a connection is checked out, queries and commit included",
+    ("dialect", "outcome"), metrics.DB_BUCKETS
+)
+DB_POOL_TIMEOUTS = metrics.counter(
+    "db_pool_timeouts_total", "Connection requests that gave up waiting for the pool", ("dialect",)
+)
+DB_CONNECTIONS_IN_USE = metrics.gauge(
+    "db_connections_in_use", "Connections currently checked out of the pool", ("dialect",)
+)
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free in time."""
+
+
+def encode_cursor(created_at: Any, row_id: int) -> str:
+    """Encode the keyset position of a row as an opaque URL-safe token."""
+    raw = json.dumps([str(created_at), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Decode a token from ``encode_cursor``; raises ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(created_at), int(row_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _timestamp_key(value: Any) -> str:
+    """Normalise a timestamp to ``YYYY-MM-DD HH:MM:SS`` for equality checks.
+
+    Accepts datetimes, SQLite/ISO strings and the HTTP dates Flask renders
+    datetimes as; raises ValueError otherwise.
+    """
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid timestamp: {value!r}")
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid timestamp: {value!r}") from None
+    return parsed.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def validate_ticket(record: Any) -> List[str]:
+    """Return the problems with a ticket record (empty if it can be inserted).
+
+    ``record`` may also be the exception raised while parsing it, in which
+    case that parse error is reported.
+    """
+    if isinstance(record, Exception):
+        return [f"Invalid JSON: {record}"]
+    if not isinstance(record, dict):
+        return ["Ticket must be a JSON object"]
+    errors = []
+    for field, max_len in REQUIRED_TICKET_FIELDS.items():
+        value = record.get(field)
+        if not isinstance(value, str) or not value.strip():
+            errors.append(f"'{field}' is required")
+        elif max_len and len(value) > max_len:
+            errors.append(f"'{field}' is longer than {max_len} characters")
+    priority = record.get("priority", "Medium")
+    if priority not in PRIORITIES:
+        errors.append(f"'priority' must be one of {', '.join(PRIORITIES)}")
+    harm_severity = record.get("harm_severity")
+    if harm_severity is not None and harm_severity not in HARM_SEVERITIES:
+        errors.append(f"'harm_severity' must be one of {', '.join(HARM_SEVERITIES)}")
+    return errors
+
+
+def _postgres_params() -> Dict[str, Any]:
+    return {
+        "host": os.environ.get("PGHOST", "localhost"),
+        "port": os.environ.get("PGPORT", "5432"),
+        "database": os.environ.get("PGDATABASE", "incidents"),
+        "user": os.environ.get("PGUSER", "postgres"),
+        "password": os.environ.get("PGPASSWORD", ""),
+        "connect_timeout": CONNECT_TIMEOUT,
+    }
+
+
+def connect_postgres():
+    """Open a new PostgreSQL connection (raises if unreachable)."""
+    import psycopg2
+
+    return psycopg2.connect(**_postgres_params())
+
+
+def connect_sqlite(path: str = SQLITE_PATH):
+    """Open a SQLite connection that may be handed between threads."""
+    conn = sqlite3.connect(path, timeout=POOL_TIMEOUT, check_same_thread=False)
+    # WAL lets readers proceed while a writer holds the database
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _is_closed(conn) -> bool:
+    closed = getattr(conn, "closed", 0)  # psycopg2 only
+    return bool(closed)
+
+
+class ConnectionPool:
+    """Bounded pool of DB-API connections shared by request threads.
+
+    At most ``size`` connections are open at once; callers block for up to
+    ``timeout`` seconds for one to be returned before ``PoolTimeout`` is raised.
+    """
+
+    def __init__(
+        self,
+        dialect: str,
+        connect: Callable[[], Any],
+        size: int = POOL_SIZE,
+        timeout: float = POOL_TIMEOUT,
+    ):
+        self.dialect = dialect
+        self.size = size
+        self._connect = connect
+        self._timeout = timeout
+        self._idle: "queue.LifoQueue[Any]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+        self._wait = DB_POOL_WAIT.labels(dialect)
+        self._connect_time = DB_CONNECT.labels(dialect)
+        self._in_use = DB_CONNECTIONS_IN_USE.labels(dialect)
+
+    def acquire(self):
+        """Check a connection out of the pool, opening one if none is idle."""
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self._timeout):
+            DB_POOL_TIMEOUTS.labels(self.dialect).inc()
+            raise PoolTimeout(f"No {self.dialect} connection free after {self._timeout}s")
+        self._wait.observe(time.perf_counter() - started)
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                with self._connect_time.time():
+                    conn = self._connect()
+            except Exception:
+                self._slots.release()
+                raise
+        self._in_use.inc()
+        return conn
+
+    def release(self, conn, discard: bool = False) -> None:
+        """Return a connection to the pool, closing it if it is no longer usable."""
+        try:
+            if discard or self._closed or _is_closed(conn):
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            else:
+                self._idle.put(conn)
+        finally:
+            self._in_use.dec()
+            self._slots.release()
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Yield a pooled connection; commit on success, roll back on error."""
+        with tracing.span("db.transaction", dialect=self.dialect) as span:
+            conn = self.acquire()
+            started = time.perf_counter()
+            discard = False
+            outcome = "commit"
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                # BaseException also covers GeneratorExit from abandoned streams
+                outcome = "rollback"
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+                raise
+            finally:
+                DB_TRANSACTION.labels(self.dialect, outcome).observe(time.perf_counter() - started)
+                self.release(conn, discard)
+                if span is not None:
+                    span.set(outcome=outcome)
+
+    def close(self) -> None:
+        """Close idle connections; connections still checked out close on release."""
+        self._closed = True
+        self.close_idle()
+
+    def close_idle(self) -> None:
+        """Close the idle connections but keep the pool usable (e.g. before fork)."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+class Database:
+    """Owns the active connection pool and keeps the backend choice current."""
+
+    def __init__(
+        self,
+        backend: str = DB_BACKEND,
+        sqlite_path: str = SQLITE_PATH,
+        probe_interval: float = PROBE_INTERVAL,
+    ):
+        self.sqlite_path = sqlite_path
+        self._backend = backend
+        self._switch_hooks: List[Callable[["Database"], None]] = []
+        self._lock = threading.Lock()
+        self.pool = self._select_pool()
+        self._probe_interval = probe_interval
+        self._probe_pid: Optional[int] = None
+        self.start_probe()
+
+    @property
+    def dialect(self) -> str:
+        return self.pool.dialect
+
+    def connection(self):
+        """Context manager yielding a connection from the active pool."""
+        return self.pool.connection()
+
+    def on_switch(self, hook: Callable[["Database"], None]) -> None:
+        """Register a callback run after the active backend changes."""
+        self._switch_hooks.append(hook)
+
+    def _postgres_pool(self) -> ConnectionPool:
+        return ConnectionPool("postgres", connect_postgres)
+
+    def _sqlite_pool(self) -> ConnectionPool:
+        return ConnectionPool("sqlite", lambda: connect_sqlite(self.sqlite_path))
+
+    def _select_pool(self) -> ConnectionPool:
+        if self._backend == "sqlite":
+            return self._sqlite_pool()
+        if self._backend == "postgres":
+            return self._postgres_pool()
+        if _postgres_reachable():
+            return self._postgres_pool()
+        print("PostgreSQL not available, using SQLite")
+        return self._sqlite_pool()
+
+    def start_probe(self) -> None:
+        """Watch PostgreSQL health in this process (again after a fork) when backend is auto."""
+        if self._backend != "auto" or self._probe_interval <= 0 or self._probe_pid == os.getpid():
+            return
+        if not _psycopg2_available():
+            return
+        self._probe_pid = os.getpid()
+        probe = threading.Thread(
+            target=self._probe_loop, args=(self._probe_interval,), name="db-probe", daemon=True
+        )
+        probe.start()
+
+    def _probe_loop(self, interval: float) -> None:
+        while True:
+            time.sleep(interval)
+            healthy = _postgres_reachable()
+            if healthy and self.dialect == "sqlite":
+                print("PostgreSQL is reachable again, switching from SQLite")
+                self._switch(self._postgres_pool())
+            elif not healthy and self.dialect == "postgres":
+                print("PostgreSQL stopped responding, falling back to SQLite")
+                self._switch(self._sqlite_pool())
+
+    def _switch(self, pool: ConnectionPool) -> None:
+        with self._lock:
+            old, self.pool = self.pool, pool
+        old.close()
+        for hook in self._switch_hooks:
+            try:
+                hook(self)
+            except Exception as e:
+                print(f"Backend switch hook failed: {e}")
+
+
+def _psycopg2_available() -> bool:
+    try:
+        import psycopg2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _postgres_reachable() -> bool:
+    try:
+        conn = connect_postgres()
+    except Exception:
+        return False
+    conn.close()
+    return True
+
+
+_database: Optional[Database] = None
+_database_lock = threading.Lock()
+
+
+def get_database() -> Database:
+    """Return the process-wide Database, selecting the backend on first use."""
+    global _database
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                _database = Database()
+    return _database
+
+
+class TicketRepository:
+    """All ticket SQL lives here so routes never branch on the backend."""
+
+    def __init__(self, db: Database):
+        self.db = db
+        self._listeners: List[Any] = []
+        # Selectable columns that listeners add to the incidents table
+        self.extra_columns: List[str] = []
+        # Index name suffix -> columns for indexes listeners need on it
+        self.extra_indexes: Dict[str, str] = {}
+
+    def add_listener(self, listener: Any) -> None:
+        """Register an object kept in step with the incidents table.
+
+        Listeners implement ``init_schema(cur)``, ``on_insert(cur, tickets)``
+        and ``on_status_change(cur, changes)``; the last two run inside the
+        transaction that wrote the tickets, so derived tables never drift.
+        """
+        self._listeners.append(listener)
+
+    @property
+    def table(self) -> str:
+        return "incident.hp_incidents" if self.db.dialect == "postgres" else "incidents"
+
+    def table_name(self, name: str) -> str:
+        """Qualify a table name with the schema used by the active backend."""
+        return f"incident.{name}" if self.db.dialect == "postgres" else name
+
+    def begin_write(self, cur) -> None:
+        """Take the write lock up front so reads in this transaction stay valid."""
+        if self.db.dialect == "sqlite":
+            cur.execute("BEGIN IMMEDIATE")
+
+    @property
+    def _index_prefix(self) -> str:
+        return self.table.split(".")[-1]
+
+    def secondary_indexes(self) -> Dict[str, str]:
+        """Name -> columns of every index ``init_schema`` creates on the incidents table.
+
+        Includes the indexes of registered listeners; bulk loaders drop and
+        rebuild exactly this set.
+        """
+        prefix = self._index_prefix
+        indexes = {
+            # Keyset pagination walks (created_at, id)
+            f"{prefix}_created_idx": "created_at, id",
+            # Incremental exports read rows changed after a watermark
+            f"{prefix}_updated_idx": "updated_at, id",
+        }
+        # Filtered listings use a composite index with the filter column in front
+        for column in INDEXED_COLUMNS:
+            indexes[f"{prefix}_{column}_created_idx"] = f"{column}, created_at, id"
+        for suffix, columns in self.extra_indexes.items():
+            indexes[f"{prefix}_{suffix}_idx"] = columns
+        return indexes
+
+    def sql(self, sql: str, **tables: str) -> str:
+        """Fill in table names and convert ``?`` placeholders for psycopg2.
+
+        ``{table}`` is the incidents table; each keyword maps another
+        ``{placeholder}`` to a bare table name qualified via ``table_name``.
+        """
+        sql = sql.replace("{table}", self.table)
+        for key, name in tables.items():
+            sql = sql.replace(f"{{{key}}}", self.table_name(name))
+        if self.db.dialect == "postgres":
+            sql = sql.replace("?", "%s")
+        return sql
+
+    def init_schema(self) -> None:
+        """Create the incidents table if it does not exist."""
+        with self.db.connection() as conn:
+            cur = conn.cursor()
+            if self.db.dialect == "postgres":
+                cur.execute("CREATE SCHEMA IF NOT EXISTS incident;")
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS incident.hp_incidents (
+                        id SERIAL PRIMARY KEY,
+                        ticket_id VARCHAR(20) UNIQUE NOT NULL,
+                        name VARCHAR(100) NOT NULL,
+                        department VARCHAR(100) NOT NULL,
+                        issue_type VARCHAR(100) NOT NULL,
+                        description TEXT NOT NULL,
+                        priority VARCHAR(20) DEFAULT 'Medium',
+                        status VARCHAR(20) DEFAULT 'Open',
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    );
+                """)
+            else:
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS incidents (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        ticket_id TEXT UNIQUE NOT NULL,
+                        name TEXT NOT NULL,
+                        department TEXT NOT NULL,
+                        issue_type TEXT NOT NULL,
+                        description TEXT NOT NULL,
+                        priority TEXT DEFAULT 'Medium',
+                        status TEXT DEFAULT 'Open',
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    );
+                """)
+            # Columns added after the original schema (existing tables too)
+            self.add_column(cur, "harm_severity", "VARCHAR(20)")
+            self.add_column(cur, "triage_result", "TEXT")
+            for listener in self._listeners:
+                listener.init_schema(cur)
+            # After the listeners, whose columns some of these indexes cover
+            for name, columns in self.secondary_indexes().items():
+                cur.execute(self.sql(f"CREATE INDEX IF NOT EXISTS {name} ON {{table}} ({columns})"))
+            cur.close()
+
+    def add_column(self, cur, column: str, pg_type: str, table: Optional[str] = None) -> None:
+        """Add a nullable column to an existing table if it is missing."""
+        if self.db.dialect == "postgres":
+            target = self.table_name(table) if table else self.table
+            cur.execute(f"ALTER TABLE {target} ADD COLUMN IF NOT EXISTS {column} {pg_type}")
+            return
+        target = table or self.table
+        cur.execute(f"PRAGMA table_info({target})")
+        if column not in {row[1] for row in cur.fetchall()}:
+            cur.execute(f"ALTER TABLE {target} ADD COLUMN {column} {pg_type}")
+
+    @staticmethod
+    def _new_row(data: Dict[str, Any]) -> tuple:
+        """Build an INSERT_COLUMNS row for a new Open ticket."""
+        return (
+            str(uuid.uuid4())[:8].upper(),
+            data.get("name", ""),
+            data.get("department", ""),
+            data.get("issue_type", ""),
+            data.get("description", ""),
+            data.get("priority", "Medium"),
+            "Open",
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            data.get("harm_severity"),
+        )
+
+    def _insert(self, cur, rows: List[tuple]) -> None:
+        """Insert ticket rows with one statement per batch where possible."""
+        columns = ", ".join(INSERT_COLUMNS)
+        if self.db.dialect == "postgres":
+            from psycopg2.extras import execute_values
+
+            execute_values(
+                cur, f"INSERT INTO {self.table} ({columns}) VALUES %s", rows, page_size=len(rows)
+            )
+        else:
+            placeholders = ", ".join("?" for _ in INSERT_COLUMNS)
+            cur.executemany(f"INSERT INTO {self.table} ({columns}) VALUES ({placeholders})", rows)
+        if self._listeners:
+            inserted = [dict(zip(INSERT_COLUMNS, row)) for row in rows]
+            for listener in self._listeners:
+                listener.on_insert(cur, inserted)
+
+    def create_ticket(self, data: Dict[str, Any]) -> str:
+        """Insert a new Open ticket and return its generated ticket ID."""
+        row = self._new_row(data)
+        with self.db.connection() as conn:
+            cur = conn.cursor()
+            self._insert(cur, [row])
+            cur.close()
+        return row[0]
+
+    def create_tickets(
+        self, records: Iterable[Any], batch_size: int = BULK_BATCH_SIZE
+    ) -> List[Dict[str, Any]]:
+        """Validate and insert many tickets, one transaction per batch.
+
+        Returns one result per record, in input order: ``{"index", "ticket_id"}``
+        on success or ``{"index", "error"}`` if the record was invalid or its
+        batch failed to insert. ``records`` is consumed lazily.
+        """
+        batch_size = max(1, int(batch_size))
+        results: List[Dict[str, Any]] = []
+        batch: List[tuple] = []  # (index, row)
+
+        def flush():
+            try:
+                with self.db.connection() as conn:
+                    cur = conn.cursor()
+                    self._insert(cur, [row for _, row in batch])
+                    cur.close()
+                results.extend({"index": i, "ticket_id": row[0]} for i, row in batch)
+            except Exception as e:
+                results.extend({"index": i, "error": f"Database error: {e}"} for i, _ in batch)
+            batch.clear()
+
+        for index, record in enumerate(records):
+            errors = validate_ticket(record)
+            if errors:
+                results.append({"index": index, "error": "; ".join(errors)})
+                continue
+            batch.append((index, self._new_row(record)))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+        results.sort(key=lambda result: result["index"])
+        return results
+
+    def _where(self, filters: Optional[Dict[str, str]]):
+        """Build a WHERE clause (with params) from list/export filters."""
+        clauses, params = [], []
+        for key, value in (filters or {}).items():
+            if not value:
+                continue
+            if key in TICKET_FILTERS:
+                values = [v.strip() for v in str(value).split(",") if v.strip()]
+                clauses.append(f"{key} IN ({', '.join('?' for _ in values)})")
+                params.extend(values)
+            elif key == "created_from":
+                clauses.append("created_at >= ?")
+                params.append(value)
+            elif key == "created_to":
+                clauses.append("created_at <= ?")
+                params.append(value)
+            else:
+                raise ValueError(f"Unknown filter: {key}")
+        return clauses, params
+
+    @property
+    def columns(self) -> List[str]:
+        """Every column clients may select, including ones added by listeners."""
+        return list(TICKET_COLUMNS) + self.extra_columns
+
+    def _projection(self, fields: Optional[List[str]]) -> List[str]:
+        if not fields:
+            return list(DEFAULT_LIST_FIELDS)
+        unknown = [f for f in fields if f not in self.columns]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return list(dict.fromkeys(fields))
+
+    def list_tickets(
+        self,
+        filters: Optional[Dict[str, str]] = None,
+        fields: Optional[List[str]] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ):
+        """Return one page of tickets, newest first, and the next page's cursor.
+
+        Pages are keyed on ``(created_at, id)`` so every page costs an index
+        range scan of ``limit`` rows regardless of how many tickets exist.
+        """
+        columns = self._projection(fields)
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        clauses, params = self._where(filters)
+        if cursor:
+            clauses.append("(created_at, id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self.db.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self.sql(f"""
+                SELECT {', '.join(columns)}, created_at, id
+                FROM {{table}}
+                {where}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            """), (*params, limit + 1))
+            rows = cur.fetchall()
+            cur.close()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1])
+        n = len(columns)
+        return [dict(zip(columns, row[:n])) for row in rows], next_cursor
+
+    def iter_tickets(
+        self,
+        filters: Optional[Dict[str, str]] = None,
+        fields: Optional[List[str]] = None,
+        since: Optional[str] = None,
+        batch_size: int = EXPORT_BATCH_SIZE,
+    ) -> Iterator[Dict[str, Any]]:
+        """Stream every matching ticket in fixed-size batches.
+
+        Arguments are validated immediately; rows are only read as the
+        returned iterator is consumed. PostgreSQL uses a named (server-side)
+        cursor so memory stays constant regardless of table size. With
+        ``since``, only tickets updated after that timestamp are returned,
+        ordered by ``updated_at`` so the last row is the next watermark.
+        """
+        columns = self._projection(list(fields) if fields else self.columns)
+        batch_size = max(1, min(int(batch_size), 10 * EXPORT_BATCH_SIZE))
+        clauses, params = self._where(filters)
+        if since:
+            clauses.append("updated_at > ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        order = "updated_at, id" if since else "id"
+        sql = self.sql(f"SELECT {', '.join(columns)} FROM {{table}} {where} ORDER BY {order}")
+        return self._stream_rows(sql, params, columns, batch_size)
+
+    def _stream_rows(self, sql, params, columns, batch_size) -> Iterator[Dict[str, Any]]:
+        with self.db.connection() as conn:
+            if self.db.dialect == "postgres":
+                cur = conn.cursor(name=f"export_{uuid.uuid4().hex}")
+                cur.itersize = batch_size
+            else:
+                cur = conn.cursor()
+            try:
+                cur.execute(sql, params)
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield dict(zip(columns, row))
+            finally:
+                cur.close()
+
+    def get_status(self, ticket_id: str) -> Optional[Dict[str, Any]]:
+        """Return a single ticket's status, or None if it does not exist."""
+        with self.db.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self.sql("""
+                SELECT ticket_id, status, updated_at
+                FROM {table}
+                WHERE ticket_id = ?
+            """), (ticket_id,))
+            row = cur.fetchone()
+            cur.close()
+        if not row:
+            return None
+        return {"ticket_id": row[0], "status": row[1], "updated_at": row[2]}
+
+    def update_status(self, ticket_id: str, status: str) -> bool:
+        """Set a ticket's status; returns False if the ticket does not exist."""
+        with self.db.connection() as conn:
+            cur = conn.cursor()
+            if not self._listeners:
+                cur.execute(self.sql("""
+                    UPDATE {table}
+                    SET status = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE ticket_id = ?
+                """), (status, ticket_id))
+                updated = cur.rowcount > 0
+                cur.close()
+                return updated
+
+            # Listeners need the previous status, read under a row lock
+            self.begin_write(cur)
+            lock = " FOR UPDATE" if self.db.dialect == "postgres" else ""
+            cur.execute(self.sql(f"""
+                SELECT ticket_id, status, priority, department, issue_type,
+                       harm_severity, created_at
+                FROM {{table}}
+                WHERE ticket_id = ?{lock}
+            """), (ticket_id,))
+            row = cur.fetchone()
+            if not row:
+                cur.close()
+                return False
+            cur.execute(self.sql("""
+                UPDATE {table}
+                SET status = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE ticket_id = ?
+            """), (status, ticket_id))
+            change = dict(zip(STATUS_CHANGE_COLUMNS, row), new_status=status)
+            for listener in self._listeners:
+                listener.on_status_change(cur, [change])
+            cur.close()
+        return True
+
+    def update_statuses(self, updates: List[Any], atomic: bool = False) -> List[Dict[str, Any]]:
+        """Apply many status changes in one transaction.
+
+        Each update is ``{"ticket_id", "status"}`` plus an optional
+        ``expected_updated_at``: the change is only applied if the ticket's
+        ``updated_at`` still matches it (to the second). Returns one result per
+        update, in input order, whose ``result`` is ``updated``, ``invalid``,
+        ``not_found`` or ``conflict`` (with the ticket's current status and
+        ``updated_at``). With ``atomic`` nothing is written unless every update
+        can be applied; the others are then reported as ``skipped``.
+        """
+        if len(updates) > MAX_STATUS_UPDATES:
+            raise ValueError(f"At most {MAX_STATUS_UPDATES} updates per request")
+        results: List[Optional[Dict[str, Any]]] = [None] * len(updates)
+        pending: Dict[str, tuple] = {}  # ticket_id -> (index, status, expected key)
+        for index, update in enumerate(updates):
+            error = None
+            if not isinstance(update, dict):
+                error = "Update must be a JSON object"
+            elif not isinstance(update.get("ticket_id"), str) or not update["ticket_id"]:
+                error = "'ticket_id' is required"
+            elif not isinstance(update.get("status"), str) or not update["status"].strip():
+                error = "'status' is required"
+            elif update["ticket_id"] in pending:
+                error = "Duplicate ticket_id"
+            else:
+                try:
+                    expected = update.get("expected_updated_at")
+                    pending[update["ticket_id"]] = (
+                        index, update["status"], None if expected is None else _timestamp_key(expected)
+                    )
+                except ValueError as e:
+                    error = str(e)
+            if error:
+                ticket_id = update.get("ticket_id") if isinstance(update, dict) else None
+                results[index] = {"index": index, "ticket_id": ticket_id, "result": "invalid", "error": error}
+        if not pending:
+            return results
+
+        with self.db.connection() as conn:
+            cur = conn.cursor()
+            self.begin_write(cur)
+            lock = " FOR UPDATE" if self.db.dialect == "postgres" else ""
+            current: Dict[str, tuple] = {}
+            ids = list(pending)
+            for start in range(0, len(ids), BULK_BATCH_SIZE):
+                batch = ids[start:start + BULK_BATCH_SIZE]
+                # Lock rows in primary-key order so concurrent batches cannot deadlock
+                cur.execute(self.sql(f"""
+                    SELECT updated_at, ticket_id, status, priority, department,
+                           issue_type, harm_severity, created_at
+                    FROM {{table}}
+                    WHERE ticket_id IN ({', '.join('?' for _ in batch)})
+                    ORDER BY id{lock}
+                """), batch)
+                for row in cur.fetchall():
+                    current[row[1]] = row
+
+            changes = []
+            for ticket_id, (index, status, expected) in pending.items():
+                row = current.get(ticket_id)
+                if row is None:
+                    results[index] = {"index": index, "ticket_id": ticket_id, "result": "not_found",
+                                      "error": "Ticket not found"}
+                elif expected is not None and _timestamp_key(row[0]) != expected:
+                    results[index] = {"index": index, "ticket_id": ticket_id, "result": "conflict",
+                                      "error": "Ticket was modified since it was read",
+                                      "status": row[2], "updated_at": row[0]}
+                else:
+                    changes.append((index, dict(zip(STATUS_CHANGE_COLUMNS, row[1:]), new_status=status)))
+
+            if atomic and len(changes) < len(updates):
+                changes, skipped = [], changes
+                for index, change in skipped:
+                    results[index] = {"index": index, "ticket_id": change["ticket_id"], "result": "skipped",
+                                      "error": "Not applied because another update in the batch failed"}
+            if changes:
+                cur.executemany(self.sql("""
+                    UPDATE {table}
+                    SET status = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE ticket_id = ?
+                """), [(change["new_status"], change["ticket_id"]) for _, change in changes])
+                for listener in self._listeners:
+                    listener.on_status_change(cur, [change for _, change in changes])
+            cur.close()
+
+        for index, change in changes:
+            results[index] = {"index": index, "ticket_id": change["ticket_id"], "result": "updated",
+                              "status": change["new_status"]}
+        return results
+
+    def set_triage_result(self, ticket_id: str, result: Any) -> bool:
+        """Store the structured LLM analysis (as JSON) on a ticket row."""
+        with self.db.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self.sql("""
+                UPDATE {table}
+                SET triage_result = ?
+                WHERE ticket_id = ?
+            """), (json.dumps(result), ticket_id))
+            updated = cur.rowcount > 0
+            cur.close()
+        return updated
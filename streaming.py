@@ -0,0 +1,156 @@
+"""
+Token-level Server-Sent Events for /chat.
+
+The chat graph is streamed with LangGraph's ``stream_mode="messages"``, which
+yields message chunks as the model generates them. Each SSE event carries only
+the new text (``{"delta": ...}``), so the first words reach the client after
+the model's time-to-first-token and nothing is sent twice. If a later model
+call in the graph starts a new answer, a ``{"reset": true}`` event tells the
+client to discard the text so far. The final ``{"done": true}`` event reports
+time-to-first-token, delta count and bytes sent.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+import metrics
+
+CHAT_TTFT_SECONDS = metrics.histogram(
+    "chat_time_to_first_token_seconds", "Time from request to the first streamed answer token",
+    buckets=metrics.LLM_BUCKETS,
+)
+CHAT_STREAM_SECONDS = metrics.histogram(
+    "chat_stream_duration_seconds", "Duration of streamed /chat answers", ("outcome",), metrics.LLM_BUCKETS
+)
+
+
+def sse(payload: Dict[str, Any]) -> str:
+    """Format one SSE ``data:`` event."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def _text(content: Any) -> str:
+    """Text of a message's content, which may be a string or content blocks."""
+    if isinstance(content, str):
+        return content
+    parts = []
+    for block in content or []:
+        if isinstance(block, str):
+            parts.append(block)
+        elif isinstance(block, dict) and block.get("type") == "text":
+            parts.append(block.get("text", ""))
+    return "".join(parts)
+
+
+class StreamStats:
+    """Rolling time-to-first-token, duration and size of streamed answers."""
+
+    def __init__(self, window: int = 500):
+        self._lock = threading.Lock()
+        self._streams: deque = deque(maxlen=window)
+        self.total = 0
+        self.errors = 0
+
+    def record(self, ttft: Optional[float], seconds: float, sent: int, error: bool = False) -> None:
+        with self._lock:
+            self.total += 1
+            self.errors += error
+            self._streams.append((ttft, seconds, sent))
+        if ttft is not None:
+            CHAT_TTFT_SECONDS.observe(ttft)
+        CHAT_STREAM_SECONDS.labels("error" if error else "ok").observe(seconds)
+
+    @staticmethod
+    def _percentiles(values: List[float], scale: float = 1.0) -> Dict[str, Any]:
+        values = sorted(values)
+        if not values:
+            return {"p50": None, "p95": None}
+        return {
+            "p50": round(values[len(values) // 2] * scale, 3),
+            "p95": round(values[int(len(values) * 0.95)] * scale, 3),
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            streams = list(self._streams)
+        return {
+            "streams": self.total,
+            "errors": self.errors,
+            "ttft_ms": self._percentiles([s[0] for s in streams if s[0] is not None], 1000),
+            "duration_ms": self._percentiles([s[1] for s in streams], 1000),
+            "bytes": self._percentiles([s[2] for s in streams]),
+        }
+
+
+def stream_answer(
+    graph,
+    query: str,
+    on_complete: Optional[Callable[[str], None]] = None,
+    stats: Optional[StreamStats] = None,
+) -> Iterator[str]:
+    """Yield SSE events with incremental answer text from ``graph``.
+
+    ``on_complete`` receives the full answer once the stream has finished
+    (e.g. to cache it); it is not called if the graph fails.
+    """
+    started = time.perf_counter()
+    ttft = None
+    sent = 0
+    deltas = 0
+    answer: List[str] = []
+    current_id = None
+    error = None
+
+    def emit(payload):
+        nonlocal sent
+        event = sse(payload)
+        sent += len(event.encode())
+        return event
+
+    try:
+        state_in = {"messages": [HumanMessage(content=query)]}
+        for message, _metadata in graph.stream(state_in, config=metrics.llm_config(), stream_mode="messages"):
+            if not isinstance(message, AIMessage):
+                continue  # tool results, echoed inputs
+            delta = _text(message.content)
+            if not delta:
+                continue
+            if message.id and message.id != current_id:
+                if answer:
+                    answer = []
+                    yield emit({"reset": True})
+                current_id = message.id
+            if ttft is None:
+                ttft = time.perf_counter() - started
+            answer.append(delta)
+            deltas += 1
+            yield emit({"delta": delta})
+    except Exception as e:
+        error = str(e)
+        yield emit({"error": f"Chat error: {error}"})
+
+    seconds = time.perf_counter() - started
+    if stats is not None:
+        stats.record(ttft, seconds, sent, error=error is not None)
+    if error is None and on_complete and answer:
+        on_complete("".join(answer))
+    yield sse({
+        "done": True,
+        "ttft_ms": round(ttft * 1000, 1) if ttft is not None else None,
+        "total_ms": round(seconds * 1000, 1),
+        "deltas": deltas,
+        "bytes": sent,
+    })
+
+
+def stream_cached(answer: str, similarity: float) -> Iterator[str]:
+    """Replay a cached answer as a single-delta stream."""
+    delta = sse({"delta": answer})
+    yield delta
+    yield sse({"done": True, "cached": True, "similarity": round(similarity, 4), "deltas": 1,
+               "bytes": len(delta.encode())})
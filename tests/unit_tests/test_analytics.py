@@ -0,0 +1,91 @@
+import pytest
+
+from analytics import TicketRollups, bucket_of
+from storage import Database, TicketRepository
+
+CREATED = [
+    ("2024-03-04 09:15:00", "ICU", "Fall"),  # Monday
+    ("2024-03-04 09:45:00", "ER", "Fall"),
+    ("2024-03-04 17:00:00", "ICU", "Medication"),
+    ("2024-03-06 08:00:00", "ICU", "Fall"),
+    ("2024-03-11 12:00:00", "ER", "Medication"),  # the next Monday
+]
+
+
+@pytest.fixture
+def rollups(tmp_path):
+    db = Database(backend="sqlite", sqlite_path=str(tmp_path / "incidents.db"), probe_interval=0)
+    tickets = TicketRepository(db)
+    rollups = TicketRollups(tickets)
+    tickets.init_schema()
+    results = tickets.create_tickets([
+        {"name": "A. Nurse", "department": department, "issue_type": issue_type,
+         "description": "Incident", "priority": "High"}
+        for _, department, issue_type in CREATED
+    ])
+    with db.connection() as conn:
+        for (created_at, _, _), result in zip(CREATED, results):
+            conn.execute("UPDATE incidents SET created_at = ? WHERE ticket_id = ?",
+                         (created_at, result["ticket_id"]))
+    rollups.rebuild()
+    yield rollups
+    db.pool.close()
+
+
+def _ids(rollups):
+    """Ticket IDs in the order of CREATED."""
+    return [t["ticket_id"] for t in rollups.tickets.iter_tickets(fields=["ticket_id"])]
+
+
+def test_bucket_of_truncates_to_hour_day_and_monday():
+    assert bucket_of("2024-03-06 08:59:59", "hour") == "2024-03-06 08:00:00"
+    assert bucket_of("2024-03-06 08:59:59", "day") == "2024-03-06 00:00:00"
+    assert bucket_of("2024-03-06 08:59:59", "week") == "2024-03-04 00:00:00"
+
+
+def test_hourly_series(rollups):
+    points = rollups.timeseries("hour", "2024-03-04 00:00:00", "2024-03-05 00:00:00")
+
+    assert points == [
+        {"bucket": "2024-03-04 09:00:00", "created": 2, "resolved": 0},
+        {"bucket": "2024-03-04 17:00:00", "created": 1, "resolved": 0},
+    ]
+
+
+def test_weekly_series_grouped_and_filtered(rollups):
+    points = rollups.timeseries("week", "2024-03-04", "2024-03-18", group_by=["department"],
+                                filters={"issue_type": "Fall,Medication"})
+
+    assert points == [
+        {"bucket": "2024-03-04 00:00:00", "department": "ER", "created": 1, "resolved": 0},
+        {"bucket": "2024-03-04 00:00:00", "department": "ICU", "created": 3, "resolved": 0},
+        {"bucket": "2024-03-11 00:00:00", "department": "ER", "created": 1, "resolved": 0},
+    ]
+
+
+def test_status_changes_move_resolved_counts(rollups):
+    tickets, ids = rollups.tickets, _ids(rollups)
+    tickets.update_status(ids[0], "Resolved")
+    tickets.update_status(ids[1], "Closed")
+    tickets.update_status(ids[1], "In Progress")
+
+    points = rollups.timeseries("day", "2024-03-04", "2024-03-05")
+
+    assert points == [{"bucket": "2024-03-04 00:00:00", "created": 3, "resolved": 1}]
+
+
+@pytest.mark.parametrize("granularity", ["hour", "day", "week"])
+def test_rollups_match_naive_group_by(rollups, granularity):
+    tickets = rollups.tickets
+    tickets.update_status(_ids(rollups)[3], "Resolved")
+    tickets.create_ticket({"name": "B", "department": "ICU", "issue_type": "Fall", "description": "New"})
+    args = (granularity, "2024-03-01", "2100-01-01")
+
+    assert rollups.timeseries(*args, group_by=["issue_type"]) == rollups.naive_timeseries(*args, group_by=["issue_type"])
+
+
+def test_rejects_unknown_granularity_and_dimensions(rollups):
+    with pytest.raises(ValueError):
+        rollups.timeseries("month", "2024-03-01", "2024-04-01")
+    with pytest.raises(ValueError):
+        rollups.timeseries("day", "2024-03-01", "2024-04-01", group_by=["name"])
@@ -0,0 +1,79 @@
+import pytest
+
+from counters import TicketCounters
+from storage import Database, TicketRepository
+
+
+@pytest.fixture
+def repo(tmp_path):
+    db = Database(backend="sqlite", sqlite_path=str(tmp_path / "incidents.db"), probe_interval=0)
+    yield TicketRepository(db)
+    db.pool.close()
+
+
+def _ticket(**overrides):
+    ticket = {"name": "A. Nurse", "department": "ICU", "issue_type": "Fall",
+              "description": "Patient fell near the bed", "priority": "High"}
+    ticket.update(overrides)
+    return ticket
+
+
+def _execute(repo, sql, params=()):
+    with repo.db.connection() as conn:
+        conn.execute(sql, params)
+
+
+def test_counters_follow_inserts_and_status_changes(repo):
+    counters = TicketCounters(repo)
+    repo.init_schema()
+
+    first = repo.create_ticket(_ticket(priority="Critical"))
+    repo.create_tickets([_ticket(), _ticket(department="ER")])
+    repo.update_status(first, "In Progress")
+
+    stats = counters.snapshot()
+    assert stats["total_tickets"] == 3
+    assert stats["open_tickets"] == 2
+    assert stats["in_progress_tickets"] == 1
+    assert stats["critical_tickets"] == 1
+    assert stats["breakdown"]["department"] == {"ICU": 2, "ER": 1}
+    assert counters.reconcile() == {}
+
+
+def test_first_start_counts_existing_tickets(repo):
+    repo.init_schema()
+    repo.create_tickets([_ticket(), _ticket(priority="Critical")])
+
+    counters = TicketCounters(repo)
+    repo.init_schema()
+
+    assert counters.snapshot()["total_tickets"] == 2
+    assert counters.snapshot()["critical_tickets"] == 1
+
+
+def test_reconcile_reports_and_corrects_drift(repo):
+    counters = TicketCounters(repo)
+    repo.init_schema()
+    ticket_id = repo.create_ticket(_ticket())
+    # Edited by hand, bypassing the listeners
+    _execute(repo, "UPDATE incidents SET status = 'Resolved' WHERE ticket_id = ?", (ticket_id,))
+
+    drift = counters.reconcile()
+
+    assert drift == {"status:Open": -1, "status:Resolved": 1}
+    assert counters.snapshot()["resolved_tickets"] == 1
+    assert counters.reconcile() == {}
+
+
+def test_total_is_derived_from_status_rows(repo):
+    counters = TicketCounters(repo)
+    repo.init_schema()
+    repo.create_tickets([_ticket(), _ticket()])
+    # Left behind by versions that kept a separate total row
+    _execute(repo, "INSERT INTO ticket_counters VALUES ('total', '', 99)")
+
+    assert counters.snapshot()["total_tickets"] == 2
+    assert counters.reconcile() == {}
+    with repo.db.connection() as conn:
+        dimensions = {row[0] for row in conn.execute("SELECT dimension FROM ticket_counters")}
+    assert dimensions == {"status", "priority", "department", "issue_type"}
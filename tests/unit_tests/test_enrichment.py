@@ -0,0 +1,104 @@
+import json
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel
+
+from enrichment import TicketEnricher
+from storage import Database, TicketRepository
+
+
+class Analysis(BaseModel):
+    category: str
+    priority: str
+    severity: str
+
+
+def _analyze(messages):
+    text = messages[0].content
+    if "unreadable" in text:
+        raise ValueError("could not parse the model output")
+    return Analysis(category="Medication", priority="Critical", severity="Severe")
+
+
+@pytest.fixture
+def tickets(tmp_path):
+    db = Database(backend="sqlite", sqlite_path=str(tmp_path / "incidents.db"), probe_interval=0)
+    yield TicketRepository(db)
+    db.pool.close()
+
+
+def _enricher(tickets, enabled=True):
+    enricher = TicketEnricher(tickets, enabled=enabled, runnable=RunnableLambda(_analyze))
+    tickets.init_schema()
+    return enricher
+
+
+def _ticket(description="Wrong dose given"):
+    return {"name": "A. Nurse", "department": "ICU", "issue_type": "Other", "description": description}
+
+
+def _rows(tickets):
+    fields = ["ticket_id", "issue_type", "predicted_issue_type", "predicted_priority",
+              "predicted_harm_severity", "enrichment_status", "triage_result"]
+    return {row["ticket_id"]: row for row in tickets.iter_tickets(fields=fields)}
+
+
+def test_disabled_enricher_leaves_new_tickets_alone(tickets):
+    enricher = _enricher(tickets, enabled=False)
+    ticket_id = tickets.create_ticket(_ticket())
+
+    assert enricher.run_once() == 0
+    assert _rows(tickets)[ticket_id]["enrichment_status"] is None
+
+
+def test_new_tickets_are_enriched_in_a_batch(tickets):
+    enricher = _enricher(tickets)
+    results = tickets.create_tickets([_ticket(), _ticket("unreadable scan")])
+    good, bad = (result["ticket_id"] for result in results)
+    assert enricher.stats()["pending"] == 2
+
+    assert enricher.run_once() == 2
+
+    rows = _rows(tickets)
+    assert rows[good]["enrichment_status"] == "done"
+    # The reporter's issue type stays; the model's goes next to it
+    assert rows[good]["issue_type"] == "Other"
+    assert (rows[good]["predicted_issue_type"], rows[good]["predicted_priority"],
+            rows[good]["predicted_harm_severity"]) == ("Medication", "Critical", "Severe")
+    assert json.loads(rows[good]["triage_result"])["category"] == "Medication"
+    assert rows[bad]["enrichment_status"] == "failed"
+    assert "could not parse" in json.loads(rows[bad]["triage_result"])["error"]
+
+    stats = enricher.stats()
+    assert (stats["pending"], stats["processed"], stats["failed"]) == (0, 1, 1)
+    assert stats["last_batch"]["size"] == 2
+    assert enricher.run_once() == 0
+
+
+def test_claim_takes_each_pending_ticket_once(tickets):
+    enricher = _enricher(tickets)
+    tickets.create_tickets([_ticket() for _ in range(5)])
+
+    first, second = enricher.claim(limit=3), enricher.claim(limit=3)
+
+    assert len(first) == 3 and len(second) == 2
+    assert not {row[0] for row in first} & {row[0] for row in second}
+    assert enricher.stats()["running"] == 5
+
+
+def test_failed_batch_goes_back_to_pending(tickets, monkeypatch):
+    enricher = _enricher(tickets)
+    tickets.create_tickets([_ticket(), _ticket()])
+
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("model endpoint unavailable")
+
+    monkeypatch.setattr("enrichment.analyze_batch", unavailable)
+    with pytest.raises(ConnectionError):
+        enricher.run_once()
+
+    stats = enricher.stats()
+    assert (stats["pending"], stats["running"], stats["processed"], stats["failed"]) == (2, 0, 0, 0)
+    monkeypatch.undo()
+    assert enricher.run_once() == 2
@@ -0,0 +1,160 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import jobs
+from jobs import JobQueue, QueueFull, check_callback_url
+from storage import Database, TicketRepository
+
+
+@pytest.fixture
+def queue(tmp_path):
+    db = Database(backend="sqlite", sqlite_path=str(tmp_path / "incidents.db"), probe_interval=0)
+    tickets = TicketRepository(db)
+    tickets.init_schema()
+    queue = JobQueue(tickets, max_queued=3)
+    queue.init_schema()
+    queue.register("echo", lambda payload: {"echo": payload["text"]})
+    yield queue
+    db.pool.close()
+
+
+def _ticket():
+    return {"name": "A. Nurse", "department": "ICU", "issue_type": "Fall",
+            "description": "Patient fell near the bed"}
+
+
+def test_job_runs_and_stores_its_result(queue):
+    job_id = queue.enqueue("echo", {"text": "hi"})
+    assert queue.get(job_id)["status"] == "queued"
+
+    assert queue.run_once()
+
+    job = queue.get(job_id)
+    assert job["status"] == "done"
+    assert job["result"] == {"echo": "hi"}
+    assert job["attempts"] == 1
+    assert not queue.run_once()
+
+
+def test_jobs_are_claimed_oldest_first_and_only_once(queue):
+    first = queue.enqueue("echo", {"text": "1"})
+    second = queue.enqueue("echo", {"text": "2"})
+
+    assert queue.claim()["job_id"] == first
+    assert queue.claim()["job_id"] == second
+    assert queue.claim() is None
+
+
+def test_failed_job_is_retried_up_to_max_attempts(queue):
+    calls = []
+
+    def flaky(payload):
+        calls.append(payload)
+        raise RuntimeError("model timeout")
+
+    queue.register("flaky", flaky)
+    job_id = queue.enqueue("flaky", {})
+
+    queue.run_once()
+    assert queue.get(job_id)["status"] == "queued"
+    while queue.run_once():
+        pass
+
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "model timeout"
+    assert len(calls) == job["attempts"] == jobs.MAX_ATTEMPTS
+
+
+def test_enqueue_applies_backpressure_and_rejects_unknown_kinds(queue):
+    for i in range(3):
+        queue.enqueue("echo", {"text": str(i)})
+
+    with pytest.raises(QueueFull):
+        queue.enqueue("echo", {"text": "one too many"})
+    with pytest.raises(ValueError):
+        queue.enqueue("summarize", {})
+    assert queue.queue_depth() == 3
+
+
+def test_queue_limit_holds_under_concurrent_enqueues(queue):
+    accepted, rejected = [], []
+
+    def produce(i):
+        try:
+            accepted.append(queue.enqueue("echo", {"text": str(i)}))
+        except QueueFull:
+            rejected.append(i)
+
+    threads = [threading.Thread(target=produce, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert (len(accepted), len(rejected)) == (3, 13)
+    assert queue.queue_depth() == 3
+
+
+@pytest.mark.parametrize("url", [
+    "ftp://hooks.example/done",
+    "http://127.0.0.1:8000/admin",
+    "http://10.0.0.5/hook",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://[::1]/hook",
+])
+def test_callback_url_must_be_a_public_http_host(url):
+    with pytest.raises(ValueError):
+        check_callback_url(url)
+
+
+def test_callback_url_allowlist(monkeypatch):
+    check_callback_url("https://93.184.216.34/hook")  # public address literal
+    monkeypatch.setattr(jobs, "CALLBACK_HOSTS", {"hooks.example"})
+    check_callback_url("https://hooks.example/done")
+    with pytest.raises(ValueError):
+        check_callback_url("https://93.184.216.34/hook")
+
+
+def test_ticket_job_writes_result_back_and_notifies_webhook(queue, monkeypatch):
+    monkeypatch.setattr(jobs, "CALLBACK_HOSTS", {"hooks.example"})
+    sent = []
+    queue._notify = lambda url, body: sent.append((url, body))
+    ticket_id = queue.tickets.create_ticket(_ticket())
+    queue.register("process_ticket", lambda payload: {"priority": "High"})
+
+    job_id = queue.enqueue("process_ticket", {}, ticket_id=ticket_id, callback_url="https://hooks.example/done")
+    queue.run_once()
+
+    rows = list(queue.tickets.iter_tickets(fields=["ticket_id", "triage_result"]))
+    assert rows == [{"ticket_id": ticket_id, "triage_result": '{"priority": "High"}'}]
+    assert sent == [("https://hooks.example/done", {
+        "job_id": job_id, "kind": "process_ticket", "status": "done", "ticket_id": ticket_id,
+        "result": {"priority": "High"}, "error": None,
+    })]
+
+
+def test_only_ticket_analysis_jobs_take_a_ticket_id(queue):
+    ticket_id = queue.tickets.create_ticket(_ticket())
+    queue.register("chat", lambda payload: "answer")
+
+    with pytest.raises(ValueError):
+        queue.enqueue("chat", {"query": "q"}, ticket_id=ticket_id)
+    # Rows queued before the check must not overwrite the ticket either
+    queue._finish({"job_id": "x", "kind": "chat", "ticket_id": ticket_id, "attempts": 1}, result="answer")
+    rows = list(queue.tickets.iter_tickets(fields=["triage_result"]))
+    assert rows == [{"triage_result": None}]
+
+
+def test_requeue_stale_recovers_jobs_of_crashed_workers(queue):
+    job_id = queue.enqueue("echo", {"text": "hi"})
+    queue.claim()
+    long_ago = (datetime.now() - timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S")
+    with queue.tickets.db.connection() as conn:
+        conn.execute("UPDATE triage_jobs SET started_at = ? WHERE job_id = ?", (long_ago, job_id))
+
+    assert queue.requeue_stale(older_than=60) == 1
+    assert queue.run_once()
+    assert queue.get(job_id)["status"] == "done"
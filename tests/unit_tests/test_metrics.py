@@ -0,0 +1,119 @@
+import pytest
+
+import metrics
+
+
+def _samples(metric):
+    """``{series: value}`` from a metric's text exposition lines."""
+    lines = [line for line in metric.render() if not line.startswith("#")]
+    return dict(line.rsplit(" ", 1) for line in lines)
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    latency = metrics.Histogram("req_seconds", "Request latency", ("route",), buckets=(0.1, 0.5, 1.0))
+    series = latency.labels("/ticket")
+    for value in (0.05, 0.1, 0.3, 0.5, 2.0):
+        series.observe(value)
+
+    samples = _samples(latency)
+    assert samples['req_seconds_bucket{route="/ticket",le="0.1"}'] == "2"  # le is inclusive
+    assert samples['req_seconds_bucket{route="/ticket",le="0.5"}'] == "4"
+    assert samples['req_seconds_bucket{route="/ticket",le="1.0"}'] == "4"
+    assert samples['req_seconds_bucket{route="/ticket",le="+Inf"}'] == "5"
+    assert samples['req_seconds_count{route="/ticket"}'] == "5"
+    assert float(samples['req_seconds_sum{route="/ticket"}']) == pytest.approx(2.95)
+
+
+def test_render_has_help_and_type_headers():
+    latency = metrics.Histogram("req_seconds", "Request latency", buckets=(1.0,))
+    latency.observe(0.5)
+
+    lines = latency.render()
+    assert lines[:2] == ["# HELP req_seconds Request latency", "# TYPE req_seconds histogram"]
+    assert 'req_seconds_bucket{le="1.0"} 1' in lines
+
+
+def test_each_label_set_is_its_own_series():
+    requests = metrics.Counter("requests_total", "Requests", ("method", "status"))
+    requests.labels("GET", 200).inc()
+    requests.labels("GET", 200).inc()
+    requests.labels("POST", 500).inc(3)
+
+    assert _samples(requests) == {
+        'requests_total{method="GET",status="200"}': "2.0",
+        'requests_total{method="POST",status="500"}': "3.0",
+    }
+
+
+def test_label_values_are_escaped():
+    errors = metrics.Counter("errors_total", "Errors", ("message",))
+    errors.labels('bad "quote"\nand \\ slash').inc()
+
+    assert list(_samples(errors)) == ['errors_total{message="bad \\"quote\\"\\nand \\\\ slash"}']
+
+
+def test_wrong_label_count_is_rejected():
+    requests = metrics.Counter("requests_total", "Requests", ("method",))
+    with pytest.raises(ValueError):
+        requests.labels("GET", "extra")
+
+
+def test_callback_is_read_at_scrape_time():
+    depth = {"value": 1}
+    queued = metrics.Callback("queue_depth", "Queued jobs", lambda: depth["value"])
+    depth["value"] = 7
+
+    assert _samples(queued) == {"queue_depth": "7"}
+
+
+def test_registry_returns_the_existing_metric_for_a_name():
+    registry = metrics.Registry()
+    first = registry.register(metrics.Counter("jobs_total", "Jobs"))
+    again = registry.register(metrics.Counter("jobs_total", "Jobs"))
+    first.inc()
+
+    assert again is first
+    assert registry.render().endswith("jobs_total 1.0\n")
+
+
+def _worker(requests_served, in_flight):
+    """A worker process's registry, as its snapshot file would hold it."""
+    registry = metrics.Registry()
+    requests = registry.register(metrics.Counter("requests_total", "Requests", ("route",)))
+    latency = registry.register(metrics.Histogram("req_seconds", "Latency", buckets=(0.1, 1.0)))
+    busy = registry.register(metrics.Gauge("in_flight", "In flight"))
+    requests.labels("/ticket").inc(requests_served)
+    for _ in range(requests_served):
+        latency.observe(0.05)
+    busy.set(in_flight)
+    return registry
+
+
+def test_multiprocess_render_sums_workers_and_keeps_exited_totals(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "MULTIPROC_DIR", str(tmp_path))
+    for pid, (served, busy) in {101: (3, 4), 102: (5, 7)}.items():
+        with monkeypatch.context() as other:
+            other.setattr(metrics.os, "getpid", lambda pid=pid: pid)
+            other.setattr(metrics, "REGISTRY", _worker(served, busy))
+            metrics.write_snapshot()
+    metrics.mark_process_dead(102)
+    # The scraped worker writes its own snapshot before summing
+    monkeypatch.setattr(metrics, "REGISTRY", _worker(requests_served=2, in_flight=1))
+
+    samples = dict(line.rsplit(" ", 1) for line in metrics.render().splitlines() if not line.startswith("#"))
+
+    assert samples['requests_total{route="/ticket"}'] == "10.0"  # exited worker still counted
+    assert samples['req_seconds_bucket{le="0.1"}'] == "10"
+    assert samples["req_seconds_count"] == "10"
+    assert samples["in_flight"] == "5"  # live workers only
+
+
+def test_reset_zeroes_values_in_place():
+    registry = _worker(requests_served=3, in_flight=2)
+    child = registry._metrics["requests_total"].labels("/ticket")
+
+    registry.reset()
+    child.inc()
+
+    assert 'requests_total{route="/ticket"} 1.0' in registry.render()
+    assert 'req_seconds_count 0' in registry.render()
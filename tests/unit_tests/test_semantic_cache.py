@@ -0,0 +1,94 @@
+import time
+
+import numpy as np
+import pytest
+
+from semantic_cache import SemanticCache
+
+VECTORS = {
+    "what does ipsg.1 require": [1.0, 0.0, 0.0],
+    "ipsg.1 requirements": [0.95, 0.31, 0.0],
+    "what does ipsg.2 require": [1.0, 0.0, 0.0],
+    "ipsg.1.1 requirements": [0.95, 0.31, 0.0],
+    "ipsg.11 requirements": [0.95, 0.31, 0.0],
+    "how do i dispose of sharps waste": [0.0, 0.0, 1.0],
+}
+
+
+def embed(query):
+    return VECTORS[query.lower().rstrip("?")]
+
+
+def _similarity(cached, query):
+    """Cosine similarity the cache computes between two queries."""
+    probe = SemanticCache(embed=embed, threshold=-1.0)
+    probe.set(cached, "answer")
+    return probe.lookup(query)["similarity"]
+
+
+def test_hit_at_threshold_and_miss_just_above():
+    similarity = _similarity("What does IPSG.1 require?", "IPSG.1 requirements")
+
+    at = SemanticCache(embed=embed, threshold=similarity)
+    at.set("What does IPSG.1 require?", "IPSG.1 answer")
+    match = at.lookup("IPSG.1 requirements")
+    assert match["answer"] == "IPSG.1 answer"
+    assert match["query"] == "What does IPSG.1 require?"
+
+    above = SemanticCache(embed=embed, threshold=float(np.nextafter(np.float32(similarity), np.float32(2))))
+    above.set("What does IPSG.1 require?", "IPSG.1 answer")
+    assert above.lookup("IPSG.1 requirements") is None
+    assert (above.hits, above.misses) == (0, 1)
+
+
+def test_exact_match_ignores_case_and_punctuation():
+    cache = SemanticCache(embed=embed, threshold=0.99)
+    cache.set("What does IPSG.1 require?", "IPSG.1 answer")
+
+    assert cache.lookup("what does ipsg.1 require")["similarity"] == 1.0
+
+
+def test_different_standard_code_never_hits():
+    # Identical embeddings: only the codes tell these questions apart
+    cache = SemanticCache(embed=embed, threshold=0.5)
+    cache.set("What does IPSG.1 require?", "IPSG.1 answer")
+
+    assert cache.lookup("What does IPSG.2 require?") is None
+
+
+def test_unrelated_question_misses():
+    cache = SemanticCache(embed=embed, threshold=0.9)
+    cache.set("What does IPSG.1 require?", "IPSG.1 answer")
+
+    assert cache.lookup("How do I dispose of sharps waste?") is None
+    assert cache.stats()["hit_rate"] == 0.0
+
+
+def test_expired_entries_miss(monkeypatch):
+    cache = SemanticCache(embed=embed, threshold=0.9, ttl=60)
+    cache.set("What does IPSG.1 require?", "IPSG.1 answer")
+    now = time.time()
+    monkeypatch.setattr("semantic_cache.time.time", lambda: now + 61)
+
+    assert cache.lookup("IPSG.1 requirements") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticCache(embed=embed, threshold=0.99, max_entries=2)
+    cache.set("What does IPSG.1 require?", "IPSG.1 answer")
+    cache.set("How do I dispose of sharps waste?", "sharps answer")
+    cache.lookup("What does IPSG.1 require?")  # now the most recently used
+    cache.set("What does IPSG.2 require?", "IPSG.2 answer")
+
+    assert cache.get("How do I dispose of sharps waste?") is None
+    assert cache.get("What does IPSG.1 require?") == "IPSG.1 answer"
+    assert cache.get("What does IPSG.2 require?") == "IPSG.2 answer"
+
+
+@pytest.mark.parametrize("query", ["IPSG.1.1 requirements", "IPSG.11 requirements"])
+def test_sub_standard_codes_are_distinct(query):
+    cache = SemanticCache(embed=embed, threshold=0.5)
+    cache.set("IPSG.1 requirements", "IPSG.1 answer")
+
+    assert cache.lookup(query) is None
@@ -0,0 +1,96 @@
+import pytest
+
+from similar import SimilarIncidents
+from storage import Database, TicketRepository
+
+WORDS = ("fall", "medication", "fire", "bed")
+
+
+class KeywordEmbeddings:
+    """Bag-of-keywords vectors, so similarity is predictable; counts embedded texts."""
+
+    def __init__(self):
+        self.embedded = 0
+
+    def embed_query(self, text):
+        return [text.lower().count(word) + 0.01 for word in WORDS]
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return [self.embed_query(text) for text in texts]
+
+
+@pytest.fixture
+def tickets(tmp_path):
+    db = Database(backend="sqlite", sqlite_path=str(tmp_path / "incidents.db"), probe_interval=0)
+    yield TicketRepository(db)
+    db.pool.close()
+
+
+def _similar(tickets, embeddings=None):
+    similar = SimilarIncidents(tickets, embeddings=embeddings or KeywordEmbeddings(), enabled=True)
+    tickets.init_schema()
+    return similar
+
+
+def _create(tickets, description, department="ICU"):
+    return tickets.create_ticket({"name": "A. Nurse", "department": department, "issue_type": "Other",
+                                  "description": description})
+
+
+def test_search_ranks_by_description_and_applies_filters(tickets):
+    similar = _similar(tickets)
+    fall = _create(tickets, "Patient fall near the bed")
+    er_fall = _create(tickets, "Fall in the corridor", department="ER")
+    _create(tickets, "Wrong medication dose")
+    assert similar.sync()["embedded"] == 3
+
+    results = similar.search("fall", k=2)
+    assert {r["ticket_id"] for r in results} == {fall, er_fall}
+    assert results[0]["score"] >= results[1]["score"]
+
+    results = similar.search("fall", k=5, filters={"department": "ER"})
+    assert [r["ticket_id"] for r in results] == [er_fall]
+    assert similar.search("fall", filters={"department": "Radiology"}) == []
+
+
+def test_similar_excludes_the_ticket_itself(tickets):
+    similar = _similar(tickets)
+    fall = _create(tickets, "Patient fall")
+    other_fall = _create(tickets, "Fall from bed")
+    _create(tickets, "Fire alarm")
+    similar.sync()
+
+    results = similar.similar(fall, k=1)
+
+    assert [r["ticket_id"] for r in results] == [other_fall]
+    assert similar.similar("MISSING") is None
+
+
+def test_other_processes_load_stored_vectors_instead_of_embedding(tickets):
+    first = _similar(tickets)
+    _create(tickets, "Patient fall")
+    first.sync()
+
+    embeddings = KeywordEmbeddings()
+    second = _similar(tickets, embeddings)
+    result = second.sync()
+
+    assert (result["loaded"], result["embedded"], embeddings.embedded) == (1, 0, 0)
+    assert second.stats()["indexed"] == 1
+
+
+def test_sync_loads_only_rows_stored_since_the_last_one(tickets):
+    first = _similar(tickets)
+    second = _similar(tickets, KeywordEmbeddings())
+    _create(tickets, "Patient fall")
+    first.sync()
+    assert second.sync(embed=False)["loaded"] == 1
+
+    er_fall = _create(tickets, "Fall in the corridor", department="ER")
+    first.sync()
+    assert second.sync(embed=False)["loaded"] == 1
+    assert second.sync(embed=False)["loaded"] == 0
+
+    assert second.stats()["indexed"] == 2
+    assert [r["ticket_id"] for r in second.search("fall", filters={"department": "ER"})] == [er_fall]
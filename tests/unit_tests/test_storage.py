@@ -0,0 +1,239 @@
+import threading
+
+import pytest
+
+from storage import (
+    ConnectionPool, Database, PoolTimeout, TicketRepository, connect_sqlite, decode_cursor, encode_cursor,
+)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    db = Database(backend="sqlite", sqlite_path=str(tmp_path / "incidents.db"), probe_interval=0)
+    repository = TicketRepository(db)
+    repository.init_schema()
+    yield repository
+    db.pool.close()
+
+
+def _ticket(**overrides):
+    ticket = {"name": "A. Nurse", "department": "ICU", "issue_type": "Fall",
+              "description": "Patient fell near the bed", "priority": "High"}
+    ticket.update(overrides)
+    return ticket
+
+
+def _set_created(repo, ticket_id, created_at, column="created_at"):
+    with repo.db.connection() as conn:
+        conn.execute(f"UPDATE incidents SET {column} = ? WHERE ticket_id = ?", (created_at, ticket_id))
+
+
+def _walk(repo, limit, **kwargs):
+    """Every page of a listing, following next_cursor to the end."""
+    pages, cursor = [], None
+    while True:
+        page, cursor = repo.list_tickets(limit=limit, cursor=cursor, **kwargs)
+        pages.append(page)
+        if cursor is None:
+            return pages
+
+
+class FakeConnection:
+    def __init__(self):
+        self.committed = self.rolled_back = self.closed = False
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def close(self):
+        self.closed = True
+
+
+def test_pool_reuses_released_connections():
+    opened = []
+    pool = ConnectionPool("fake", lambda: opened.append(FakeConnection()) or opened[-1], size=2)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    assert len(opened) == 1
+    assert first.committed
+
+
+def test_pool_times_out_when_every_connection_is_checked_out():
+    pool = ConnectionPool("fake", FakeConnection, size=1, timeout=0.05)
+    held = pool.acquire()
+
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+
+    pool.release(held)
+    pool.release(pool.acquire())
+
+
+def test_pool_rolls_back_and_reraises_on_error():
+    pool = ConnectionPool("fake", FakeConnection, size=1)
+
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            raise RuntimeError("query failed")
+
+    assert conn.rolled_back and not conn.committed
+    # The slot was returned, so the next checkout does not block
+    pool.release(pool.acquire())
+
+
+def test_pool_never_opens_more_than_size_connections():
+    opened = []
+    lock = threading.Lock()
+
+    def connect():
+        with lock:
+            opened.append(FakeConnection())
+            return opened[-1]
+
+    pool = ConnectionPool("fake", connect, size=3, timeout=5)
+
+    def work():
+        for _ in range(20):
+            with pool.connection():
+                pass
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert 1 <= len(opened) <= 3
+
+
+def test_closed_pool_closes_connections_on_release():
+    pool = ConnectionPool("fake", FakeConnection, size=1)
+    conn = pool.acquire()
+    pool.close()
+
+    pool.release(conn)
+
+    assert conn.closed
+
+
+def test_create_read_and_update_ticket(repo):
+    ticket_id = repo.create_ticket(_ticket())
+
+    assert repo.get_status(ticket_id)["status"] == "Open"
+    assert repo.update_status(ticket_id, "Resolved")
+    assert repo.get_status(ticket_id)["status"] == "Resolved"
+    assert not repo.update_status("MISSING", "Resolved")
+    assert repo.get_status("MISSING") is None
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    assert decode_cursor(encode_cursor("2024-01-02 03:04:05", 42)) == ("2024-01-02 03:04:05", 42)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_pages_walk_newest_first_without_gaps_or_repeats(repo):
+    ids = [repo.create_ticket(_ticket()) for _ in range(7)]
+    # Two tickets per second, so the id breaks created_at ties within a page
+    for i, ticket_id in enumerate(ids):
+        _set_created(repo, ticket_id, f"2024-01-01 00:00:0{i // 2}")
+
+    pages = _walk(repo, limit=3)
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [t["ticket_id"] for page in pages for t in page] == ids[::-1]
+    assert set(pages[0][0]) == {"ticket_id", "status", "updated_at"}
+
+
+def test_filters_and_projection(repo):
+    high = repo.create_ticket(_ticket(priority="High"))
+    critical = repo.create_ticket(_ticket(priority="Critical", department="ER"))
+    repo.create_ticket(_ticket(priority="Low"))
+
+    page, cursor = repo.list_tickets(filters={"priority": "High,Critical"}, fields=["ticket_id", "department"])
+    assert cursor is None
+    assert sorted(t["ticket_id"] for t in page) == sorted([high, critical])
+    assert set(page[0]) == {"ticket_id", "department"}
+
+    page, _ = repo.list_tickets(filters={"priority": "High,Critical", "department": "ER"})
+    assert [t["ticket_id"] for t in page] == [critical]
+
+    with pytest.raises(ValueError):
+        repo.list_tickets(fields=["password"])
+    with pytest.raises(ValueError):
+        repo.list_tickets(filters={"owner": "me"})
+
+
+def test_export_streams_every_row_in_batches(repo):
+    ids = [repo.create_ticket(_ticket()) for _ in range(5)]
+
+    rows = list(repo.iter_tickets(fields=["ticket_id", "priority"], batch_size=2))
+
+    assert [r["ticket_id"] for r in rows] == ids
+    assert rows[0] == {"ticket_id": ids[0], "priority": "High"}
+
+
+def test_export_since_returns_rows_updated_after_watermark(repo):
+    ids = [repo.create_ticket(_ticket()) for _ in range(3)]
+    for i, ticket_id in enumerate(ids):
+        _set_created(repo, ticket_id, f"2024-01-0{3 - i} 00:00:00", column="updated_at")
+
+    rows = list(repo.iter_tickets(since="2024-01-01 00:00:00"))
+
+    # Oldest change first, so the last row is the next watermark
+    assert [r["ticket_id"] for r in rows] == [ids[1], ids[0]]
+
+
+def test_export_validates_arguments_before_reading(repo):
+    with pytest.raises(ValueError):
+        repo.iter_tickets(fields=["password"])
+
+
+def test_abandoned_export_returns_its_connection(repo):
+    path = repo.db.sqlite_path
+    repo.db.pool = ConnectionPool("sqlite", lambda: connect_sqlite(path), size=1, timeout=0.1)
+    for _ in range(3):
+        repo.create_ticket(_ticket())
+
+    rows = repo.iter_tickets(batch_size=1)
+    next(rows)
+    rows.close()
+
+    assert len(list(repo.iter_tickets())) == 3
+
+
+def test_bulk_insert_reports_each_record_in_input_order(repo):
+    records = [_ticket(), {"name": "x"}, ValueError("Expecting value"), _ticket(priority="Urgent"), _ticket()]
+
+    results = repo.create_tickets(iter(records), batch_size=1)
+
+    assert [r["index"] for r in results] == [0, 1, 2, 3, 4]
+    assert "ticket_id" in results[0] and "ticket_id" in results[4]
+    assert "'department' is required" in results[1]["error"]
+    assert results[2]["error"].startswith("Invalid JSON")
+    assert "'priority' must be one of" in results[3]["error"]
+    assert len(list(repo.iter_tickets())) == 2
+
+
+def test_bulk_insert_fails_a_batch_as_a_whole(repo, monkeypatch):
+    insert = repo._insert
+
+    def failing_insert(cur, rows):
+        if any(row[4] == "boom" for row in rows):
+            raise RuntimeError("disk full")
+        insert(cur, rows)
+
+    monkeypatch.setattr(repo, "_insert", failing_insert)
+
+    results = repo.create_tickets([_ticket(), _ticket(description="boom"), _ticket(), _ticket()], batch_size=2)
+
+    assert [r.get("error") for r in results] == ["Database error: disk full"] * 2 + [None] * 2
+    assert len(list(repo.iter_tickets())) == 2
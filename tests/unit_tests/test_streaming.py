@@ -0,0 +1,65 @@
+import json
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+from streaming import StreamStats, stream_answer, stream_cached
+
+
+def _graph(*answers):
+    """One-node graph around a fake model that streams ``answers`` word by word."""
+    model = GenericFakeChatModel(messages=iter([AIMessage(content=a) for a in answers]))
+
+    def respond(state):
+        return {"messages": [model.invoke(state["messages"])]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("respond", respond)
+    builder.add_edge(START, "respond")
+    builder.add_edge("respond", END)
+    return builder.compile()
+
+
+def _payloads(events):
+    events = list(events)
+    assert all(e.startswith("data: ") and e.endswith("\n\n") for e in events)
+    return [json.loads(e[len("data: "):]) for e in events]
+
+
+def test_deltas_concatenate_to_final_answer():
+    answer = "Hand hygiene is covered by IPSG.5 in the JCI standards."
+    completed = []
+
+    payloads = _payloads(stream_answer(_graph(answer), "hand hygiene", on_complete=completed.append))
+
+    deltas = [p["delta"] for p in payloads if "delta" in p]
+    assert len(deltas) > 1  # streamed token by token, not as one snapshot
+    assert "".join(deltas) == answer
+    assert completed == [answer]
+    assert payloads[-1]["done"] is True
+    assert payloads[-1]["deltas"] == len(deltas)
+
+
+def test_stream_records_stats_and_reports_errors():
+    class Failing:
+        def stream(self, *args, **kwargs):
+            raise RuntimeError("model down")
+
+    stats = StreamStats()
+    completed = []
+
+    payloads = _payloads(stream_answer(Failing(), "q", on_complete=completed.append, stats=stats))
+
+    assert payloads[0] == {"error": "Chat error: model down"}
+    assert payloads[-1]["done"] is True
+    assert completed == []
+    assert stats.snapshot()["errors"] == 1
+
+
+def test_cached_answer_replays_as_one_delta():
+    payloads = _payloads(stream_cached("cached answer", 0.97))
+
+    assert payloads[0] == {"delta": "cached answer"}
+    assert payloads[-1]["cached"] is True
+    assert payloads[-1]["similarity"] == 0.97
@@ -0,0 +1,104 @@
+import pytest
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+import tracing
+
+
+@pytest.fixture
+def exported(monkeypatch):
+    """Trace everything into an in-memory exporter; returns the finished spans."""
+    monkeypatch.setattr(tracing, "ENABLED", True)
+    monkeypatch.setattr(tracing, "SAMPLE_RATE", 1.0)
+    exporter = tracing.SpanExporter(kind="none")
+    monkeypatch.setattr(tracing, "exporter", exporter)
+    return exporter._queue
+
+
+def _by_name(spans):
+    return {span.name: span for span in spans}
+
+
+def test_nested_spans_are_parented_to_the_enclosing_span(exported):
+    root = tracing.start_trace("POST /chat")
+    with tracing.span("retrieval.search", k=4) as search:
+        with tracing.span("db.transaction") as query:
+            assert tracing.current_span() is query
+        assert tracing.current_span() is search
+    tracing.end_trace(root)
+
+    assert tracing.current_span() is None
+    spans = _by_name(exported)
+    assert set(spans) == {"POST /chat", "retrieval.search", "db.transaction"}
+    assert {span.trace_id for span in exported} == {root.trace_id}
+    assert spans["POST /chat"].parent_id is None
+    assert spans["retrieval.search"].parent_id == root.span_id
+    assert spans["db.transaction"].parent_id == search.span_id
+    assert spans["retrieval.search"].attributes == {"k": 4}
+
+
+def test_span_is_a_no_op_outside_a_trace(exported):
+    with tracing.span("db.transaction") as span:
+        assert span is None
+    assert not exported
+
+
+def test_error_is_recorded_and_context_restored(exported):
+    root = tracing.start_trace("GET /tickets")
+    with pytest.raises(ValueError):
+        with tracing.span("db.transaction"):
+            raise ValueError("boom")
+    assert tracing.current_span() is root
+    tracing.end_trace(root)
+
+    assert _by_name(exported)["db.transaction"].to_dict()["status"] == "error"
+    assert _by_name(exported)["db.transaction"].error == "ValueError: boom"
+
+
+def test_traceparent_continues_the_callers_trace(exported):
+    trace_id, parent_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+
+    root = tracing.start_trace("GET /healthz", traceparent=f"00-{trace_id}-{parent_id}-01")
+    tracing.end_trace(root)
+
+    assert (root.trace_id, root.parent_id) == (trace_id, parent_id)
+    assert tracing.start_trace("GET /healthz", traceparent=f"00-{trace_id}-{parent_id}-00") is None
+
+
+def test_streamed_body_keeps_the_root_span_current_until_closed(exported):
+    root = tracing.start_trace("POST /chat")
+
+    def body():
+        with tracing.span("node.respond"):
+            yield "data: chunk\n\n"
+
+    streamed = tracing.stream(root, body())
+    assert tracing.current_span() is None  # detached from the request context
+    assert list(streamed) == ["data: chunk\n\n"]
+
+    spans = _by_name(exported)
+    assert spans["node.respond"].parent_id == root.span_id
+    assert root.end_ns is not None
+
+
+def test_spans_inside_a_graph_node_are_parented_to_the_node(exported, monkeypatch):
+    monkeypatch.setattr(tracing, "graph_tracing", tracing.GraphTracing())
+
+    def respond(state):
+        with tracing.span("retrieval.search"):
+            return {"messages": []}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("respond", respond)
+    builder.add_edge(START, "respond")
+    builder.add_edge("respond", END)
+    graph = builder.compile()
+
+    root = tracing.start_trace("POST /chat")
+    graph.invoke({"messages": []}, config={"callbacks": [tracing.graph_tracing]})
+    tracing.end_trace(root)
+
+    spans = _by_name(exported)
+    run = next(span for name, span in spans.items() if name.startswith("graph."))
+    assert run.parent_id == root.span_id
+    assert spans["node.respond"].parent_id == run.span_id
+    assert spans["retrieval.search"].parent_id == spans["node.respond"].span_id
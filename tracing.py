@@ -0,0 +1,615 @@
+"""
+Span-based tracing of backend requests down to graph nodes, LLM calls,
+retrieval stages, embedding calls and DB transactions.
+
+Each sampled Flask request opens a root span whose trace ID comes from an
+incoming W3C ``traceparent`` (or ``X-Trace-Id``) header when present and is
+returned in the ``X-Trace-Id`` response header. Code that does interesting
+work wraps it in ``with tracing.span("name", key=value):``; outside a traced
+request this is a shared no-op. ``GraphTracing`` turns LangChain callbacks
+into spans for graph runs, nodes, model, retriever and tool calls, and spans
+opened inside a node (a DB query from a retriever, say) are parented to that
+node. Finished spans are queued and written by a background thread, either
+as JSON lines (``TRACE_EXPORTER=jsonl``) or as OTLP/HTTP JSON to a collector
+(``TRACE_EXPORTER=otlp``).
+
+    python tracing.py collect --port 4318 --out traces.jsonl   # OTLP stand-in
+    python tracing.py report traces.jsonl --slowest 5           # span trees
+    python tracing.py report traces.jsonl --trace <id> --folded # flame graph input
+"""
+
+import argparse
+import atexit
+import contextvars
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables.config import var_child_runnable_config
+
+import metrics
+
+EXPORTER = os.environ.get("TRACE_EXPORTER", "none").lower()  # none | jsonl | otlp
+ENABLED = EXPORTER in ("jsonl", "otlp")
+TRACE_FILE = os.environ.get("TRACE_FILE", "traces.jsonl")
+OTLP_ENDPOINT = os.environ.get("TRACE_OTLP_ENDPOINT", "http://127.0.0.1:4318/v1/traces")
+SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "1.0"))
+SERVICE_NAME = os.environ.get("TRACE_SERVICE_NAME", "incident-backend")
+FLUSH_INTERVAL = float(os.environ.get("TRACE_FLUSH_INTERVAL", "1"))
+MAX_QUEUED_SPANS = int(os.environ.get("TRACE_MAX_QUEUED_SPANS", "10000"))
+EXPORT_BATCH_SIZE = 512
+TRACE_HEADER = "X-Trace-Id"
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("trace_span", default=None)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span:
+    """One timed operation; ``end()`` hands it to the exporter."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attributes", "start_ns", "end_ns",
+                 "error", "_token", "_run")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, **attributes: Any):
+        self.trace_id = trace_id
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+        self._token = None
+        self._run: Optional[UUID] = None  # LangChain run it was opened under
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        exporter.export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+# --- context ---
+
+def _current_run_id() -> Optional[UUID]:
+    """ID of the LangChain run executing in this context, if any."""
+    config = var_child_runnable_config.get()
+    return getattr((config or {}).get("callbacks"), "parent_run_id", None)
+
+
+def current_span() -> Optional[Span]:
+    """The innermost open span for this request, if it is being traced.
+
+    Inside a LangGraph node this is the node's (or retriever/tool call's)
+    span, found through the runnable config LangChain keeps in context,
+    unless a span was opened since within that same run.
+    """
+    span = _current.get()
+    if span is None or not graph_tracing.active:
+        return span
+    run_id = _current_run_id()
+    if run_id is None or run_id == span._run:
+        return span
+    inner = graph_tracing.span_for(run_id)
+    return inner if inner is not None and inner.trace_id == span.trace_id else span
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, trace_id: Optional[str] = None,
+                **attributes: Any) -> Optional[Span]:
+    """Open a root span and make it current; returns None if not sampled.
+
+    A valid ``traceparent`` continues the caller's trace (and its sampling
+    decision); ``trace_id`` alone reuses an ID without a parent span.
+    """
+    if not ENABLED:
+        return None
+    parent_id = None
+    match = TRACEPARENT.match((traceparent or "").strip().lower())
+    if match:
+        trace_id, parent_id, flags = match.groups()
+        if not int(flags, 16) & 1:
+            return None
+    elif trace_id and re.fullmatch(r"[0-9a-fA-F]{32}", trace_id):
+        trace_id = trace_id.lower()
+    else:
+        if random.random() >= SAMPLE_RATE:
+            return None
+        trace_id = _new_id(128)
+    span = Span(name, trace_id, parent_id, **attributes)
+    span._token = _current.set(span)
+    return span
+
+
+def end_trace(span: Optional[Span], error: Optional[BaseException] = None) -> None:
+    """End a root span from ``start_trace`` and clear it from the context."""
+    if span is None:
+        return
+    span.end(error)
+    _detach(span)
+
+
+def _detach(span: Span) -> None:
+    try:
+        _current.reset(span._token)
+    except ValueError:  # ended from another context
+        _current.set(None)
+
+
+def stream(span: Span, body: Iterable[Any]) -> Iterator[Any]:
+    """Hand a root span over to a streamed response body.
+
+    The span stops being current where it was started, is current again
+    while ``body`` is iterated, and ends when the body is exhausted or closed.
+    """
+    _detach(span)
+
+    def generate():
+        token = _current.set(span)
+        error = None
+        try:
+            yield from body
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            span.end(error)
+            try:
+                _current.reset(token)
+            except ValueError:
+                _current.set(None)
+
+    return generate()
+
+
+class _SpanContext:
+    __slots__ = ("_name", "_attributes", "_span", "_token", "_previous")
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self._name = name
+        self._attributes = attributes
+
+    def __enter__(self) -> Optional[Span]:
+        parent = current_span()
+        if parent is None:
+            self._span = None
+            return None
+        self._span = Span(self._name, parent.trace_id, parent.span_id, **self._attributes)
+        if graph_tracing.active:
+            self._span._run = _current_run_id()
+        self._previous = _current.get()
+        self._token = _current.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._span is not None:
+            self._span.end(exc)
+            try:
+                _current.reset(self._token)
+            except ValueError:  # generator resumed in another context
+                _current.set(self._previous)
+
+
+class _NoSpan:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return None
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, **attributes: Any):
+    """Context manager timing its block as a child of the current span.
+
+    Yields the span (to add attributes) or None when nothing is traced.
+    """
+    if not ENABLED or _current.get() is None:
+        return _NO_SPAN
+    return _SpanContext(name, attributes)
+
+
+# --- LangChain / LangGraph ---
+
+class GraphTracing(BaseCallbackHandler):
+    """Callback handler opening spans for graph runs, nodes, model, retriever and tool calls.
+
+    Internal runs (channel writes, routing, sequences) get no span of their
+    own; they resolve to their nearest traced ancestor.
+    """
+
+    def __init__(self):
+        self._spans: Dict[UUID, Span] = {}
+        self._aliases: Dict[UUID, UUID] = {}
+
+    @property
+    def active(self) -> bool:
+        return bool(self._spans)
+
+    def span_for(self, run_id: Optional[UUID]) -> Optional[Span]:
+        if run_id is None:
+            return None
+        return self._spans.get(self._aliases.get(run_id, run_id))
+
+    def _open(self, run_id: UUID, parent_run_id: Optional[UUID], name: str, **attributes: Any) -> None:
+        parent = self.span_for(parent_run_id) or _current.get()
+        if parent is None:
+            return
+        self._spans[run_id] = Span(name, parent.trace_id, parent.span_id, **attributes)
+
+    def _alias(self, run_id: UUID, parent_run_id: Optional[UUID]) -> None:
+        if parent_run_id is not None:
+            target = self._aliases.get(parent_run_id, parent_run_id)
+            if target in self._spans:
+                self._aliases[run_id] = target
+
+    def _close(self, run_id: UUID, error: Optional[BaseException] = None, **attributes: Any) -> None:
+        if self._aliases.pop(run_id, None) is not None:
+            return
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.set(**attributes)
+            span.end(error)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None,
+                       tags=None, metadata=None, **kwargs) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name") or "chain"
+        node = (metadata or {}).get("langgraph_node")
+        if parent_run_id is None or (parent_run_id not in self._spans and parent_run_id not in self._aliases):
+            self._open(run_id, None, f"graph.{name}")
+        elif node and node == name:
+            self._open(run_id, parent_run_id, f"node.{node}", step=(metadata or {}).get("langgraph_step"))
+        else:
+            self._alias(run_id, parent_run_id)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs) -> None:
+        self._close(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs) -> None:
+        self._close(run_id, error)
+
+    def _model_start(self, serialized, run_id, parent_run_id, metadata) -> None:
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get("name") or "unknown"
+        self._open(run_id, parent_run_id, f"llm.{model}", model=model)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None,
+                            metadata=None, **kwargs) -> None:
+        self._model_start(serialized, run_id, parent_run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, **kwargs) -> None:
+        self._model_start(serialized, run_id, parent_run_id, metadata)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+        self._close(run_id, **{f"tokens.{key}": value for key, value in usage.items()
+                               if isinstance(value, (int, float))})
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._close(run_id, error)
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name") or "retriever"
+        self._open(run_id, parent_run_id, f"retriever.{name}")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs) -> None:
+        self._close(run_id, documents=len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs) -> None:
+        self._close(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name") or "tool"
+        self._open(run_id, parent_run_id, f"tool.{name}")
+
+    def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        self._close(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+        self._close(run_id, error)
+
+
+graph_tracing = GraphTracing()
+if ENABLED:
+    metrics.LLM_CALLBACKS.append(graph_tracing)
+
+
+# --- export ---
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: Iterable[Span]) -> Dict[str, Any]:
+    """OTLP/HTTP JSON ``ExportTraceServiceRequest`` body for ``spans``."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{
+            "scope": {"name": "tracing"},
+            "spans": [{
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                "parentSpanId": s.parent_id or "",
+                "name": s.name,
+                "kind": 2 if s.parent_id is None else 1,  # SERVER for roots, INTERNAL otherwise
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns),
+                "attributes": [{"key": key, "value": _otlp_value(value)}
+                               for key, value in s.attributes.items() if value is not None],
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+            } for s in spans],
+        }],
+    }]}
+
+
+def from_otlp(body: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Convert an OTLP/HTTP JSON body back into ``Span.to_dict`` records."""
+    records = []
+    for resource in body.get("resourceSpans", []):
+        for scope in resource.get("scopeSpans", []):
+            for s in scope.get("spans", []):
+                start, end = int(s["startTimeUnixNano"]), int(s["endTimeUnixNano"])
+                status = s.get("status") or {}
+                records.append({
+                    "trace_id": s["traceId"],
+                    "span_id": s["spanId"],
+                    "parent_id": s.get("parentSpanId") or None,
+                    "name": s["name"],
+                    "start_ns": start,
+                    "duration_ms": round((end - start) / 1e6, 3),
+                    "status": "error" if status.get("code") == 2 else "ok",
+                    "error": status.get("message") if status.get("code") == 2 else None,
+                    "attributes": {a["key"]: next(iter(a["value"].values())) for a in s.get("attributes", [])},
+                })
+    return records
+
+
+class SpanExporter:
+    """Queues finished spans and writes them in batches from a background thread."""
+
+    def __init__(self, kind: str = EXPORTER, path: str = TRACE_FILE, endpoint: str = OTLP_ENDPOINT,
+                 max_queued: int = MAX_QUEUED_SPANS):
+        self.kind = kind
+        self.path = path
+        self.endpoint = endpoint
+        self._queue: deque = deque()
+        self._max_queued = max_queued
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.exported = 0
+        self.dropped = 0
+        self.failed_batches = 0
+
+    def export(self, span: Span) -> None:
+        if len(self._queue) >= self._max_queued:
+            self.dropped += 1
+            return
+        self._queue.append(span)
+        if len(self._queue) >= EXPORT_BATCH_SIZE:
+            self._wakeup.set()
+
+    def _drain(self) -> List[Span]:
+        batch = []
+        while self._queue and len(batch) < EXPORT_BATCH_SIZE:
+            batch.append(self._queue.popleft())
+        return batch
+
+    def _write(self, batch: List[Span]) -> None:
+        if self.kind == "jsonl":
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(s.to_dict(), default=str) + "\n" for s in batch)
+        elif self.kind == "otlp":
+            import requests
+
+            requests.post(self.endpoint, json=to_otlp(batch), timeout=5).raise_for_status()
+
+    def flush(self) -> None:
+        """Write everything queued so far."""
+        with self._lock:
+            while self._queue:
+                batch = self._drain()
+                try:
+                    self._write(batch)
+                    self.exported += len(batch)
+                except Exception as e:
+                    self.failed_batches += 1
+                    self.dropped += len(batch)
+                    print(f"⚠️ Trace export to {self.kind} failed: {e}")
+
+    def _loop(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(FLUSH_INTERVAL)
+            self._wakeup.clear()
+            self.flush()
+
+    def start(self) -> None:
+        """Start the export thread (no-op when tracing is off)."""
+        if self.kind not in ("jsonl", "otlp") or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "exporter": self.kind,
+            "queued": len(self._queue),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "failed_batches": self.failed_batches,
+        }
+
+
+exporter = SpanExporter()
+if ENABLED:
+    atexit.register(exporter.stop)
+metrics.callback("trace_spans_exported_total", "Spans written by the trace exporter",
+                 lambda: exporter.exported, "counter")
+metrics.callback("trace_spans_dropped_total", "Spans dropped (queue full or export failed)",
+                 lambda: exporter.dropped, "counter")
+
+
+# --- offline tools ---
+
+def load_spans(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Read a JSONL span file into ``{trace_id: [span, ...]}``."""
+    traces: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                traces[record["trace_id"]].append(record)
+    return traces
+
+
+def _tree(spans: List[Dict[str, Any]]):
+    children: Dict[Optional[str], List[Dict[str, Any]]] = defaultdict(list)
+    ids = {s["span_id"] for s in spans}
+    for s in spans:
+        # Spans whose parent is outside this file (e.g. the caller's) are roots
+        children[s["parent_id"] if s["parent_id"] in ids else None].append(s)
+    for siblings in children.values():
+        siblings.sort(key=lambda s: s["start_ns"])
+    return children
+
+
+def format_tree(spans: List[Dict[str, Any]]) -> List[str]:
+    """Indented span tree with total and self time per span."""
+    children = _tree(spans)
+    lines = []
+
+    def walk(s, depth):
+        child_ms = sum(c["duration_ms"] for c in children.get(s["span_id"], []))
+        status = " ✗" if s["status"] == "error" else ""
+        lines.append(f"{'  ' * depth}{s['name']:<{48 - 2 * depth}} {s['duration_ms']:>10.2f} ms "
+                     f"(self {max(s['duration_ms'] - child_ms, 0):.2f}){status}")
+        for child in children.get(s["span_id"], []):
+            walk(child, depth + 1)
+
+    for root in children.get(None, []):
+        walk(root, 0)
+    return lines
+
+
+def folded_stacks(spans: List[Dict[str, Any]]) -> List[str]:
+    """Brendan Gregg folded stacks (``a;b;c self_us``) for flamegraph.pl or speedscope."""
+    children = _tree(spans)
+    lines = []
+
+    def walk(s, stack):
+        stack = stack + [s["name"]]
+        kids = children.get(s["span_id"], [])
+        self_us = int((s["duration_ms"] - sum(c["duration_ms"] for c in kids)) * 1000)
+        if self_us > 0:
+            lines.append(f"{';'.join(stack)} {self_us}")
+        for child in kids:
+            walk(child, stack)
+
+    for root in children.get(None, []):
+        walk(root, [])
+    return lines
+
+
+def _report(args) -> None:
+    traces = load_spans(args.path)
+    if args.trace:
+        selected = [args.trace]
+    else:
+        def duration(trace_id):
+            return max(s["duration_ms"] for s in traces[trace_id])
+        selected = sorted(traces, key=duration, reverse=True)[:args.slowest]
+    for trace_id in selected:
+        spans = traces.get(trace_id, [])
+        if args.folded:
+            print("\n".join(folded_stacks(spans)))
+            continue
+        print(f"trace {trace_id} ({len(spans)} spans)")
+        print("\n".join(format_tree(spans)))
+        print()
+
+
+def _collect(args) -> None:
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            records = from_otlp(body)
+            with lock, open(args.out, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(r) + "\n" for r in records)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *a):
+            pass
+
+    lock = threading.Lock()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), Handler)
+    print(f"📡 OTLP/HTTP JSON collector on http://127.0.0.1:{args.port}/v1/traces -> {args.out}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trace collection and offline reports")
+    commands = parser.add_subparsers(dest="command", required=True)
+    collect = commands.add_parser("collect", help="run a local OTLP/HTTP JSON collector writing JSONL")
+    collect.add_argument("--port", type=int, default=4318)
+    collect.add_argument("--out", default=TRACE_FILE)
+    report = commands.add_parser("report", help="print span trees (or folded stacks) from a JSONL file")
+    report.add_argument("path", nargs="?", default=TRACE_FILE)
+    report.add_argument("--trace", help="trace ID to show (default: the slowest traces)")
+    report.add_argument("--slowest", type=int, default=3)
+    report.add_argument("--folded", action="store_true", help="print folded stacks for flame graphs")
+    args = parser.parse_args()
+    if args.command == "collect":
+        _collect(args)
+    else:
+        _report(args)
@@ -0,0 +1,84 @@
+"""
+Structured ticket extraction in concurrent, rate-limited batches.
+
+Fans ticket texts out through the structured-output runnable's ``batch`` with
+a bounded number of in-flight model calls. Failures are isolated per item, so
+one bad ticket never fails the whole batch, and results keep input order.
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import Runnable, RunnableLambda
+
+import metrics
+
+MAX_CONCURRENCY = int(os.environ.get("TRIAGE_MAX_CONCURRENCY", "8"))
+MAX_BATCH_SIZE = int(os.environ.get("TRIAGE_MAX_BATCH_SIZE", "100"))
+# Model calls per second across the whole process (0 disables limiting)
+REQUESTS_PER_SECOND = float(os.environ.get("TRIAGE_REQUESTS_PER_SECOND", "0"))
+
+_limiter = None
+
+
+def get_extractor() -> Runnable:
+    """Return the structured-output runnable used for ticket analysis."""
+    # Lazy import to avoid failing app startup if env is missing
+    from app.nodes.struc_output import llm_structured  # noqa: WPS433
+
+    return llm_structured
+
+
+def _rate_limited(runnable: Runnable, requests_per_second: float) -> Runnable:
+    """Prefix ``runnable`` with a step that waits for a shared rate-limit token."""
+    global _limiter
+    if requests_per_second <= 0:
+        return runnable
+    if _limiter is None:
+        from langchain_core.rate_limiters import InMemoryRateLimiter
+
+        _limiter = InMemoryRateLimiter(
+            requests_per_second=requests_per_second,
+            check_every_n_seconds=0.05,
+            max_bucket_size=max(1, int(requests_per_second)),
+        )
+
+    def wait_for_token(messages):
+        _limiter.acquire()
+        return messages
+
+    return RunnableLambda(wait_for_token) | runnable
+
+
+def analyze_batch(
+    texts: List[str],
+    runnable: Optional[Runnable] = None,
+    max_concurrency: int = MAX_CONCURRENCY,
+    requests_per_second: float = REQUESTS_PER_SECOND,
+) -> List[Dict[str, Any]]:
+    """Analyze many ticket texts; one result per text, in input order.
+
+    Each result is ``{"structured_output": {...}}`` or ``{"error": "..."}``.
+    """
+    runnable = _rate_limited(runnable or get_extractor(), requests_per_second)
+    results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+    pending = []
+    for index, text in enumerate(texts):
+        if isinstance(text, str) and text.strip():
+            pending.append(index)
+        else:
+            results[index] = {"error": "No ticket text provided"}
+
+    if pending:
+        outputs = runnable.batch(
+            [[HumanMessage(content=texts[i])] for i in pending],
+            config=metrics.llm_config({"max_concurrency": max(1, max_concurrency)}),
+            return_exceptions=True,
+        )
+        for index, output in zip(pending, outputs):
+            if isinstance(output, Exception):
+                results[index] = {"error": f"Failed to analyze ticket: {str(output)}"}
+            else:
+                results[index] = {"structured_output": output.model_dump()}
+    return results